@@ -0,0 +1,114 @@
+"""
+HTTP API giving scripts and notebooks range queries on the metrics of the runs, without going through Dash callbacks.
+
+    GET /api/runs
+        JSON list of the run identifiers
+    GET /api/runs/<run>/metrics?from=<step>&to=<step>&every=<rows>&columns=<name>,<name>&format=ndjson|binary
+        Rows with from <= step <= to, one every `every` rows, with the step and the given columns (all by default):
+        * ndjson (default): one JSON object per row,
+        * binary: see payload.encode_binary_columns, e.g. read with payload.decode_binary_columns.
+        The rows are copied from the store, then serialized while the response is being sent.
+
+Responses carry an ETag derived from the content of the run and the query, so that a client polling with
+If-None-Match gets an empty 304 response until new rows are logged or the run restarts.
+"""
+import hashlib
+import json
+import math
+from itertools import islice
+
+import flask
+
+from payload import encode_binary_columns
+from runlog import run_blocking
+
+# Number of rows serialized per chunk of the streamed NDJSON responses
+CHUNK_ROWS = 1000
+
+
+def _parse_int(args, name, default=None, minimum=None):
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+
+    try:
+        value = int(float(value))
+    except (ValueError, OverflowError):
+        flask.abort(400, f"Invalid value of '{name}': {value}")
+
+    if minimum is not None and value < minimum:
+        flask.abort(400, f"'{name}' must be at least {minimum}")
+
+    return value
+
+
+def _ndjson(columns):
+    names = list(columns)
+    rows = zip(*columns.values())
+
+    while True:
+        chunk = ''.join(
+            json.dumps({name: value if value == value and not math.isinf(value) else None
+                        for name, value in zip(names, row)}) + '\n'
+            for row in islice(rows, CHUNK_ROWS)
+        )
+        if not chunk:
+            return
+        yield chunk
+
+
+def init_api(server, get_run_store, list_runs):
+    """
+    Adds the API routes to a Flask server.
+    :param server: The Flask server, e.g. app.server
+    :param get_run_store: Function returning the RunLogStore of a run identifier, or None if there is no such run
+    :param list_runs: Function returning the list of the run identifiers
+    """
+    @server.route('/api/runs')
+    def api_runs():
+        return flask.jsonify(list_runs())
+
+    @server.route('/api/runs/<run>/metrics')
+    def api_metrics(run):
+        store = get_run_store(run)
+        if store is None:
+            flask.abort(404, f"No such run: '{run}'")
+
+        args = flask.request.args
+        start = _parse_int(args, 'from')
+        end = _parse_int(args, 'to')
+        every = _parse_int(args, 'every', default=1, minimum=1)
+        output_format = args.get('format', 'ndjson')
+        if output_format not in ('ndjson', 'binary'):
+            flask.abort(400, f"Unknown format '{output_format}', expected ndjson or binary")
+
+        columns = [name for name in args.get('columns', '').split(',') if name] or None
+        unknown = [name for name in columns or [] if name not in store.columns[1:]]
+        if unknown:
+            flask.abort(400, f"Unknown columns {unknown}, expected some of {store.columns[1:]}")
+
+        try:
+            run_blocking(store.update)
+        except FileNotFoundError:
+            flask.abort(404, f"The log of run '{run}' does not exist yet")
+
+        # Checked before reading any row, so that an unchanged poll costs a comparison
+        key = json.dumps([run, store.fingerprint(), start, end, every, columns, output_format])
+        etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+        if etag in flask.request.if_none_match:
+            response = flask.Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        data = store.query(start, end, every, columns)
+
+        if output_format == 'binary':
+            response = flask.Response(encode_binary_columns(data), mimetype='application/octet-stream')
+        else:
+            response = flask.Response(_ndjson(data), mimetype='application/x-ndjson')
+
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+    return api_metrics
@@ -1,19 +1,184 @@
+import json
 import os
+from urllib.parse import parse_qs
 
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-import pandas as pd
+import flask
+# Dash already imports plotly, including plotly.tools, and pandas, used by demo_utils: deferring these imports
+# does not reduce the import time of the app
 import plotly.graph_objs as go
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 from plotly import tools
 
+from api import init_api
+from collector import MetricsCollector
 from demo_utils import demo_components, demo_callbacks, demo_explanation
+from eventlog import DEFAULT_TAGS, EventFileTail
+from figure_cache import FigureCache
+from histograms import HistogramStore
+from profiling import list_profiles, profiles_dir, request_profile
+from payload import decode_columns, decode_run_log, encode_run_log, payload_version
+from runlog import NAN, OnlineStats, RunLogStore, get_store, run_blocking
+from sparklines import SparklineCache, list_runs, runs_page
+from sqlitelog import SQLiteTail
+from sweep import load_manifest, run_log_path
 
-LOGFILE = 'examples/run_log.csv'
+LOGFILE = os.environ.get('LOGFILE', 'examples/run_log.csv')
 
-app = dash.Dash(__name__)
+# Sidecar log of the weight histograms written by tfutils.write_histograms
+HISTOGRAM_LOGFILE = os.environ.get('HISTOGRAM_LOGFILE', 'examples/run_log.hist.csv')
+
+# Address of the metrics collector receiving the rows of tfutils.CollectorClient, e.g. 'tcp://0.0.0.0:8051' or
+# 'unix:///tmp/collector.sock'. When unset, the run log is read from LOGFILE
+COLLECTOR_ADDRESS = os.environ.get('COLLECTOR_ADDRESS')
+COLLECTOR_LOG_DIR = os.environ.get('COLLECTOR_LOG_DIR', 'logs')
+RUN_ID = os.environ.get('RUN_ID', 'run_log')
+
+# SQLite database written by tfutils.SQLiteSink. When set, the run RUN_ID is read from it instead of LOGFILE
+SQLITE_DATABASE = os.environ.get('SQLITE_DATABASE')
+
+# Log directory of TensorFlow event files (tf.summary). When set, the run is read from their scalar summaries, whose
+# tags are mapped onto the columns of the run log by EVENT_TAGS, a JSON object, see eventlog.DEFAULT_TAGS
+EVENT_LOGDIR = os.environ.get('EVENT_LOGDIR')
+EVENT_TAGS = json.loads(os.environ['EVENT_TAGS']) if os.environ.get('EVENT_TAGS') else DEFAULT_TAGS
+
+# Directory of a hyperparameter sweep run by sweep.py. When set, the run displayed is chosen among the jobs of the sweep
+SWEEP_DIR = os.environ.get('SWEEP_DIR')
+
+# Directory of run logs listed by the run browser (/runs), where the displayed run can be chosen. A sweep directory is
+# browsed by default
+RUNS_DIR = SWEEP_DIR or os.environ.get('RUNS_DIR')
+
+# Encoding of the run log sent to the browser: 'binary' (base64 column arrays) or 'json' (pandas split orientation)
+PAYLOAD_ENCODING = os.environ.get('PAYLOAD_ENCODING', 'binary')
+
+# Where the figures are built from the run log: 'client' (in the browser, see assets/clientside.js) or 'server'
+RENDER_MODE = os.environ.get('RENDER_MODE', 'client')
+
+# Maximum number of rows sent to the graphs. Longer runs are read from a coarser level of the summary pyramid
+MAX_POINTS = 2000
+
+# Number of rows kept at every level of the summary pyramid, e.g. 10000. When set, the last LIVE_WINDOW steps are kept
+# at full resolution and older ones at a coarser resolution, so that the memory used stays flat during long runs
+LIVE_WINDOW = int(os.environ['LIVE_WINDOW']) if os.environ.get('LIVE_WINDOW') else None
+
+# Bounds of the refresh interval of the auto mode, in milliseconds
+AUTO_MIN_INTERVAL = 500
+AUTO_MAX_INTERVAL = 60 * 1000
+
+# Cache lifetime of the files served from the assets folder. Dash adds the modification time of every asset to its
+# url, so browsers fetch an asset again as soon as it changes
+ASSETS_MAX_AGE = 365 * 24 * 60 * 60
+
+app = dash.Dash(__name__, serve_locally=True)
 server = app.server
+server.config['SEND_FILE_MAX_AGE_DEFAULT'] = ASSETS_MAX_AGE
+
+EMPTY_FIGURE = {'data': [], 'layout': {}}
+
+# Serialized figures, keyed by the version of the run log payload and the display options they were built with
+figure_cache = FigureCache()
+
+collector = None
+if COLLECTOR_ADDRESS:
+    try:
+        collector = MetricsCollector(COLLECTOR_ADDRESS, COLLECTOR_LOG_DIR, capacity=LIVE_WINDOW).start()
+    except OSError as error:
+        # Another worker process already listens on the address, so this one reads the log persisted by the collector
+        print(f"Could not start the metrics collector on {COLLECTOR_ADDRESS}: {error}")
+        LOGFILE = os.path.join(COLLECTOR_LOG_DIR, f'{RUN_ID}.csv')
+
+
+def get_run_store(run=None):
+    """
+    Returns the RunLogStore of the displayed run, from the sweep, the collector, SQLite, the event files or LOGFILE.
+    :param run: Run of RUNS_DIR selected in the dashboard, e.g. a job of the sweep
+    """
+    if RUNS_DIR and run:
+        path = run_log_path(RUNS_DIR, run)
+        return get_store(path, lambda: RunLogStore(path, capacity=LIVE_WINDOW))
+
+    if collector is not None:
+        return collector.get_store(RUN_ID)
+
+    if EVENT_LOGDIR:
+        return get_store(f'events:{EVENT_LOGDIR}',
+                         lambda: RunLogStore(tail=EventFileTail(EVENT_LOGDIR, EVENT_TAGS), capacity=LIVE_WINDOW))
+
+    if SQLITE_DATABASE:
+        return get_store(f'sqlite:{SQLITE_DATABASE}:{RUN_ID}',
+                         lambda: RunLogStore(tail=SQLiteTail(SQLITE_DATABASE, RUN_ID), capacity=LIVE_WINDOW))
+
+    return get_store(LOGFILE, lambda: RunLogStore(LOGFILE, capacity=LIVE_WINDOW))
+
+
+def update_run_store(run=None):
+    """
+    Returns the RunLogStore of the displayed run, updated with the rows logged since it was last read. Callbacks may be
+    served by another worker process than the one which read the log for this refresh, whose store would be stale.
+    """
+    store = get_run_store(run)
+    try:
+        store.update()
+    except FileNotFoundError:
+        pass
+    return store
+
+
+def get_log_path(run=None):
+    """Returns the path of the displayed run log, next to which the profiling control file and profiles are stored."""
+    if RUNS_DIR and run:
+        return run_log_path(RUNS_DIR, run)
+
+    if collector is not None:
+        return collector.filename(RUN_ID)
+
+    if SQLITE_DATABASE:
+        return SQLITE_DATABASE
+
+    if EVENT_LOGDIR:
+        return os.path.join(EVENT_LOGDIR, RUN_ID)
+
+    return LOGFILE
+
+
+def api_run_ids():
+    """Returns the runs served by the metrics API: the runs of RUNS_DIR, the runs sent to the collector, or RUN_ID."""
+    if RUNS_DIR:
+        return list_runs(RUNS_DIR)
+
+    if COLLECTOR_ADDRESS:
+        # Runs evicted from the memory of the collector, and every run in the workers not running the collector, are
+        # read from their persisted log
+        runs = set(list_runs(COLLECTOR_LOG_DIR)) | {RUN_ID}
+        if collector is not None:
+            runs |= set(collector.runs())
+        return sorted(runs)
+
+    return [RUN_ID]
+
+
+def api_run_store(run):
+    if RUNS_DIR:
+        return get_run_store(run) if run in list_runs(RUNS_DIR) else None
+
+    if COLLECTOR_ADDRESS:
+        if run not in api_run_ids():
+            return None
+        if collector is not None:
+            return collector.get_store(run)
+
+        path = os.path.join(COLLECTOR_LOG_DIR, f'{run}.csv')
+        return get_store(path, lambda: RunLogStore(path, capacity=LIVE_WINDOW))
+
+    return get_run_store() if run == RUN_ID else None
+
+
+init_api(server, api_run_store, api_run_ids)
+
 
 # Custom Script for Heroku, switch to demo mode when hosted on Heroku
 if 'DYNO' in os.environ:
@@ -25,10 +190,53 @@ else:
     demo_mode = False
 
 
+# Title, run log columns, trace names, y axis and default display mode of the graph generated by div_graph for every
+# name. The first trace is labelled 'train' and the second 'val' in the smoothing options
+GRAPHS = {
+    'accuracy': {
+        'title': 'Prediction Accuracy',
+        'train_column': 'train accuracy',
+        'val_column': 'val accuracy',
+        'train_name': 'Training',
+        'val_name': 'Validation',
+        'yaxis_title': 'Accuracy',
+        'yaxis_range': [0, 1],
+        'display_mode': 'overlap'
+    },
+    'cross-entropy': {
+        'title': 'Cross Entropy Loss',
+        'train_column': 'train cross entropy',
+        'val_column': 'val cross entropy',
+        'train_name': 'Training',
+        'val_name': 'Validation',
+        'yaxis_title': 'Loss',
+        'yaxis_range': None,
+        'display_mode': 'overlap'
+    },
+    'performance': {
+        'title': 'Training Throughput',
+        'train_column': 'steps per sec',
+        'val_column': 'logging overhead',
+        'train_name': 'Steps/sec',
+        'val_name': 'Logging overhead',
+        'secondary_column': 'examples per sec',
+        'secondary_name': 'Examples/sec',
+        'yaxis_title': None,
+        'yaxis_range': None,
+        'display_mode': 'separate_vertical'
+    }
+}
+
+
 def div_graph(name):
     """Generates an html Div containing graph and control options for smoothing and display, given the name"""
     return html.Div([
-        html.Div(
+        html.Div([
+            dcc.Graph(id=f'{name}-graph'),
+
+            # Options of the graph, read by the callback building the figure
+            dcc.Store(id=f'store-{name}-graph-options', data=GRAPHS[name])
+        ],
             id=f'div-{name}-graph',
             className="ten columns"
         ),
@@ -39,8 +247,8 @@ def div_graph(name):
 
                 dcc.Checklist(
                     options=[
-                        {'label': ' Training', 'value': 'train'},
-                        {'label': ' Validation', 'value': 'val'}
+                        {'label': f" {GRAPHS[name]['train_name']}", 'value': 'train'},
+                        {'label': f" {GRAPHS[name]['val_name']}", 'value': 'val'}
                     ],
                     values=[],
                     id=f'checklist-smoothing-options-{name}'
@@ -72,7 +280,7 @@ def div_graph(name):
                         {'label': ' Separate (Vertical)', 'value': 'separate_vertical'},
                         {'label': ' Separate (Horizontal)', 'value': 'separate_horizontal'}
                     ],
-                    value='overlap',
+                    value=GRAPHS[name]['display_mode'],
                     id=f'radio-display-mode-{name}'
                 ),
 
@@ -86,6 +294,101 @@ def div_graph(name):
     )
 
 
+def div_sweep():
+    """
+    Generates an html Div with the selector of the displayed run of RUNS_DIR, and the table of the jobs of the sweep
+    if any. Without RUNS_DIR, it only holds a hidden selector, read by the callbacks of the displayed run.
+    """
+    if not RUNS_DIR or demo_mode:
+        return html.Div(dcc.Dropdown(id='dropdown-run', options=[], value=None), style={'display': 'none'})
+
+    return html.Div([
+        html.Div([
+            html.P("Sweep run:" if SWEEP_DIR else "Run:", style={'font-weight': 'bold', 'margin-bottom': '0px'}),
+
+            dcc.Dropdown(
+                id='dropdown-run',
+                options=[],
+                clearable=False
+            ),
+
+            html.A("Browse all runs", href='/runs')
+        ],
+            className="two columns"
+        ),
+
+        html.Div(
+            id='div-sweep-table',
+            className="ten columns",
+            style={'overflow-x': 'auto'}
+        ) if SWEEP_DIR else None
+    ],
+        className="row",
+        style={'margin-bottom': '20px'}
+    )
+
+
+def div_histograms():
+    """Generates an html Div containing the heatmap of the distribution of a tensor over the steps, and its selector"""
+    return html.Div([
+        html.Div(
+            dcc.Graph(id='histogram-graph'),
+            className="ten columns"
+        ),
+
+        html.Div([
+            html.P("Distribution of:", style={'font-weight': 'bold', 'margin-bottom': '0px', 'margin-top': '10px'}),
+
+            dcc.Dropdown(
+                id='dropdown-histogram-tensor',
+                options=[],
+                clearable=False,
+                searchable=False
+            )
+        ],
+            className="two columns"
+        )
+    ],
+        className="row"
+    )
+
+
+def div_profiling():
+    """Generates an html Div with the controls requesting a profile of the running training script, and the list of
+    captured profiles"""
+    return html.Div([
+        html.Div([
+            html.P("Profiling:", style={'font-weight': 'bold', 'margin-bottom': '0px'}),
+
+            dcc.Input(
+                id='input-profile-steps',
+                type='number',
+                min=1,
+                max=1000,
+                value=10
+            ),
+
+            html.Button(
+                'Profile next steps',
+                id='button-profile',
+                style={'margin-left': '10px'}
+            ),
+
+            html.Div(id='div-profile-status')
+        ],
+            className="four columns"
+        ),
+
+        html.Div(
+            id='div-profiles',
+            className="eight columns"
+        )
+    ],
+        className="row",
+        style={'margin-top': '20px'}
+    )
+
+
 app.layout = html.Div([
     # Banner display
     html.Div([
@@ -94,7 +397,7 @@ app.layout = html.Div([
             id='title'
         ),
         html.Img(
-            src="https://s3-us-west-1.amazonaws.com/plotly-tutorials/logo/new-branding/dash-logo-by-plotly-stripe-inverted.png"
+            src=app.get_asset_url('dash-logo.svg')
         )
     ],
         className="banner"
@@ -112,7 +415,8 @@ app.layout = html.Div([
                     {'label': 'No Updates', 'value': 'no'},
                     {'label': 'Slow Updates', 'value': 'slow'},
                     {'label': 'Regular Updates', 'value': 'regular'},
-                    {'label': 'Fast Updates', 'value': 'fast'}
+                    {'label': 'Fast Updates', 'value': 'fast'},
+                    {'label': 'Auto Updates', 'value': 'auto'}
                 ],
                 value='regular',
                 className='ten columns',
@@ -131,15 +435,38 @@ app.layout = html.Div([
 
         dcc.Interval(
             id="interval-log-update",
+            interval=1000,
             n_intervals=0
         ),
 
+        # Ticks with interval-log-update while Auto Updates is selected, to adapt its interval
+        dcc.Interval(
+            id="interval-auto",
+            interval=1000,
+            n_intervals=0,
+            disabled=True
+        ),
+
+        # Query string of the page, e.g. ?run=<name> when opened from the run browser
+        dcc.Location(id='url', refresh=False),
+
+        # Jobs of the hyperparameter sweep, and selector of the displayed one
+        div_sweep(),
+
         # Hidden Div Storing JSON-serialized dataframe of run log
         html.Div(id='run-log-storage', style={'display': 'none'}),
 
+        # Range of steps the graphs are zoomed into, read from the finer levels of the summary pyramid
+        dcc.Store(id='store-x-range'),
+
         # The html divs storing the graphs and display parameters
         div_graph('accuracy'),
         div_graph('cross-entropy'),
+        div_graph('performance'),
+
+        # There are no weight histograms nor training script to profile in demo mode
+        div_histograms() if not demo_mode else None,
+        div_profiling() if not demo_mode else None,
 
         # Explanation for the demo version of the app
         demo_explanation(demo_mode)
@@ -149,27 +476,20 @@ app.layout = html.Div([
 ])
 
 
-def update_graph(graph_id,
-                 graph_title,
-                 y_train_index,
-                 y_val_index,
-                 run_log_json,
+def update_graph(run_log_json,
                  display_mode,
                  checklist_smoothing_options,
                  slider_smoothing,
-                 yaxis_title):
+                 graph_options):
     """
-    :param graph_id: ID for Dash callbacks
-    :param graph_title: Displayed on layout
-    :param y_train_index: name of column index for y train we want to retrieve
-    :param y_val_index: name of column index for y val we want to retrieve
+    Builds the figure on the server, when RENDER_MODE is 'server'. Mirrors updateGraph in assets/clientside.js.
     :param run_log_json: the json file containing the data
     :param display_mode: 'separate' or 'overlap'
     :param checklist_smoothing_options: 'train' or 'val'
     :param slider_smoothing: value between 0 and 1, at interval of 0.05
-    :return: dcc Graph object containing the updated figures
+    :param graph_options: title, columns and y axis of the graph, see GRAPHS
+    :return: The updated figure
     """
-
     def smooth(scalars, weight=0.6):
         last = scalars[0]
         smoothed = list()
@@ -180,17 +500,37 @@ def update_graph(graph_id,
         return smoothed
 
     if run_log_json:  # exists
+        # Payloads without a version, if any, are not cached. The smoothing weight only changes the figure if
+        # smoothing is applied to one of the traces
+        version = payload_version(run_log_json)
+        key = (
+            version,
+            graph_options['train_column'],
+            graph_options['val_column'],
+            display_mode,
+            tuple(sorted(checklist_smoothing_options)),
+            slider_smoothing if checklist_smoothing_options else None
+        )
+
+        figure = figure_cache.get(key) if version is not None else None
+        if figure is not None:
+            return figure
+
         layout = go.Layout(
-            title=graph_title,
+            title=graph_options['title'],
             margin=go.Margin(l=50, r=50, b=50, t=50),
-            yaxis={'title': yaxis_title}
+            yaxis={'title': graph_options['yaxis_title']}
         )
 
-        run_log_df = pd.read_json(run_log_json, orient='split')
+        run_log_df = decode_run_log(run_log_json)
+
+        # Logs without the columns of the graph, e.g. without the timing columns of older versions of write_data
+        if graph_options['train_column'] not in run_log_df or graph_options['val_column'] not in run_log_df:
+            return EMPTY_FIGURE
 
         step = run_log_df['step']
-        y_train = run_log_df[y_train_index]
-        y_val = run_log_df[y_val_index]
+        y_train = run_log_df[graph_options['train_column']]
+        y_val = run_log_df[graph_options['val_column']]
 
         # Apply Smoothing if needed
         if 'train' in checklist_smoothing_options:
@@ -203,16 +543,33 @@ def update_graph(graph_id,
             x=step,
             y=y_train,
             mode='lines',
-            name='Training'
+            name=graph_options['train_name']
         )
 
         trace_val = go.Scatter(
             x=step,
             y=y_val,
             mode='lines',
-            name='Validation'
+            name=graph_options['val_name']
         )
 
+        # Optional metric plotted with the training one, on its own y axis on the right
+        trace_secondary = None
+        secondary_column = graph_options.get('secondary_column')
+        if secondary_column in run_log_df and run_log_df[secondary_column].notnull().any():
+            y_secondary = run_log_df[secondary_column]
+            if 'train' in checklist_smoothing_options:
+                y_secondary = smooth(y_secondary, weight=slider_smoothing)
+
+            trace_secondary = go.Scatter(
+                x=step,
+                y=y_secondary,
+                mode='lines',
+                name=graph_options['secondary_name'],
+                xaxis='x',
+                yaxis='y3'
+            )
+
         if display_mode == 'separate_vertical':
             figure = tools.make_subplots(rows=2,
                                          cols=1,
@@ -245,159 +602,445 @@ def update_graph(graph_id,
             )
 
         else:
-            figure = None
+            return EMPTY_FIGURE
+
+        if trace_secondary is not None:
+            figure.add_trace(trace_secondary)
+            figure['layout'].update(yaxis3={'title': graph_options['secondary_name'], 'overlaying': 'y',
+                                            'side': 'right', 'anchor': 'x', 'showgrid': False})
+
+        # Keeps the zoom of the user when the figure is refreshed
+        figure['layout'].update(uirevision=graph_options['title'])
 
-        return dcc.Graph(figure=figure, id=graph_id)
+        yaxis_range = graph_options['yaxis_range']
+        if yaxis_range is not None:
+            if display_mode in ['separate_horizontal', 'overlap']:
+                figure['layout']['yaxis'].update(range=yaxis_range)
+            else:
+                figure['layout']['yaxis1'].update(range=yaxis_range)
+                figure['layout']['yaxis2'].update(range=yaxis_range)
 
-    return dcc.Graph(id=graph_id)
+        return figure_cache.put(key, figure) if version is not None else figure
 
+    return EMPTY_FIGURE
 
-demo_callbacks(app, demo_mode)
 
+demo_callbacks(app, demo_mode, encoding=PAYLOAD_ENCODING)
 
-@app.callback(Output('interval-log-update', 'interval'),
-              [Input('dropdown-interval-control', 'value')])
-def update_interval_log_update(interval_rate):
+
+def run_finished(run):
+    """Returns True if the displayed run is a job of the sweep that has finished."""
+    if not SWEEP_DIR or not run:
+        return False
+
+    manifest = load_manifest(SWEEP_DIR)
+    return any(job['run'] == run and job['status'] in ('done', 'failed') for job in (manifest or {}).get('jobs', []))
+
+
+def auto_interval(run, interval):
+    """
+    Returns the refresh interval of the auto mode, in milliseconds, within AUTO_MIN_INTERVAL and AUTO_MAX_INTERVAL,
+    see ArrivalRate.refresh_interval. The interval also doubles at every refresh once the job of the sweep finished.
+    :param interval: Current interval
+    """
+    if demo_mode:
+        return 1000
+
+    return update_run_store(run).arrivals.refresh_interval(interval, AUTO_MIN_INTERVAL, AUTO_MAX_INTERVAL,
+                                                           finished=run_finished(run))
+
+
+# interval-auto only ticks in auto mode, so that the other modes do not send a request per refresh for this callback
+@app.callback([Output('interval-log-update', 'interval'),
+               Output('interval-auto', 'interval'),
+               Output('interval-auto', 'disabled')],
+              [Input('dropdown-interval-control', 'value'),
+               Input('interval-auto', 'n_intervals')],
+              [State('dropdown-run', 'value'),
+               State('interval-log-update', 'interval'),
+               State('interval-auto', 'disabled')])
+def update_interval_log_update(interval_rate, _, run, interval, auto_disabled):
     if interval_rate == 'fast':
-        return 500
+        new_interval = 500
 
     elif interval_rate == 'regular':
-        return 1000
+        new_interval = 1000
 
     elif interval_rate == 'slow':
-        return 5 * 1000
+        new_interval = 5 * 1000
 
     # Refreshes every 24 hours
     elif interval_rate == 'no':
-        return 24 * 60 * 60 * 1000
+        new_interval = 24 * 60 * 60 * 1000
+
+    # Follows the rate at which the run logs rows
+    else:
+        new_interval = auto_interval(run, interval)
+
+    # Setting the interval restarts the timer, so it is only set when it changes
+    disabled = interval_rate != 'auto'
+    if new_interval == interval and disabled == auto_disabled:
+        raise PreventUpdate
+
+    return new_interval, new_interval, disabled
+
+
+if RUNS_DIR and not demo_mode:
+    sparkline_cache = SparklineCache(RUNS_DIR)
+
+    def sweep_jobs():
+        manifest = load_manifest(SWEEP_DIR)
+        return manifest['jobs'] if manifest else []
+
+    @app.callback(Output('dropdown-run', 'options'),
+                  [Input('interval-log-update', 'n_intervals')])
+    def update_run_options(_):
+        if SWEEP_DIR:
+            return [{'label': f"{job['run']} ({job['status']})", 'value': job['run']} for job in sweep_jobs()]
+        return [{'label': run, 'value': run} for run in list_runs(RUNS_DIR)]
+
+    @app.callback(Output('dropdown-run', 'value'),
+                  [Input('dropdown-run', 'options'),
+                   Input('url', 'search')],
+                  [State('dropdown-run', 'value')])
+    def select_run(options, search, value):
+        runs = [option['value'] for option in options or []]
+
+        # A run opened from the run browser, /?run=<name>
+        requested = parse_qs((search or '').lstrip('?')).get('run', [None])[0]
+        if requested in runs and requested != value:
+            return requested
+
+        # Keeping the selection must not reload the displayed run
+        if value in runs or not runs:
+            raise PreventUpdate
+        return runs[0]
+
+    @server.route('/runs')
+    def browse_runs():
+        runs = [(run, *sparkline_cache.summary(run)) for run in list_runs(RUNS_DIR)]
+        return runs_page(runs, title=f'Runs of {RUNS_DIR}')
+
+    @server.route('/sparklines/<run>.svg')
+    def sparkline(run):
+        if run not in list_runs(RUNS_DIR):
+            flask.abort(404)
+
+        svg, version = run_blocking(sparkline_cache.get, run)
+        response = flask.Response(svg, mimetype='image/svg+xml')
+        response.set_etag(version)
+        # Browsers revalidate the sparkline at every visit, and only download it again when the run has grown
+        response.cache_control.no_cache = True
+        return response.make_conditional(flask.request)
+
+
+if SWEEP_DIR and not demo_mode:
+    @app.callback(Output('div-sweep-table', 'children'),
+                  [Input('interval-log-update', 'n_intervals')])
+    def update_sweep_table(_):
+        jobs = sweep_jobs()
+        params = list(jobs[0]['config']) if jobs else []
+
+        rows = []
+        for job in jobs:
+            val_accuracy = update_run_store(job['run']).summary()['val accuracy']
+            rows.append(html.Tr([
+                html.Td(job['run']),
+                *[html.Td(f"{job['config'].get(name):.4g}" if isinstance(job['config'].get(name), float)
+                          else str(job['config'].get(name))) for name in params],
+                html.Td(job['status']),
+                html.Td(val_accuracy['last_step']),
+                html.Td(f"{val_accuracy['last']:.4f}" if val_accuracy['count'] else None),
+                html.Td(f"{val_accuracy['best']:.4f} @ {val_accuracy['best_step']}" if val_accuracy['count'] else None)
+            ]))
+
+        header = html.Tr([html.Th(name) for name in ['Run', *params, 'Status', 'Step', 'Val accuracy', 'Best']])
+        return html.Table([header, *rows])
 
 
 if not demo_mode:
+    histogram_stores = {}
+
+    def get_histogram_store(run=None):
+        """Returns the HistogramStore of the displayed run, whose sidecar log is next to the run log of sweep jobs."""
+        filename = os.path.splitext(get_log_path(run))[0] + '.hist.csv' if RUNS_DIR and run else HISTOGRAM_LOGFILE
+        if filename not in histogram_stores:
+            histogram_stores[filename] = HistogramStore(filename)
+        return histogram_stores[filename]
+
+    @app.callback(Output('dropdown-histogram-tensor', 'options'),
+                  [Input('interval-log-update', 'n_intervals'),
+                   Input('dropdown-run', 'value')])
+    def update_histogram_tensors(_, run):
+        histogram_store = get_histogram_store(run)
+        histogram_store.update()
+        return [{'label': name, 'value': name} for name in histogram_store.names()]
+
+    @app.callback(Output('dropdown-histogram-tensor', 'value'),
+                  [Input('dropdown-histogram-tensor', 'options')],
+                  [State('dropdown-histogram-tensor', 'value')])
+    def select_histogram_tensor(options, value):
+        names = [option['value'] for option in options or []]
+        if value in names:
+            return value
+        return names[0] if names else None
+
+    @app.callback(Output('histogram-graph', 'figure'),
+                  [Input('interval-log-update', 'n_intervals'),
+                   Input('dropdown-histogram-tensor', 'value')],
+                  [State('dropdown-run', 'value')])
+    def update_histogram_graph(_, name, run):
+        if name is None:
+            return EMPTY_FIGURE
+
+        histogram_store = get_histogram_store(run)
+        histogram_store.update()
+        steps, values, density = histogram_store.heatmap(name)
+        if not steps:
+            return EMPTY_FIGURE
+
+        return {
+            'data': [{
+                'type': 'heatmap',
+                'x': steps,
+                'y': values.tolist(),
+                'z': density.tolist(),
+                'colorscale': 'Viridis',
+                'colorbar': {'title': 'Fraction'}
+            }],
+            'layout': {
+                'title': f'Distribution of {name}',
+                'margin': {'l': 50, 'r': 50, 'b': 50, 't': 50},
+                'xaxis': {'title': 'Step'},
+                'yaxis': {'title': 'Value'}
+            }
+        }
+
+    @app.callback(Output('div-profile-status', 'children'),
+                  [Input('button-profile', 'n_clicks')],
+                  [State('input-profile-steps', 'value'),
+                   State('dropdown-run', 'value')])
+    def request_training_profile(n_clicks, steps, run):
+        if n_clicks:
+            # The control file is only seen by training scripts sharing the directory of the run log
+            if COLLECTOR_ADDRESS and not (RUNS_DIR and run):
+                return html.Div("Profiling is not available for runs streamed to the collector.")
+            if SQLITE_DATABASE and not (RUNS_DIR and run):
+                return html.Div("Profiling is not available for runs logged to a SQLite database.")
+
+            request_id = request_profile(get_log_path(run), steps or 1)
+            return html.Div(f"Requested profile {request_id} of the next {steps or 1} steps.")
+
+    @app.callback(Output('div-profiles', 'children'),
+                  [Input('interval-log-update', 'n_intervals')],
+                  [State('dropdown-run', 'value')])
+    def update_div_profiles(_, run):
+        # The run is part of the download URLs, so that they resolve to the profiles directory of its run log
+        url_prefix = f'/profiles/{run}' if RUNS_DIR and run else '/profiles'
+        items = []
+        for request_id, manifest, filenames in list_profiles(get_log_path(run)):
+            if manifest is None:
+                items.append(html.Li(f"{request_id}: capturing..."))
+                continue
+
+            links = [html.A(filename, href=f'{url_prefix}/{request_id}/{filename}', style={'margin-right': '10px'})
+                     for filename in filenames]
+            items.append(html.Li([f"{request_id} (steps {manifest['last_step'] - manifest['steps'] + 1} to "
+                                  f"{manifest['last_step']}): ", *links]))
+
+        return html.Ul(items) if items else None
+
+    @server.route('/profiles/<request_id>/<filename>', defaults={'run': None})
+    @server.route('/profiles/<run>/<request_id>/<filename>')
+    def download_profile(run, request_id, filename):
+        return flask.send_from_directory(profiles_dir(get_log_path(run)), f'{request_id}/{filename}',
+                                         as_attachment=True)
+
+    @app.callback(Output('store-x-range', 'data'),
+                  [Input(f'{name}-graph', 'relayoutData') for name in GRAPHS])
+    def update_x_range(*_):
+        triggered = dash.callback_context.triggered
+        relayout_data = triggered[0]['value'] if triggered else None
+        if not relayout_data:
+            raise PreventUpdate
+
+        # The x axes of the subplots, e.g. xaxis2, all show the steps
+        for key, value in relayout_data.items():
+            axis, _, prop = key.partition('.')
+            if not axis.startswith('xaxis'):
+                continue
+
+            if prop == 'autorange':
+                return None
+            if prop == 'range':
+                return [value[0], value[1]]
+            if prop == 'range[0]' and f'{axis}.range[1]' in relayout_data:
+                return [value, relayout_data[f'{axis}.range[1]']]
+
+        # Other relayout events, e.g. of the y axis, keep the range
+        raise PreventUpdate
+
     @app.callback(Output('run-log-storage', 'children'),
-                  [Input('interval-log-update', 'n_intervals')])
-    def get_run_log(_):
-        names = ['step', 'train accuracy', 'val accuracy', 'train cross entropy', 'val cross entropy']
+                  [Input('interval-log-update', 'n_intervals'),
+                   Input('dropdown-run', 'value'),
+                   Input('store-x-range', 'data')])
+    def get_run_log(_, run, x_range):
+        store = get_run_store(run)
+        x_range = tuple(x_range) if x_range else None
 
         try:
-            run_log_df = pd.read_csv(LOGFILE, names=names)
-            json = run_log_df.to_json(orient='split')
+            store.update()
+            fingerprint, run_log = store.snapshot(max_points=MAX_POINTS, x_range=x_range)
+            if not run_log['step']:
+                return None
+
+            # Identifies the content of the payload, e.g. to look up the figures built from it
+            version = ':'.join(str(value) for value in (run or '',) + fingerprint + (x_range or ()))
+            run_log_json = encode_run_log(run_log, encoding=PAYLOAD_ENCODING, version=version)
         except FileNotFoundError as error:
             print(error)
             print("Please verify if the csv file generated by your model is placed in the correct directory.")
             return None
 
-        return json
+        return run_log_json
 
 
 @app.callback(Output('div-step-display', 'children'),
-              [Input('run-log-storage', 'children')])
-def update_div_step_display(run_log_json):
+              [Input('run-log-storage', 'children')],
+              [State('dropdown-run', 'value')])
+def update_div_step_display(run_log_json, run):
     if run_log_json:
-        run_log_df = pd.read_json(run_log_json, orient='split')
-        return html.H6(f"Step: {run_log_df['step'].iloc[-1]}", style={'margin-top': '3px'})
-
-
-@app.callback(Output('div-accuracy-graph', 'children'),
-              [Input('run-log-storage', 'children'),
-               Input('radio-display-mode-accuracy', 'value'),
-               Input('checklist-smoothing-options-accuracy', 'values'),
-               Input('slider-smoothing-accuracy', 'value')])
-def update_accuracy_graph(run_log_json,
-                          display_mode,
-                          checklist_smoothing_options,
-                          slider_smoothing):
-    graph = update_graph('accuracy-graph',
-                         'Prediction Accuracy',
-                         'train accuracy',
-                         'val accuracy',
-                         run_log_json,
-                         display_mode,
-                         checklist_smoothing_options,
-                         slider_smoothing,
-                         'Accuracy')
+        # The payload only holds the zoomed range of the graphs, which may end before the current step
+        step = decode_columns(run_log_json)['step'][-1] if demo_mode else update_run_store(run).last_step()
+        return html.H6(f"Step: {step}", style={'margin-top': '3px'})
+
+
+for graph_name in GRAPHS:
+    graph_inputs = [
+        Input('run-log-storage', 'children'),
+        Input(f'radio-display-mode-{graph_name}', 'value'),
+        Input(f'checklist-smoothing-options-{graph_name}', 'values'),
+        Input(f'slider-smoothing-{graph_name}', 'value')
+    ]
+    graph_states = [State(f'store-{graph_name}-graph-options', 'data')]
+
+    # Smoothing and display mode only transform the series already loaded in the browser, so by default they are
+    # applied there and moving the slider does not reach the server
+    if RENDER_MODE == 'client':
+        app.clientside_callback(
+            ClientsideFunction(namespace='clientside', function_name='updateGraph'),
+            Output(f'{graph_name}-graph', 'figure'),
+            graph_inputs,
+            graph_states
+        )
+    else:
+        app.callback(Output(f'{graph_name}-graph', 'figure'), graph_inputs, graph_states)(update_graph)
 
-    try:
-        if display_mode in ['separate_horizontal', 'overlap']:
-            graph.figure.layout.yaxis['range'] = [0, 1]
-        else:
-            graph.figure.layout.yaxis1['range'] = [0, 1]
-            graph.figure.layout.yaxis2['range'] = [0, 1]
 
-    except AttributeError:
-        pass
+def get_run_summary(run_log_json, run=None):
+    """
+    Returns the online statistics of every metric of the displayed run. They are maintained by the run store as rows
+    are ingested, so reading them does not depend on the length of the run. In demo mode, there is no store and they
+    are computed from the simulated run log.
+    """
+    if demo_mode:
+        run_log = decode_columns(run_log_json)
+        stats = OnlineStats(list(run_log))
+        for row in zip(*run_log.values()):
+            stats.add(int(row[0]), [float(value) for value in row[1:]])
+        return stats.summary()
 
-    return [graph]
-
-
-@app.callback(Output('div-cross-entropy-graph', 'children'),
-              [Input('run-log-storage', 'children'),
-               Input('radio-display-mode-cross-entropy', 'value'),
-               Input('checklist-smoothing-options-cross-entropy', 'values'),
-               Input('slider-smoothing-cross-entropy', 'value')])
-def update_cross_entropy_graph(run_log_json,
-                               display_mode,
-                               checklist_smoothing_options,
-                               slider_smoothing):
-    graph = update_graph('cross-entropy-graph',
-                         'Cross Entropy Loss',
-                         'train cross entropy',
-                         'val cross entropy',
-                         run_log_json,
-                         display_mode,
-                         checklist_smoothing_options,
-                         slider_smoothing,
-                         'Loss')
-    return [graph]
+    return update_run_store(run).summary()
 
 
-@app.callback(Output('div-current-accuracy-value', 'children'),
-              [Input('run-log-storage', 'children')])
-def update_div_current_accuracy_value(run_log_json):
-    if run_log_json:
-        run_log_df = pd.read_json(run_log_json, orient='split')
+def div_current_values(title, train_stats, val_stats):
+    """Generates the readouts of the current, best and recent values of the training and validation metrics"""
+
+    def readouts(name, stats):
         return [
-            html.P(
-                "Current Accuracy:",
-                style={
-                    'font-weight': 'bold',
-                    'margin-top': '15px',
-                    'margin-bottom': '0px'
-                }
-            ),
-            html.Div(f"Training: {run_log_df['train accuracy'].iloc[-1]:.4f}"),
-            html.Div(f"Validation: {run_log_df['val accuracy'].iloc[-1]:.4f}")
+            html.Div(f"{name}: {stats['last']:.4f}"),
+            html.Div(
+                f"best {stats['best']:.4f} @ {stats['best_step']}, "
+                f"mean(last {stats['window_count']}) {stats['window_mean']:.4f} "
+                f"± {stats['window_variance'] ** 0.5:.4f}",
+                style={'font-size': '1.2rem', 'color': '#777'}
+            )
         ]
 
+    return [
+        html.P(
+            title,
+            style={
+                'font-weight': 'bold',
+                'margin-top': '15px',
+                'margin-bottom': '0px'
+            }
+        ),
+        *readouts("Training", train_stats),
+        *readouts("Validation", val_stats),
+        html.Div(f"Steps since improvement: {val_stats['steps_since_improvement']}")
+    ]
+
+
+@app.callback(Output('div-current-accuracy-value', 'children'),
+              [Input('run-log-storage', 'children')],
+              [State('dropdown-run', 'value')])
+def update_div_current_accuracy_value(run_log_json, run):
+    if run_log_json:
+        summary = get_run_summary(run_log_json, run)
+        return div_current_values("Current Accuracy:", summary['train accuracy'], summary['val accuracy'])
+
 
 @app.callback(Output('div-current-cross-entropy-value', 'children'),
-              [Input('run-log-storage', 'children')])
-def update_div_current_cross_entropy_value(run_log_json):
+              [Input('run-log-storage', 'children')],
+              [State('dropdown-run', 'value')])
+def update_div_current_cross_entropy_value(run_log_json, run):
     if run_log_json:
-        run_log_df = pd.read_json(run_log_json, orient='split')
-        return [
+        summary = get_run_summary(run_log_json, run)
+        return div_current_values("Current Loss:", summary['train cross entropy'], summary['val cross entropy'])
+
+
+@app.callback(Output('div-current-performance-value', 'children'),
+              [Input('run-log-storage', 'children')],
+              [State('dropdown-run', 'value')])
+def update_div_current_performance_value(run_log_json, run):
+    if run_log_json:
+        # Read from the statistics of the run rather than from the payload, which only holds the zoomed range
+        summary = get_run_summary(run_log_json, run)
+
+        def last_value(name):
+            return summary[name]['last'] if name in summary else NAN
+
+        # Logs written by older versions of write_data, and event files, may have no timing columns, or only NaN
+        steps_per_sec, examples_per_sec, overhead = (last_value(name) for name in
+                                                     ('steps per sec', 'examples per sec', 'logging overhead'))
+        if steps_per_sec != steps_per_sec:
+            return None
+
+        children = [
             html.P(
-                "Current Loss:",
+                "Current Throughput:",
                 style={
                     'font-weight': 'bold',
                     'margin-top': '15px',
                     'margin-bottom': '0px'
                 }
             ),
-            html.Div(f"Training: {run_log_df['train cross entropy'].iloc[-1]:.4f}"),
-            html.Div(f"Validation: {run_log_df['val cross entropy'].iloc[-1]:.4f}")
+            html.Div(f"Steps/sec: {steps_per_sec:.2f}")
         ]
+        # Examples/sec are only logged when write_data is given the batch size
+        if examples_per_sec == examples_per_sec:
+            children.append(html.Div(f"Examples/sec: {examples_per_sec:.1f}"))
+        if overhead == overhead:
+            children.append(html.Div(f"Logging overhead: {100 * overhead:.2f}%"))
+
+        return children
 
 
-external_css = [
-    "https://cdnjs.cloudflare.com/ajax/libs/normalize/7.0.0/normalize.min.css",  # Normalize the CSS
-    "https://fonts.googleapis.com/css?family=Open+Sans|Roboto"  # Fonts
-    "https://maxcdn.bootstrapcdn.com/font-awesome/4.7.0/css/font-awesome.min.css",
-    "https://cdn.rawgit.com/xhlulu/0acba79000a3fd1e6f552ed82edb8a64/raw/dash_template.css",
-    "https://rawgit.com/plotly/dash-live-model-training/master/custom_styles.css"
-]
+@server.route('/stats/figure-cache')
+def figure_cache_stats():
+    return flask.jsonify(figure_cache.info())
 
-for css in external_css:
-    app.css.append_css({"external_url": css})
 
 # Running the server
 if __name__ == '__main__':
@@ -0,0 +1,151 @@
+/*
+ * Clientside callbacks of the Live Model Training Viewer.
+ *
+ * The run log is decoded and transformed (smoothing, display mode) in the browser, so that changing a view option
+ * does not make a round trip to the server. updateGraph mirrors update_graph in app.py.
+ */
+
+var EMPTY_FIGURE = {data: [], layout: {}};
+
+var TYPED_ARRAYS = {
+    int32: Int32Array,
+    float32: Float32Array,
+    float64: Float64Array
+};
+
+/*
+ * Decodes the content of the run-log-storage div, in either of the encodings of payload.encode_run_log,
+ * into an object mapping the column names to arrays.
+ */
+function decodeRunLog(runLogJson) {
+    var payload = JSON.parse(runLogJson);
+    var columns = {};
+
+    if (payload.format === 'columnar-b64') {
+        payload.columns.forEach(function (column) {
+            var binary = atob(column.data);
+            var bytes = new Uint8Array(binary.length);
+            for (var i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i);
+            }
+            columns[column.name] = new TYPED_ARRAYS[column.dtype](bytes.buffer);
+        });
+    } else {
+        // pandas split orientation
+        payload.columns.forEach(function (name, j) {
+            columns[name] = payload.data.map(function (row) {
+                return row[j];
+            });
+        });
+    }
+
+    return columns;
+}
+
+function hasValues(values) {
+    return Array.prototype.some.call(values, function (value) {
+        return value === value && value !== null;
+    });
+}
+
+function smooth(scalars, weight) {
+    var smoothed = new Array(scalars.length);
+    var last = scalars[0];
+    for (var i = 0; i < scalars.length; i++) {
+        last = last * weight + (1 - weight) * scalars[i];
+        smoothed[i] = last;
+    }
+    return smoothed;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        updateGraph: function (runLogJson, displayMode, smoothingOptions, smoothingWeight, options) {
+            if (!runLogJson) {
+                return EMPTY_FIGURE;
+            }
+
+            var columns = decodeRunLog(runLogJson);
+            // Logs without the columns of the graph, e.g. without the timing columns of older versions of write_data
+            if (!(options.train_column in columns) || !(options.val_column in columns)) {
+                return EMPTY_FIGURE;
+            }
+
+            var step = Array.from(columns['step']);
+            var yTrain = Array.from(columns[options.train_column]);
+            var yVal = Array.from(columns[options.val_column]);
+
+            // Apply Smoothing if needed
+            if (smoothingOptions && smoothingOptions.indexOf('train') !== -1) {
+                yTrain = smooth(yTrain, smoothingWeight);
+            }
+            if (smoothingOptions && smoothingOptions.indexOf('val') !== -1) {
+                yVal = smooth(yVal, smoothingWeight);
+            }
+
+            var traceTrain = {x: step, y: yTrain, mode: 'lines', type: 'scatter', name: options.train_name};
+            var traceVal = {x: step, y: yVal, mode: 'lines', type: 'scatter', name: options.val_name};
+
+            // Optional metric plotted with the training one, on its own y axis on the right
+            var traceSecondary = null;
+            var secondary = options.secondary_column && columns[options.secondary_column];
+            if (secondary && hasValues(secondary)) {
+                var ySecondary = Array.from(secondary);
+                if (smoothingOptions && smoothingOptions.indexOf('train') !== -1) {
+                    ySecondary = smooth(ySecondary, smoothingWeight);
+                }
+                traceSecondary = {
+                    x: step, y: ySecondary, mode: 'lines', type: 'scatter', name: options.secondary_name,
+                    xaxis: 'x', yaxis: 'y3'
+                };
+            }
+
+            var layout = {
+                title: options.title,
+                margin: {l: 50, r: 50, b: 50, t: 50},
+                // Keeps the zoom of the user when the figure is refreshed
+                uirevision: options.title
+            };
+            var yaxis = {title: options.yaxis_title};
+            if (options.yaxis_range) {
+                yaxis.range = options.yaxis_range;
+            }
+
+            if (displayMode === 'separate_vertical') {
+                traceTrain.xaxis = 'x';
+                traceTrain.yaxis = 'y';
+                traceVal.xaxis = 'x2';
+                traceVal.yaxis = 'y2';
+
+                layout.xaxis = {domain: [0, 1], anchor: 'y'};
+                layout.xaxis2 = {domain: [0, 1], anchor: 'y2'};
+                layout.yaxis = Object.assign({}, yaxis, {domain: [0.575, 1], anchor: 'x'});
+                layout.yaxis2 = Object.assign({}, yaxis, {domain: [0, 0.425], anchor: 'x2'});
+
+            } else if (displayMode === 'separate_horizontal') {
+                traceTrain.xaxis = 'x';
+                traceVal.xaxis = 'x2';
+
+                layout.xaxis = {domain: [0, 0.45], anchor: 'y'};
+                layout.xaxis2 = {domain: [0.55, 1], anchor: 'y'};
+                layout.yaxis = Object.assign({}, yaxis, {anchor: 'x'});
+
+            } else if (displayMode === 'overlap') {
+                layout.yaxis = yaxis;
+
+            } else {
+                return EMPTY_FIGURE;
+            }
+
+            var data = [traceTrain, traceVal];
+            if (traceSecondary) {
+                data.push(traceSecondary);
+                layout.yaxis3 = {
+                    title: options.secondary_name, overlaying: 'y', side: 'right', anchor: 'x', showgrid: false
+                };
+            }
+
+            return {data: data, layout: layout};
+        }
+    }
+});
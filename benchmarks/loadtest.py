@@ -0,0 +1,349 @@
+"""
+Concurrent-viewer load test of the dashboard, entirely on localhost.
+
+Starts the app with gunicorn (using gunicorn.conf.py) on a local port, replays a run log from demo_run_logs into the
+live log path at a fixed number of rows per second, and simulates concurrent dashboard clients. Every client
+polls the server like a browser does at each tick of the interval: it posts every server-side callback of the app
+triggered by the tick (run log, histograms, profile list, sweep table...), then the callbacks triggered by their
+outputs, with the values it received, at the interval set by the app. With --sweep, the log is replayed as the job
+of a sweep, so that the callbacks of the sweep are exercised as well.
+
+For every interval setting, prints the p50/p99 latency of the callback requests, the error rate, and the CPU usage
+and resident memory of the server processes (read from /proc), as JSON.
+
+Usage: python benchmarks/loadtest.py --clients 200 --rows-per-sec 20 --intervals fast regular slow auto --duration 30
+       python benchmarks/loadtest.py --clients 50 --sweep
+"""
+import argparse
+import csv
+import gzip
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# dropdown-interval-control choices, see update_interval_log_update in app.py
+INTERVALS = ['fast', 'regular', 'slow', 'auto']
+
+
+def replay(source, destination, rows_per_sec, stop):
+    """
+    Appends the rows of the source log to the destination, at the given rate, like a training script would. The
+    elapsed time of every row is the time of the replay, which the auto interval follows.
+    """
+    from runlog import METRIC_COLUMNS
+
+    with open(source) as file:
+        rows = list(csv.reader(file))
+
+    if os.path.exists(destination):
+        os.remove(destination)
+
+    start = time.monotonic()
+    for i, row in enumerate(rows):
+        delay = start + i / rows_per_sec - time.monotonic()
+        if stop.wait(max(delay, 0)):
+            return
+
+        with open(destination, 'a', newline='') as file:
+            elapsed = f'{i / rows_per_sec:.3f}'
+            csv.writer(file).writerow(row[:len(METRIC_COLUMNS)] + [elapsed] + row[len(METRIC_COLUMNS) + 1:])
+
+
+def get_json(port, path):
+    """Fetches and decodes a JSON document served by the app, e.g. its layout."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+        response = connection.getresponse()
+        return json.loads(read_body(response))
+    finally:
+        connection.close()
+
+
+def read_body(response):
+    data = response.read()
+    if response.getheader('Content-Encoding') == 'gzip':
+        data = gzip.decompress(data)
+    return data
+
+
+def layout_props(layout):
+    """Returns a dict mapping the (id, property) of every component of the layout with an id to its initial value."""
+    props = {}
+    nodes = [layout]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+        elif isinstance(node, dict) and 'props' in node:
+            component_props = node['props']
+            if 'id' in component_props:
+                props.update({(component_props['id'], name): value for name, value in component_props.items()})
+            nodes.append(component_props.get('children'))
+    return props
+
+
+def parse_output(output):
+    """Returns the list of (id, property) of the output of a callback, '..a.b...c.d..' for multiple outputs."""
+    if output.startswith('..'):
+        return [tuple(part.rsplit('.', 1)) for part in output[2:-2].split('...')]
+    return [tuple(output.rsplit('.', 1))]
+
+
+class Client(threading.Thread):
+    """
+    Simulated dashboard, polling the server over a keep-alive connection. Like dash-renderer, it keeps the properties
+    of the components, and posts every server-side callback whose inputs changed, starting with the page load and
+    then the n_intervals of the enabled intervals at every tick, until no output changes anymore. Clientside callbacks
+    run in the browser and are skipped. The client waits for the interval set by the app between two ticks.
+    """
+
+    # Rounds of callbacks triggered by the outputs of the previous ones, per tick
+    MAX_ROUNDS = 10
+
+    def __init__(self, port, interval_name, layout, dependencies, stop):
+        super().__init__(daemon=True)
+        self.port = port
+        self.stop = stop
+        self.props = layout_props(layout)
+        self.props[('dropdown-interval-control', 'value')] = interval_name
+        self.callbacks = [callback for callback in dependencies if not callback.get('clientside_function')]
+        self.latencies = []
+        self.errors = 0
+
+    @property
+    def interval(self):
+        return self.props.get(('interval-log-update', 'interval')) or 1000
+
+    def post(self, connection, body):
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/_dash-update-component', body=body,
+                               headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+            response = connection.getresponse()
+            data = read_body(response)
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            connection.close()
+            return None
+
+        self.latencies.append(time.perf_counter() - start)
+        # Callbacks which do not update their output answer 204
+        if response.status not in (200, 204):
+            self.errors += 1
+            return None
+
+        return data or None
+
+    def request(self, callback, changed):
+        def values(dependencies):
+            return [dict(dependency, value=self.props.get((dependency['id'], dependency['property'])))
+                    for dependency in dependencies]
+
+        return json.dumps({
+            'output': callback['output'],
+            'inputs': values(callback['inputs']),
+            'state': values(callback.get('state', [])),
+            'changedPropIds': [f"{dependency['id']}.{dependency['property']}" for dependency in callback['inputs']
+                               if (dependency['id'], dependency['property']) in changed]
+        })
+
+    def fire(self, connection, changed):
+        """Posts the callbacks triggered by the changed properties, then those triggered by their outputs."""
+        for _ in range(self.MAX_ROUNDS):
+            triggered = [callback for callback in self.callbacks
+                         if any((dependency['id'], dependency['property']) in changed
+                                for dependency in callback['inputs'])]
+            if not triggered:
+                return
+
+            updated = set()
+            for callback in triggered:
+                data = self.post(connection, self.request(callback, changed))
+                if data is None:
+                    continue
+
+                response = json.loads(data)['response']
+                for component_id, prop in parse_output(callback['output']):
+                    props = response['props'] if 'props' in response else response.get(component_id, {})
+                    if prop in props:
+                        self.props[(component_id, prop)] = props[prop]
+                        updated.add((component_id, prop))
+
+            changed = updated
+
+    def run(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+
+        # Page load: every callback with an input in the layout
+        self.fire(connection, set(self.props))
+
+        # Spread the clients over the interval, like viewers opening the page at different times
+        if self.stop.wait(self.interval / 1000 * (hash(self.name) % 1000) / 1000):
+            return
+
+        while not self.stop.is_set():
+            tick = time.monotonic()
+            # The intervals set by the app tick together, e.g. interval-auto in auto mode
+            changed = {(component_id, prop) for component_id, prop in self.props
+                       if prop == 'n_intervals' and not self.props.get((component_id, 'disabled'))}
+            for key in changed:
+                self.props[key] = (self.props[key] or 0) + 1
+            self.fire(connection, changed)
+
+            self.stop.wait(max(self.interval / 1000 - (time.monotonic() - tick), 0))
+
+        connection.close()
+
+
+def process_tree(pid):
+    """Returns the pid of the process and of all its descendants."""
+    pids = [pid]
+    for child in pids:
+        try:
+            with open(f'/proc/{child}/task/{child}/children') as file:
+                pids.extend(int(value) for value in file.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def resource_usage(pid):
+    """Returns the total CPU time in seconds and the total resident memory in bytes of a process tree."""
+    ticks = os.sysconf('SC_CLK_TCK')
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    cpu_time = rss = 0
+
+    for child in process_tree(pid):
+        try:
+            with open(f'/proc/{child}/stat') as file:
+                # The command name may contain spaces, the fields are counted after it
+                fields = file.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+
+        cpu_time += (int(fields[11]) + int(fields[12])) / ticks
+        rss += int(fields[21]) * page_size
+
+    return cpu_time, rss
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The server did not start on port {port}")
+
+
+def run(args, interval_name, log_path):
+    stop = threading.Event()
+    replayer = threading.Thread(target=replay, args=(args.log, log_path, args.rows_per_sec, stop), daemon=True)
+    replayer.start()
+
+    layout = get_json(args.port, '/_dash-layout')
+    dependencies = get_json(args.port, '/_dash-dependencies')
+    clients = [Client(args.port, interval_name, layout, dependencies, stop) for _ in range(args.clients)]
+    cpu_start, _ = resource_usage(args.server_pid)
+    wall_start = time.monotonic()
+    max_rss = 0
+
+    for client in clients:
+        client.start()
+
+    while time.monotonic() - wall_start < args.duration:
+        time.sleep(0.5)
+        max_rss = max(max_rss, resource_usage(args.server_pid)[1])
+
+    stop.set()
+    for client in clients:
+        client.join()
+
+    cpu_end, rss = resource_usage(args.server_pid)
+    wall_time = time.monotonic() - wall_start
+    latencies = [latency for client in clients for latency in client.latencies]
+    errors = sum(client.errors for client in clients)
+
+    return {
+        'interval': interval_name,
+        'clients': args.clients,
+        'rows_per_sec': args.rows_per_sec,
+        'requests': len(latencies),
+        'requests_per_sec': len(latencies) / wall_time,
+        'p50_ms': 1000 * percentile(latencies, 0.5) if latencies else None,
+        'p99_ms': 1000 * percentile(latencies, 0.99) if latencies else None,
+        'error_rate': errors / max(len(latencies) + errors, 1),
+        'server_cpu_percent': 100 * (cpu_end - cpu_start) / wall_time,
+        'server_max_rss_mb': max(max_rss, rss) / 2 ** 20
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--log', default=os.path.join(ROOT, 'demo_run_logs', 'mnist_cnn_run_log.csv'),
+                        help='Run log replayed into the live log path')
+    parser.add_argument('--rows-per-sec', type=float, default=10., help='Rate at which rows are appended to the log')
+    parser.add_argument('--clients', type=int, default=50, help='Number of concurrent dashboard clients')
+    parser.add_argument('--intervals', nargs='+', default=['regular'], choices=INTERVALS,
+                        help='Interval settings to test, one run each')
+    parser.add_argument('--sweep', action='store_true', help='Replay the log as the running job of a sweep')
+    parser.add_argument('--duration', type=float, default=30., help='Duration of every run, in seconds')
+    parser.add_argument('--port', type=int, default=8060, help='Local port of the server')
+    parser.add_argument('--gunicorn-args', default='', help='Extra arguments for gunicorn, e.g. "--workers 2"')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    log_path = os.path.join(workdir, 'run_log.csv')
+
+    env = dict(os.environ, LOGFILE=log_path, HISTOGRAM_LOGFILE=os.path.join(workdir, 'run_log.hist.csv'))
+    env.pop('DYNO', None)
+    for variable in ('SWEEP_DIR', 'RUNS_DIR', 'COLLECTOR_ADDRESS', 'SQLITE_DATABASE', 'EVENT_LOGDIR'):
+        env.pop(variable, None)
+
+    if args.sweep:
+        from sweep import MANIFEST, run_log_path
+
+        # A single running job, displayed once the dashboard selects it
+        log_path = run_log_path(workdir, 'job000')
+        with open(os.path.join(workdir, MANIFEST), 'w') as file:
+            json.dump({'example': 'mnist_deep', 'workers': 1, 'threads_per_job': 1, 'jobs': [
+                {'run': 'job000', 'config': {'learning_rate': 1e-4}, 'status': 'running', 'returncode': None}
+            ]}, file)
+        env['SWEEP_DIR'] = workdir
+    command = [sys.executable, '-m', 'gunicorn', 'app:server', '--config', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{args.port}'] + args.gunicorn_args.split()
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    args.server_pid = server.pid
+
+    try:
+        wait_until_ready(args.port)
+        results = [run(args, interval_name, log_path) for interval_name in args.intervals]
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Training throughput benchmark of the logging modes of tfutils.
+
+Trains every example model on the CPU for a fixed number of steps, on synthetic batches so that no dataset is
+downloaded, once without logging and once per logging mode:
+* range<N>: write_data every N steps, evaluating the train metrics with an extra forward pass,
+* cadence: write_data with a LogCadence keeping the overhead under 2% of the training time,
+* streaming: write_data every 5 steps, with the train metrics accumulated by the training step (StreamingTrainMetrics),
+* sqlite: write_data every 5 steps into a SQLiteSink instead of the csv file.
+
+Prints the steps per second of every model and mode, and the overhead relative to no logging, as JSON. With --budget,
+exits with a non-zero status if a mode exceeds its overhead budget, so that it can gate changes to tfutils.
+
+Usage: python benchmarks/logging_overhead.py --models mnist_softmax mnist_deep --steps 500 --budget cadence=5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The benchmark measures the CPU, even if a GPU is available
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+# Input size, examples script defining the deep model, and default batch size of every example model
+MODELS = {
+    'mnist_softmax': (784, None, 100),
+    'mnist_deep': (784, 'examples/mnist_deep_modified.py', 50),
+    'cifar_softmax': (32 * 32 * 3, None, 100),
+    'cifar_deep': (32 * 32 * 3, 'examples/cifar_deep_modified.py', 50)
+}
+
+MODES = ['none', 'range1', 'range5', 'range20', 'range100', 'cadence', 'streaming', 'sqlite']
+
+
+def load_deepnn(script):
+    """Imports the deepnn function of an example script, without running it."""
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(script))[0],
+                                                  os.path.join(ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.deepnn
+
+
+def build_model(tf, name):
+    """
+    Builds the graph of an example model.
+    :return: A tuple (x, y_, train_step, accuracy, cross_entropy, feed, eval_feed), where feed and eval_feed hold the
+    extra entries of the training and evaluation feed dicts, e.g. the dropout keep probability
+    """
+    n_inputs, script, _ = MODELS[name]
+    x = tf.placeholder(tf.float32, [None, n_inputs])
+    y_ = tf.placeholder(tf.int64, [None])
+
+    if script is None:
+        W = tf.Variable(tf.zeros([n_inputs, 10]))
+        b = tf.Variable(tf.zeros([10]))
+        y = tf.matmul(x, W) + b
+        feed, eval_feed = {}, {}
+        optimizer = tf.train.GradientDescentOptimizer(0.5)
+    else:
+        y, keep_prob = load_deepnn(script)(x)
+        feed, eval_feed = {keep_prob: 0.5}, {keep_prob: 1.0}
+        optimizer = tf.train.AdamOptimizer(1e-4)
+
+    from tfutils import add_eval
+
+    accuracy, cross_entropy = add_eval(y, y_)
+    train_step = optimizer.minimize(cross_entropy)
+    return x, y_, train_step, accuracy, cross_entropy, feed, eval_feed
+
+
+def run(tf, model, mode, steps, warmup, threads, workdir):
+    """
+    Trains the model for warmup + steps steps, logging with the given mode.
+    :return: The number of training steps per second, after the warmup
+    """
+    import numpy as np
+    from sqlitelog import SQLiteSink
+    from tfutils import LogCadence, StreamingTrainMetrics, session_config, write_data
+
+    tf.reset_default_graph()
+    x, y_, train_step, accuracy, cross_entropy, feed, eval_feed = build_model(tf, model)
+    batch_size = MODELS[model][2]
+
+    generator = np.random.RandomState(0)
+    batch = generator.rand(batch_size, MODELS[model][0]).astype(np.float32), generator.randint(0, 10, batch_size)
+    batch_val = generator.rand(batch_size, MODELS[model][0]).astype(np.float32), generator.randint(0, 10, batch_size)
+    feed_dict_step = dict({x: batch[0], y_: batch[1]}, **feed)
+    # The metrics logged by write_data are evaluated without dropout
+    feed_dict_train = dict({x: batch[0], y_: batch[1]}, **eval_feed)
+    feed_dict_val = dict({x: batch_val[0], y_: batch_val[1]}, **eval_feed)
+
+    fetches = [train_step]
+    kwargs = {'filename': os.path.join(workdir, f'{model}_{mode}.csv'), 'batch_size': batch_size}
+    if mode.startswith('range'):
+        kwargs['step_range'] = int(mode[len('range'):])
+    elif mode == 'cadence':
+        kwargs['cadence'] = LogCadence(overhead_budget=0.02, total_steps=warmup + steps)
+    elif mode == 'streaming':
+        kwargs['train_metrics'] = StreamingTrainMetrics(accuracy, cross_entropy)
+        fetches.append(kwargs['train_metrics'].update_op)
+    elif mode == 'sqlite':
+        kwargs['sink'] = SQLiteSink(os.path.join(workdir, f'{model}.db'), run=model)
+
+    with tf.Session(config=session_config(threads, 1 if threads else 0)) as sess, sess.as_default():
+        sess.run(tf.global_variables_initializer())
+
+        for i in range(warmup + steps):
+            if i == warmup:
+                start = time.perf_counter()
+
+            if mode != 'none':
+                write_data(accuracy, cross_entropy, feed_dict_train, feed_dict_val, step=i, **kwargs)
+            sess.run(fetches, feed_dict=feed_dict_step)
+
+        elapsed = time.perf_counter() - start
+
+    if 'sink' in kwargs:
+        kwargs['sink'].close()
+
+    return steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=sorted(MODELS), choices=sorted(MODELS))
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--steps', type=int, default=500, help='Number of measured training steps')
+    parser.add_argument('--warmup', type=int, default=50, help='Number of training steps before the measurement')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per model and mode, the fastest is kept')
+    parser.add_argument('--threads', type=int, default=0, help='TensorFlow intra-op threads, 0 to let it choose')
+    parser.add_argument('--budget', action='append', default=[], metavar='MODE=PERCENT',
+                        help='Maximum overhead of a logging mode, e.g. cadence=5. Can be repeated')
+    args = parser.parse_args()
+
+    budgets = {}
+    for budget in args.budget:
+        mode, _, percent = budget.partition('=')
+        if mode not in MODES or not percent:
+            parser.error(f"Invalid budget '{budget}', expected MODE=PERCENT with MODE in {', '.join(MODES)}")
+        budgets[mode] = float(percent)
+
+    modes = ['none'] + [mode for mode in args.modes if mode != 'none']
+
+    import tensorflow as tf
+
+    results = {}
+    exceeded = []
+    with tempfile.TemporaryDirectory(prefix='logging-overhead-') as workdir:
+        for model in args.models:
+            results[model] = {}
+            for mode in modes:
+                steps_per_sec = max(run(tf, model, mode, args.steps, args.warmup, args.threads, workdir)
+                                    for _ in range(args.repeats))
+                baseline = results[model]['none']['steps_per_sec'] if mode != 'none' else steps_per_sec
+                overhead = 100 * (baseline / steps_per_sec - 1)
+                results[model][mode] = {'steps_per_sec': steps_per_sec, 'overhead_percent': overhead}
+
+                if mode in budgets and overhead > budgets[mode]:
+                    exceeded.append(f"{model}/{mode}: {overhead:.1f}% > {budgets[mode]:.1f}%")
+
+    print(json.dumps(results, indent=2))
+
+    if exceeded:
+        print(f"Logging overhead over budget: {', '.join(exceeded)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
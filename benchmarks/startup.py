@@ -0,0 +1,88 @@
+"""
+Startup benchmark of the dashboard.
+
+Measures, in a fresh interpreter:
+* the import time of app.py,
+* the time to first paint, approximated by the time the server takes to answer every request the browser makes
+  before it can draw the page: the index, the layout, the callback dependencies, every script and stylesheet, and
+  the first run log update.
+
+Prints the measurements as JSON and exits with a non-zero status if one of them exceeds its budget.
+
+Usage: python benchmarks/startup.py [--import-budget SECONDS] [--first-paint-budget SECONDS]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = r'''
+import json
+import re
+import time
+
+start = time.perf_counter()
+import app
+import_time = time.perf_counter() - start
+
+client = app.server.test_client()
+
+start = time.perf_counter()
+index = client.get('/')
+urls = re.findall(r'(?:src|href)="(/[^"]+)"', index.get_data(as_text=True))
+responses = [client.get(url) for url in ['/_dash-layout', '/_dash-dependencies'] + urls]
+responses.append(client.post('/_dash-update-component', json={
+    'output': 'run-log-storage.children',
+    'inputs': [{'id': 'interval-log-update', 'property': 'n_intervals', 'value': 0},
+               {'id': 'dropdown-run', 'property': 'value', 'value': None},
+               {'id': 'store-x-range', 'property': 'data', 'value': None}],
+    'changedPropIds': ['interval-log-update.n_intervals']
+}))
+first_paint_time = time.perf_counter() - start
+
+print(json.dumps({
+    'import_time': import_time,
+    'first_paint_time': first_paint_time,
+    'requests': len(responses) + 1,
+    'errors': [r.status_code for r in [index] + responses if r.status_code >= 400]
+}))
+'''
+
+
+def measure():
+    """Runs the measurement in a new interpreter, so that no module is already imported."""
+    output = subprocess.check_output([sys.executable, '-c', MEASURE], cwd=ROOT)
+    # The last line holds the measurements, anything above is printed by the app
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-budget', type=float, default=2.0, help='Maximum import time of app.py, in seconds')
+    parser.add_argument('--first-paint-budget', type=float, default=0.5,
+                        help='Maximum time to serve the first page load, in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    result = {
+        'import_time': min(run['import_time'] for run in runs),
+        'first_paint_time': min(run['first_paint_time'] for run in runs),
+        'requests': runs[0]['requests'],
+        'errors': runs[0]['errors'],
+        'import_budget': args.import_budget,
+        'first_paint_budget': args.first_paint_budget
+    }
+    print(json.dumps(result, indent=2))
+
+    if (result['errors']
+            or result['import_time'] > args.import_budget
+            or result['first_paint_time'] > args.first_paint_budget):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
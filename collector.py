@@ -0,0 +1,217 @@
+"""
+Metrics collector: a socket listener receiving run log rows from the training processes.
+
+Training scripts send their rows with tfutils.CollectorClient, as newline-delimited JSON messages of the form
+    {"run": "<run id>", "reset": false, "rows": [[step, train accuracy, val accuracy, ...], ...]}
+over TCP (tcp://host:port) or a Unix socket (unix:///path/to/socket). The collector keeps every run in memory in a
+RunLogStore read by the dashboard, and appends the rows to <log_dir>/<run id>.csv in a background thread, so that
+training processes never wait on the disk and never contend for the same file.
+
+Stores of runs that are neither written nor read for a while, or beyond a maximum number of runs, are evicted from
+memory. A run requested again is reloaded from its persisted csv file.
+"""
+import csv
+import errno
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+
+from runlog import CHUNK_SIZE, CSVTail, RunLogStore
+
+
+def parse_address(address):
+    """
+    :param address: 'tcp://host:port' or 'unix:///path/to/socket'
+    :return: A tuple (family, address) where family is 'tcp' or 'unix'
+    """
+    if address.startswith('unix://'):
+        return 'unix', address[len('unix://'):]
+
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                message = json.loads(line.decode('utf-8'))
+            except ValueError as error:
+                print(f"Collector: ignoring malformed message from {self.client_address}: {error}")
+                continue
+
+            self.server.collector.ingest(message)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class MetricsCollector(object):
+    """
+    Receives run log rows over a socket, keeps them in memory and persists them asynchronously.
+    """
+
+    def __init__(self, address, log_dir='.', capacity=None, max_runs=100, idle_timeout=60 * 60):
+        """
+        :param address: 'tcp://host:port' or 'unix:///path/to/socket'
+        :param log_dir: Directory where the csv log of every run is persisted
+        :param capacity: Optional number of rows kept in memory per level of the store of every run, see RunLogStore
+        :param max_runs: Maximum number of runs kept in memory, the least recently used are evicted first
+        :param idle_timeout: Time in seconds after which a run that is neither written nor read is evicted
+        """
+        self.address = address
+        self.log_dir = log_dir
+        self.capacity = capacity
+        self.max_runs = max_runs
+        self.idle_timeout = idle_timeout
+        # Stores of the runs in memory, from the least to the most recently used
+        self.stores = OrderedDict()
+        self._last_used = {}
+        self._stores_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._server = None
+
+    def filename(self, run):
+        """Returns the csv file the rows of the given run are persisted to."""
+        return os.path.join(self.log_dir, f'{os.path.basename(run)}.csv')
+
+    def get_store(self, run):
+        """Returns the in-memory RunLogStore of the given run, reloaded from its csv file if it was evicted."""
+        with self._stores_lock:
+            now = time.monotonic()
+            if run in self.stores:
+                self.stores.move_to_end(run)
+            else:
+                self.stores[run] = self._load(run)
+            self._last_used[run] = now
+            self._evict(now)
+            return self.stores[run]
+
+    def runs(self):
+        """Returns the runs in memory."""
+        with self._stores_lock:
+            return list(self.stores)
+
+    def _load(self, run):
+        store = RunLogStore(capacity=self.capacity)
+
+        # Rows still queued for persistence when the run was evicted are only in the file once written. The file is
+        # ingested chunk by chunk, so that reloading a long run does not hold all of its rows in memory
+        tail = CSVTail(self.filename(run), chunk_size=CHUNK_SIZE)
+        try:
+            rows, _ = tail.read()
+            while rows:
+                store.append_rows(rows)
+                rows, _ = tail.read()
+        except OSError:
+            pass
+        return store
+
+    def _evict(self, now):
+        # The most recently used run, the one being requested, is always kept
+        while len(self.stores) > 1:
+            run = next(iter(self.stores))
+            if len(self.stores) <= self.max_runs and now - self._last_used[run] < self.idle_timeout:
+                break
+
+            del self.stores[run]
+            del self._last_used[run]
+
+    def ingest(self, message):
+        """
+        Adds the rows of a message to the store of its run, and queues them to be persisted.
+        :param message: Dict with the keys 'run', 'rows' and optionally 'reset'
+        """
+        run = str(message.get('run', 'run_log'))
+        rows = message.get('rows', [])
+        reset = bool(message.get('reset', False))
+
+        self.get_store(run).append_rows(rows, reset=reset)
+        self._queue.put((run, rows, reset))
+
+    def _persist(self):
+        while True:
+            batches = [self._queue.get()]
+
+            # Group everything queued in the meantime, so that every file is opened once per batch
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            pending = {}
+            for run, rows, reset in batches:
+                if reset:
+                    # The rows of the previous run are obsolete
+                    pending.pop(run, None)
+                    if os.path.exists(self.filename(run)):
+                        os.remove(self.filename(run))
+                pending.setdefault(run, []).extend(rows)
+
+            for run, rows in pending.items():
+                self._write(run, rows)
+
+    def _write(self, run, rows):
+        if not rows:
+            return
+
+        with open(self.filename(run), 'a', newline='') as file:
+            csv.writer(file, delimiter=',').writerows(rows)
+
+    def start(self):
+        """
+        Starts listening, and persisting the received rows, in background threads.
+        :return: The collector
+        :raises OSError: If another process already listens on the address, e.g. another worker of the app
+        """
+        family, address = parse_address(self.address)
+
+        if family == 'unix':
+            if os.path.exists(address):
+                # Only a socket left by a process which exited is replaced, like TCP addresses raise EADDRINUSE
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    try:
+                        probe.connect(address)
+                    except OSError:
+                        pass
+                    else:
+                        raise OSError(errno.EADDRINUSE, f"Another process listens on '{address}'")
+                os.remove(address)
+            self._server = _UnixServer(address, _Handler)
+        else:
+            self._server = _TCPServer(address, _Handler)
+
+        self._server.collector = self
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        threading.Thread(target=self._server.serve_forever, name='collector-server', daemon=True).start()
+        threading.Thread(target=self._persist, name='collector-persist', daemon=True).start()
+
+        print(f"Collecting metrics on {self.address}, persisted in {os.path.abspath(self.log_dir)}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -3,6 +3,8 @@ import dash_html_components as html
 import pandas as pd
 from dash.dependencies import Input, Output, State
 
+from payload import encode_run_log
+
 
 def demo_explanation(demo_mode):
     if demo_mode:
@@ -68,7 +70,7 @@ def demo_components(demo_mode):
         return []
 
 
-def demo_callbacks(app, demo_mode):
+def demo_callbacks(app, demo_mode, encoding='binary'):
     if demo_mode:
         @app.server.before_first_request
         def load_demo_run_logs():
@@ -100,9 +102,8 @@ def demo_callbacks(app, demo_mode):
                 run_logs = data_dict[simulation_model][demo_dataset]
 
                 run_below_steps = run_logs[run_logs['step'] <= step]
-                json = run_below_steps.to_json(orient='split')
-
-                return json
+                return encode_run_log(run_below_steps, encoding=encoding,
+                                      version=f'demo:{simulation_model}:{demo_dataset}:{step}')
 
         @app.callback(Output('interval-simulated-step', 'n_intervals'),
                       [Input('dropdown-demo-dataset', 'value'),
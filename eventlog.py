@@ -0,0 +1,379 @@
+"""
+Reads the scalar summaries of TensorFlow event files, without TensorFlow.
+
+Event files are sequences of TFRecord records:
+    uint64 length, uint32 masked crc32c of length, byte data[length], uint32 masked crc32c of data
+where every record is a serialized tensorflow.Event protocol buffer. Only the fields leading to scalar values are
+decoded: Event.step, Event.summary.value[].tag, and either Value.simple_value (tf.summary in TensorFlow 1) or a
+scalar Value.tensor (TensorFlow 2).
+
+The crc32c package is used to validate the records if it is installed, otherwise a slower table-based implementation.
+"""
+import os
+import struct
+import sys
+import time
+
+from runlog import COLUMNS, NAN
+
+# Default mapping of scalar tags onto the columns of the run log. Tags of event files in a subdirectory of the log
+# directory are prefixed by its relative path, e.g. 'train/accuracy' for <logdir>/train/events.out.tfevents.*
+DEFAULT_TAGS = {
+    'train/accuracy': 'train accuracy',
+    'train_accuracy': 'train accuracy',
+    'validation/accuracy': 'val accuracy',
+    'val/accuracy': 'val accuracy',
+    'val_accuracy': 'val accuracy',
+    'train/cross_entropy': 'train cross entropy',
+    'train/loss': 'train cross entropy',
+    'train_cross_entropy': 'train cross entropy',
+    'validation/cross_entropy': 'val cross entropy',
+    'validation/loss': 'val cross entropy',
+    'val/cross_entropy': 'val cross entropy',
+    'val/loss': 'val cross entropy',
+    'val_cross_entropy': 'val cross entropy',
+    'global_step/sec': 'steps per sec',
+    'train/global_step/sec': 'steps per sec'
+}
+
+HEADER_SIZE = 12
+FOOTER_SIZE = 4
+
+# Wire types of the protocol buffer encoding
+VARINT, FIXED64, LENGTH_DELIMITED, FIXED32 = 0, 1, 2, 5
+
+# TensorProto.dtype values of the supported scalar tensors
+DT_FLOAT, DT_DOUBLE = 1, 2
+
+
+def _crc32c_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = _crc32c_table()
+
+
+def _crc32c_python(data):
+    crc = 0xFFFFFFFF
+    table = _CRC32C_TABLE
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+try:
+    from crc32c import crc32c
+except ImportError:
+    crc32c = _crc32c_python
+
+
+def masked_crc32c(data):
+    """Returns the crc32c of the data, masked as in the TFRecord format."""
+    crc = crc32c(data)
+    return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+
+def _read_varint(data, position):
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def iter_fields(data):
+    """
+    Decodes the fields of a serialized protocol buffer message.
+    :return: Iterator of (field number, wire type, value), where value is an int for varint fields, and bytes otherwise
+    """
+    position = 0
+    while position < len(data):
+        key, position = _read_varint(data, position)
+        number, wire_type = key >> 3, key & 7
+
+        if wire_type == VARINT:
+            value, position = _read_varint(data, position)
+        elif wire_type == FIXED64:
+            value, position = data[position:position + 8], position + 8
+        elif wire_type == LENGTH_DELIMITED:
+            length, position = _read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        elif wire_type == FIXED32:
+            value, position = data[position:position + 4], position + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+
+        yield number, wire_type, value
+
+
+def _tensor_scalar(data):
+    """Returns the value of a serialized TensorProto holding a single float or double, or None."""
+    dtype = None
+    values = []
+
+    for number, wire_type, value in iter_fields(data):
+        if number == 1 and wire_type == VARINT:
+            dtype = value
+        elif number == 4 and wire_type == LENGTH_DELIMITED:
+            # tensor_content, the raw little-endian values
+            if dtype == DT_FLOAT and len(value) == 4:
+                values.append(struct.unpack('<f', value)[0])
+            elif dtype == DT_DOUBLE and len(value) == 8:
+                values.append(struct.unpack('<d', value)[0])
+        elif number == 5:
+            # float_val, packed or not
+            values.extend(struct.unpack(f'<{len(value) // 4}f', value))
+        elif number == 6:
+            # double_val, packed or not
+            values.extend(struct.unpack(f'<{len(value) // 8}d', value))
+
+    return values[0] if len(values) == 1 else None
+
+
+def parse_event(data):
+    """
+    :param data: Serialized Event protocol buffer
+    :return: A tuple (step, scalars), where scalars is a list of (tag, value)
+    """
+    step = 0
+    scalars = []
+
+    for number, wire_type, value in iter_fields(data):
+        if number == 2 and wire_type == VARINT:
+            # int64 step, negative values being encoded on 10 bytes
+            step = value - (1 << 64) if value >= 1 << 63 else value
+
+        elif number == 5 and wire_type == LENGTH_DELIMITED:
+            for summary_number, _, summary_value in iter_fields(value):
+                if summary_number != 1:
+                    continue
+
+                tag, scalar = None, None
+                for value_number, value_type, field in iter_fields(summary_value):
+                    if value_number == 1:
+                        tag = field.decode('utf-8', 'replace')
+                    elif value_number == 2 and value_type == FIXED32:
+                        scalar = struct.unpack('<f', field)[0]
+                    elif value_number == 8 and value_type == LENGTH_DELIMITED:
+                        scalar = _tensor_scalar(field)
+
+                if tag is not None and scalar is not None:
+                    scalars.append((tag, scalar))
+
+    return step, scalars
+
+
+class RecordReader(object):
+    """
+    Reads the TFRecord records appended to a file since the previous call, by remembering the offset of the first
+    record not read yet. A record still being written is left for the next call.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.offset = 0
+        self.corrupted = False
+        self._inode = None
+
+    def reset(self):
+        self.offset = 0
+        self.corrupted = False
+        self._inode = None
+
+    def read(self):
+        """
+        :return: A tuple (records, reset), where records is the list of the data of the new records, and reset is True
+        if the file was replaced or truncated since the previous call, in which case records contains the whole file.
+        """
+        stat = os.stat(self.filename)
+        reset = False
+
+        if (self._inode is not None and stat.st_ino != self._inode) or stat.st_size < self.offset:
+            self.reset()
+            reset = True
+
+        self._inode = stat.st_ino
+
+        if self.corrupted or stat.st_size - self.offset < HEADER_SIZE + FOOTER_SIZE:
+            return [], reset
+
+        with open(self.filename, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read(stat.st_size - self.offset)
+
+        records = []
+        position = 0
+        while len(data) - position >= HEADER_SIZE:
+            header = data[position:position + 8]
+            length, length_crc = struct.unpack('<QI', data[position:position + HEADER_SIZE])
+
+            if masked_crc32c(header) != length_crc:
+                # The length cannot be trusted, so the following records cannot be found
+                print(f"Corrupted record length at offset {self.offset + position} of {self.filename}, "
+                      f"ignoring the rest of the file", file=sys.stderr)
+                self.corrupted = True
+                break
+
+            end = position + HEADER_SIZE + length + FOOTER_SIZE
+            if end > len(data):
+                break
+
+            record = data[position + HEADER_SIZE:end - FOOTER_SIZE]
+            if masked_crc32c(record) == struct.unpack('<I', data[end - FOOTER_SIZE:end])[0]:
+                records.append(record)
+            else:
+                print(f"Skipping corrupted record at offset {self.offset + position} of {self.filename}",
+                      file=sys.stderr)
+
+            position = end
+
+        self.offset += position
+        return records, reset
+
+
+class EventFileTail(object):
+    """
+    Same interface as runlog.CSVTail, for the event files of a TensorFlow log directory: every call of read() only
+    decodes the records appended since the previous call, and maps the scalar tags onto the columns of the run log.
+
+    The scalars of a step may be spread over several events and files (e.g. <logdir>/train and <logdir>/validation),
+    so a row is only returned once every file has logged scalars and the row has a value for every mapped column seen
+    so far, or once every file has moved past its step. Since evaluation summaries are usually written much less often
+    than training ones, a row still missing columns is also returned once max_lag_rows later steps are pending, or
+    after max_lag_seconds: the live view lags behind training by at most that much, and a value logged later for the
+    step is ignored. A file without scalars yet, e.g. of a validation writer which
+    has only written its header, holds back every row until it logs scalars, for at most grace_period seconds or
+    grace_records records: files which never log scalars (profiler or plugin files) are then no longer waited for.
+    Rows are returned in increasing step order, and steps not greater than the last returned one are ignored: use a
+    new log directory for every run.
+    """
+
+    def __init__(self, logdir, tags=None, columns=COLUMNS, grace_period=60, grace_records=10, max_lag_rows=10,
+                 max_lag_seconds=60):
+        """
+        :param logdir: Log directory of the run, searched recursively for event files
+        :param tags: Dict mapping scalar tags to column names, DEFAULT_TAGS by default
+        :param columns: Names of the columns of the returned rows, starting with the step
+        :param grace_period: Seconds during which a file without scalars holds back the rows, after it is opened
+        :param grace_records: Number of records without scalars after which a file no longer holds back the rows
+        :param max_lag_rows: Number of later pending steps after which a row missing columns is returned
+        :param max_lag_seconds: Seconds after which a row missing columns is returned
+        """
+        self.logdir = logdir
+        self.tags = tags if tags is not None else DEFAULT_TAGS
+        self.columns = columns
+        self.grace_period = grace_period
+        self.grace_records = grace_records
+        self.max_lag_rows = max_lag_rows
+        self.max_lag_seconds = max_lag_seconds
+        self._indices = {name: i for i, name in enumerate(columns)}
+        self.reset()
+
+    def reset(self):
+        self._readers = {}
+        self._last_steps = {}
+        # Opening time and number of records of the files without scalars yet
+        self._silent = {}
+        self._pending = {}
+        # Time at which the first value of every pending step was read
+        self._pending_since = {}
+        self._seen_columns = set()
+        self.last_step = None
+
+    def _event_files(self):
+        if not os.path.isdir(self.logdir):
+            raise FileNotFoundError(f"No such log directory: '{self.logdir}'")
+
+        for directory, _, filenames in os.walk(self.logdir):
+            for filename in sorted(filenames):
+                if '.tfevents.' in filename:
+                    yield os.path.join(directory, filename)
+
+    def _add_event(self, prefix, step, scalars):
+        for tag, value in scalars:
+            column = self.tags.get(prefix + tag)
+            if column not in self._indices:
+                continue
+
+            if step not in self._pending:
+                self._pending[step] = [step] + [NAN] * (len(self.columns) - 1)
+                self._pending_since[step] = time.monotonic()
+            self._pending[step][self._indices[column]] = value
+            self._seen_columns.add(self._indices[column])
+
+    def read(self):
+        """
+        :return: A tuple (rows, reset), where rows is the list of the new complete rows, and reset is True if an event
+        file was replaced or truncated since the previous call, in which case rows contains the whole run.
+        """
+        reset = False
+        for path in self._event_files():
+            if path not in self._readers:
+                self._readers[path] = RecordReader(path)
+                self._silent[path] = [time.monotonic(), 0]
+
+            records, file_reset = self._readers[path].read()
+            if file_reset:
+                self.reset()
+                reset = True
+                return self.read()[0], reset
+
+            relative_dir = os.path.relpath(os.path.dirname(path), self.logdir)
+            prefix = '' if relative_dir == '.' else relative_dir.replace(os.sep, '/') + '/'
+
+            for record in records:
+                try:
+                    step, scalars = parse_event(record)
+                except (ValueError, IndexError, struct.error):
+                    continue
+
+                if scalars:
+                    self._silent.pop(path, None)
+                    self._last_steps[path] = max(step, self._last_steps.get(path, step))
+                    self._add_event(prefix, step, scalars)
+                elif path in self._silent:
+                    self._silent[path][1] += 1
+
+        return self._complete_rows(), reset
+
+    def _complete_rows(self):
+        # Until every file has logged scalars, a row may still miss the columns of the others, of any step
+        now = time.monotonic()
+        for path, (opened, records) in list(self._silent.items()):
+            if now - opened >= self.grace_period or records >= self.grace_records:
+                del self._silent[path]
+        if self._silent:
+            return []
+
+        # Every file has moved past the steps below the watermark
+        watermark = min(self._last_steps.values()) if self._last_steps else None
+
+        rows = []
+        steps = sorted(self._pending)
+        for position, step in enumerate(steps):
+            row = self._pending[step]
+            if self.last_step is not None and step <= self.last_step:
+                del self._pending[step]
+                del self._pending_since[step]
+                continue
+
+            complete = all(row[i] == row[i] for i in self._seen_columns)
+            lagging = (len(steps) - 1 - position >= self.max_lag_rows
+                       or now - self._pending_since[step] >= self.max_lag_seconds)
+            if not complete and not lagging and (watermark is None or step >= watermark):
+                break
+
+            rows.append(self._pending.pop(step))
+            del self._pending_since[step]
+            self.last_step = step
+
+        return rows
@@ -32,6 +32,7 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import os
 import sys
 
 import tensorflow as tf
@@ -42,7 +43,9 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from skimage.transform import rescale
 from skimage import color
-from tfutils import write_data
+from profiling import TrainingProfiler
+from tfutils import (add_histograms, add_run_arguments, run_cadence, session_config, write_data,
+                     write_histograms)
 from sklearn.preprocessing import OneHotEncoder
 
 FLAGS = None
@@ -67,7 +70,7 @@ def deepnn(x):
   x_image = tf.reshape(x, [-1, 32, 32, 3])
 
   # Convolutional layers 1 and 2 - maps 3-color image to 32 feature maps.
-  W_conv1 = weight_variable([3, 3, 3, 32])  # 3x3 filters
+  W_conv1 = weight_variable([3, 3, 3, 32], name='W_conv1')  # 3x3 filters
   b_conv1 = bias_variable([32])
   h_conv1 = tf.nn.relu(conv2d(x_image, W_conv1) + b_conv1)
 
@@ -98,7 +101,7 @@ def deepnn(x):
 
   # Fully connected layer 1 -- after 2 round of downsampling, our 32x32 image
   # is down to 8x8x64 feature maps -- maps this to 512 features.
-  W_fc1 = weight_variable([8 * 8 * 64, 512])
+  W_fc1 = weight_variable([8 * 8 * 64, 512], name='W_fc1')
   b_fc1 = bias_variable([512])
 
   h_pool4_flat = tf.reshape(h_pool4_drop, [-1, 8*8*64])
@@ -128,10 +131,10 @@ def max_pool_2x2(x):
                         strides=[1, 2, 2, 1], padding='SAME')
 
 
-def weight_variable(shape):
+def weight_variable(shape, name=None):
   """weight_variable generates a weight variable of a given shape."""
   initial = tf.truncated_normal(shape, stddev=0.1)
-  return tf.Variable(initial)
+  return tf.Variable(initial, name=name)
 
 
 def bias_variable(shape):
@@ -164,21 +167,29 @@ def main(_):
 
   cross_entropy = tf.reduce_mean(
       tf.nn.softmax_cross_entropy_with_logits_v2(labels=y_, logits=y_conv))
-  train_step = tf.train.AdamOptimizer(1e-4).minimize(cross_entropy)  # RMS is used in keras example, Adam is better
+  # RMS is used in keras example, Adam is better
+  train_step = tf.train.AdamOptimizer(FLAGS.learning_rate).minimize(cross_entropy)
   correct_prediction = tf.equal(tf.argmax(y_conv, 1), tf.argmax(y_, 1))
   accuracy = tf.reduce_mean(tf.cast(correct_prediction, tf.float32))
 
-  with tf.Session() as sess:
+  # Histograms of the weights of the first convolutional and fully connected layers
+  histograms = add_histograms({v.op.name: v for v in tf.trainable_variables() if v.op.name in ['W_conv1', 'W_fc1']})
+
+  profiler = TrainingProfiler(FLAGS.log_file)
+
+  with tf.Session(config=session_config(FLAGS.intra_op_threads, FLAGS.inter_op_threads)) as sess:
     y_train = OneHotEncoder(sparse=False).fit_transform(y_train)
     y_val = OneHotEncoder(sparse=False).fit_transform(y_val)
 
     sess.run(tf.global_variables_initializer())
-    for i in range(20001):
-      start_train = i * 50 % y_train.shape[0]
-      end_train = start_train + 50
+    # Logs every 5 steps, or within the overhead budget and always at the last step with --overhead_budget
+    cadence = run_cadence(FLAGS)
+    for i in range(FLAGS.steps + 1):
+      start_train = i * FLAGS.batch_size % y_train.shape[0]
+      end_train = start_train + FLAGS.batch_size
 
-      start_val = i * 50 % y_val.shape[0]
-      end_val = start_val + 50
+      start_val = i * FLAGS.batch_size % y_val.shape[0]
+      end_val = start_val + FLAGS.batch_size
 
       batch = (X_train[start_train:end_train], y_train[start_train:end_train])
       batch_val = (X_val[start_val:end_val], y_val[start_val:end_val])
@@ -191,14 +202,21 @@ def main(_):
         cross_entropy=cross_entropy,
         feed_dict_train=feed_dict_train,
         feed_dict_val=feed_dict_val,
-        step=i
+        step=i,
+        filename=FLAGS.log_file,
+        batch_size=FLAGS.batch_size,
+        cadence=cadence
       )
+      # Writes the weight histograms into the sidecar log file
+      write_histograms(histograms, step=i, filename=os.path.splitext(FLAGS.log_file)[0] + '.hist.csv')
 
       if i % 100 == 0:
         train_accuracy = accuracy.eval(feed_dict={
             x: batch[0], y_: batch[1], keep_prob: 1.0})
         print('step %d, training accuracy %g' % (i, train_accuracy))
-      train_step.run(feed_dict={x: batch[0], y_: batch[1], keep_prob: 0.5})
+      # Traces the next steps when a profile is requested from the dashboard
+      sess.run(train_step, feed_dict={x: batch[0], y_: batch[1], keep_prob: 0.5}, **profiler.run_kwargs(i))
+      profiler.after_step(i)
 
     print('test accuracy %g' % accuracy.eval(feed_dict={
         x: x_test_vec, y_: y_test, keep_prob: 1.0}))
@@ -208,5 +226,6 @@ if __name__ == '__main__':
   parser.add_argument('--data_dir', type=str,
                       default='/tmp/tensorflow/mnist/input_data',
                       help='Directory for storing input data')
+  add_run_arguments(parser, learning_rate=1e-4, batch_size=50, steps=20000)
   FLAGS, unparsed = parser.parse_known_args()
   tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
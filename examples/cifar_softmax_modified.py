@@ -38,7 +38,7 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from skimage.transform import rescale
 from skimage import color
-from tfutils import add_eval, write_data
+from tfutils import StreamingTrainMetrics, add_eval, add_run_arguments, run_cadence, session_config, write_data
 
 FLAGS = None
 
@@ -78,20 +78,24 @@ def main(_):
   # So here we use tf.losses.sparse_softmax_cross_entropy on the raw
   # outputs of 'y', and then average across the batch.
   cross_entropy = tf.losses.sparse_softmax_cross_entropy(labels=y_, logits=y)
-  train_step = tf.train.GradientDescentOptimizer(0.5).minimize(cross_entropy)
+  train_step = tf.train.GradientDescentOptimizer(FLAGS.learning_rate).minimize(cross_entropy)
 
   # Add accuracy and cross entropy to the graph using util function
   accuracy, cross_entropy = add_eval(y, y_)
+  # Train metrics averaged over the training batches, accumulated by the training step
+  train_metrics = StreamingTrainMetrics(accuracy, cross_entropy)
 
-  sess = tf.InteractiveSession()
+  sess = tf.InteractiveSession(config=session_config(FLAGS.intra_op_threads, FLAGS.inter_op_threads))
   tf.global_variables_initializer().run()
   # Train
-  for i in range(20001):
-    start_train = i * 100 % y_train.shape[0]
-    end_train = start_train + 100
+  # Logs every 5 steps, or within the overhead budget and always at the last step with --overhead_budget
+  cadence = run_cadence(FLAGS)
+  for i in range(FLAGS.steps + 1):
+    start_train = i * FLAGS.batch_size % y_train.shape[0]
+    end_train = start_train + FLAGS.batch_size
 
-    start_val = i * 100 % y_val.shape[0]
-    end_val = start_val + 100
+    start_val = i * FLAGS.batch_size % y_val.shape[0]
+    end_val = start_val + FLAGS.batch_size
 
     batch = (X_train[start_train:end_train], y_train[start_train:end_train])
     batch_val = (X_val[start_val:end_val], y_val[start_val:end_val])
@@ -104,9 +108,13 @@ def main(_):
         cross_entropy=cross_entropy,
         feed_dict_train=feed_dict_train,
         feed_dict_val=feed_dict_val,
-        step=i
+        step=i,
+        filename=FLAGS.log_file,
+        batch_size=FLAGS.batch_size,
+        train_metrics=train_metrics,
+        cadence=cadence
     )
-    sess.run(train_step, feed_dict={x: batch[0], y_: batch[1]})
+    sess.run([train_step, train_metrics.update_op], feed_dict={x: batch[0], y_: batch[1]})
 
   # Test trained model
   correct_prediction = tf.equal(tf.argmax(y, 1), y_)
@@ -125,5 +133,6 @@ if __name__ == '__main__':
       type=str,
       default='/tmp/tensorflow/mnist/input_data',
       help='Directory for storing input data')
+  add_run_arguments(parser, learning_rate=0.5, batch_size=100, steps=20000)
   FLAGS, unparsed = parser.parse_known_args()
   tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
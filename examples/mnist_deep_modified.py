@@ -27,13 +27,16 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import os
 import sys
 
 import tensorflow as tf
 from tensorflow.examples.tutorials.mnist import input_data
 
 # Modified Import
-from tfutils import write_data
+from profiling import TrainingProfiler
+from tfutils import (add_histograms, add_run_arguments, run_cadence, session_config, write_data,
+                     write_histograms)
 
 FLAGS = None
 DATA = "MNIST"
@@ -57,7 +60,7 @@ def deepnn(x):
   x_image = tf.reshape(x, [-1, 28, 28, 1])
 
   # First convolutional layer - maps one grayscale image to 32 feature maps.
-  W_conv1 = weight_variable([5, 5, 1, 32])
+  W_conv1 = weight_variable([5, 5, 1, 32], name='W_conv1')
   b_conv1 = bias_variable([32])
   h_conv1 = tf.nn.relu(conv2d(x_image, W_conv1) + b_conv1)
 
@@ -74,7 +77,7 @@ def deepnn(x):
 
   # Fully connected layer 1 -- after 2 round of downsampling, our 28x28 image
   # is down to 7x7x64 feature maps -- maps this to 1024 features.
-  W_fc1 = weight_variable([7 * 7 * 64, 1024])
+  W_fc1 = weight_variable([7 * 7 * 64, 1024], name='W_fc1')
   b_fc1 = bias_variable([1024])
 
   h_pool2_flat = tf.reshape(h_pool2, [-1, 7*7*64])
@@ -104,10 +107,10 @@ def max_pool_2x2(x):
                         strides=[1, 2, 2, 1], padding='SAME')
 
 
-def weight_variable(shape):
+def weight_variable(shape, name=None):
   """weight_variable generates a weight variable of a given shape."""
   initial = tf.truncated_normal(shape, stddev=0.1)
-  return tf.Variable(initial)
+  return tf.Variable(initial, name=name)
 
 
 def bias_variable(shape):
@@ -136,17 +139,24 @@ def main(_):
 
   cross_entropy = tf.reduce_mean(
       tf.nn.softmax_cross_entropy_with_logits(labels=y_, logits=y_conv))
-  train_step = tf.train.AdamOptimizer(1e-4).minimize(cross_entropy)
+  train_step = tf.train.AdamOptimizer(FLAGS.learning_rate).minimize(cross_entropy)
   correct_prediction = tf.equal(tf.argmax(y_conv, 1), tf.argmax(y_, 1))
   accuracy = tf.reduce_mean(tf.cast(correct_prediction, tf.float32))
 
-  with tf.Session() as sess:
+  # Histograms of the weights of the first convolutional and fully connected layers
+  histograms = add_histograms({v.op.name: v for v in tf.trainable_variables() if v.op.name in ['W_conv1', 'W_fc1']})
+
+  profiler = TrainingProfiler(FLAGS.log_file)
+
+  with tf.Session(config=session_config(FLAGS.intra_op_threads, FLAGS.inter_op_threads)) as sess:
     sess.run(tf.global_variables_initializer())
-    for i in range(10001):
-      batch = mnist.train.next_batch(50)
+    # Logs every 5 steps, or within the overhead budget and always at the last step with --overhead_budget
+    cadence = run_cadence(FLAGS)
+    for i in range(FLAGS.steps + 1):
+      batch = mnist.train.next_batch(FLAGS.batch_size)
 
       ################################## MODIFIED CODE BELOW ##################################
-      batch_val = mnist.validation.next_batch(50)
+      batch_val = mnist.validation.next_batch(FLAGS.batch_size)
       feed_dict_train = {x: batch[0], y_: batch[1], keep_prob: 1.0}
       feed_dict_val = {x: batch_val[0], y_: batch_val[1], keep_prob: 1.0}
       # Writes data into run log csv file
@@ -155,15 +165,22 @@ def main(_):
         cross_entropy=cross_entropy,
         feed_dict_train=feed_dict_train,
         feed_dict_val=feed_dict_val,
-        step=i
+        step=i,
+        filename=FLAGS.log_file,
+        batch_size=FLAGS.batch_size,
+        cadence=cadence
       )
+      # Writes the weight histograms into the sidecar log file
+      write_histograms(histograms, step=i, filename=os.path.splitext(FLAGS.log_file)[0] + '.hist.csv')
       ################################## MODIFIED CODE ABOVE ##################################
 
       if i % 100 == 0:
         train_accuracy = accuracy.eval(feed_dict={
             x: batch[0], y_: batch[1], keep_prob: 1.0})
         print('step %d, training accuracy %g' % (i, train_accuracy))
-      train_step.run(feed_dict={x: batch[0], y_: batch[1], keep_prob: 0.5})
+      # Traces the next steps when a profile is requested from the dashboard
+      sess.run(train_step, feed_dict={x: batch[0], y_: batch[1], keep_prob: 0.5}, **profiler.run_kwargs(i))
+      profiler.after_step(i)
 
     print('test accuracy %g' % accuracy.eval(feed_dict={
         x: mnist.test.images, y_: mnist.test.labels, keep_prob: 1.0}))
@@ -173,5 +190,6 @@ if __name__ == '__main__':
   parser.add_argument('--data_dir', type=str,
                       default='/tmp/tensorflow/mnist/input_data',
                       help='Directory for storing input data')
+  add_run_arguments(parser, learning_rate=1e-4, batch_size=50, steps=10000)
   FLAGS, unparsed = parser.parse_known_args()
   tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
@@ -27,7 +27,7 @@ import sys
 import tensorflow as tf
 from tensorflow.examples.tutorials.mnist import input_data
 
-from tfutils import add_eval, write_data
+from tfutils import StreamingTrainMetrics, add_eval, add_run_arguments, run_cadence, session_config, write_data
 
 FLAGS = None
 DATA = "MNIST"
@@ -58,20 +58,24 @@ def main(_):
   # So here we use tf.losses.sparse_softmax_cross_entropy on the raw
   # outputs of 'y', and then average across the batch.
   cross_entropy = tf.losses.sparse_softmax_cross_entropy(labels=y_, logits=y)
-  train_step = tf.train.GradientDescentOptimizer(0.5).minimize(cross_entropy)
+  train_step = tf.train.GradientDescentOptimizer(FLAGS.learning_rate).minimize(cross_entropy)
 
   ################################## MODIFIED CODE BELOW ##################################
   accuracy, cross_entropy = add_eval(y, y_)
+  # Train metrics averaged over the training batches, accumulated by the training step
+  train_metrics = StreamingTrainMetrics(accuracy, cross_entropy)
   ################################## MODIFIED CODE ABOVE ##################################
 
-  sess = tf.InteractiveSession()
+  sess = tf.InteractiveSession(config=session_config(FLAGS.intra_op_threads, FLAGS.inter_op_threads))
   tf.global_variables_initializer().run()
   # Train
-  for i in range(10001):
-    batch_xs, batch_ys = mnist.train.next_batch(100)
+  # Logs every 5 steps, or within the overhead budget and always at the last step with --overhead_budget
+  cadence = run_cadence(FLAGS)
+  for i in range(FLAGS.steps + 1):
+    batch_xs, batch_ys = mnist.train.next_batch(FLAGS.batch_size)
 
     ################################## MODIFIED CODE BELOW ##################################
-    batch = mnist.train.next_batch(100)
+    batch = mnist.train.next_batch(FLAGS.batch_size)
     batch_val = mnist.validation.next_batch(100)
     feed_dict_train = {x: batch[0], y_: batch[1]}
     feed_dict_val = {x: batch_val[0], y_: batch_val[1]}
@@ -81,11 +85,15 @@ def main(_):
         cross_entropy=cross_entropy,
         feed_dict_train=feed_dict_train,
         feed_dict_val=feed_dict_val,
-        step=i
+        step=i,
+        filename=FLAGS.log_file,
+        batch_size=FLAGS.batch_size,
+        train_metrics=train_metrics,
+        cadence=cadence
     )
     ################################## MODIFIED CODE ABOVE ##################################
 
-    sess.run(train_step, feed_dict={x: batch_xs, y_: batch_ys})
+    sess.run([train_step, train_metrics.update_op], feed_dict={x: batch_xs, y_: batch_ys})
 
   # Test trained model
   correct_prediction = tf.equal(tf.argmax(y, 1), y_)
@@ -104,5 +112,6 @@ if __name__ == '__main__':
       type=str,
       default='/tmp/tensorflow/mnist/input_data',
       help='Directory for storing input data')
+  add_run_arguments(parser, learning_rate=0.5, batch_size=100, steps=10000)
   FLAGS, unparsed = parser.parse_known_args()
   tf.app.run(main=main, argv=[sys.argv[0]] + unparsed)
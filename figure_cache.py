@@ -0,0 +1,85 @@
+import json
+import threading
+from collections import OrderedDict
+
+from plotly.utils import PlotlyJSONEncoder
+
+
+class FigureCache(object):
+    """
+    LRU cache of figures. Figures are stored as the plain dicts obtained by serializing them once, so that a hit is
+    returned as is, and the memory held by the cache is bounded by the size of their JSON serialization. The least
+    recently used figures are evicted first.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        """
+        :param max_bytes: Maximum total size of the JSON serializations of the cached figures
+        """
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        :param key: Hashable key of the figure
+        :return: The figure as a dict, or None if it is not cached. It must not be modified
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, figure):
+        """
+        Converts a figure to a plain dict and caches it.
+        :param key: Hashable key of the figure
+        :param figure: Plotly figure, or any object serializable by PlotlyJSONEncoder
+        :return: The figure as a dict
+        """
+        figure_json = json.dumps(figure, cls=PlotlyJSONEncoder)
+        figure_dict = json.loads(figure_json)
+        size = len(figure_json)
+
+        with self._lock:
+            if key in self._entries:
+                self.size_bytes -= self._entries.pop(key)[1]
+
+            # Figures bigger than the whole cache are returned without being stored
+            if size <= self.max_bytes:
+                self._entries[key] = (figure_dict, size)
+                self.size_bytes += size
+
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+        return figure_dict
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def info(self):
+        """Returns the hit/miss counters and the memory usage of the cache."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for serving many concurrent viewers of live runs.
+
+Every open dashboard polls the server at the interval chosen in the dropdown, so each viewer keeps a connection open
+for the whole session. With gevent workers these connections are greenlets rather than worker processes, and a
+single small instance can serve hundreds of viewers. All the settings can be overridden with environment variables.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+
+# 'gevent' (default) for cooperative workers, 'gthread' for thread-based workers, or 'sync' for the previous behaviour
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+
+# One worker per core: the work done per request is small, so a worker mostly waits on the network
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Maximum number of simultaneous connections per gevent worker, i.e. concurrent viewers per worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Number of threads per gthread worker
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+# Keep the connections of polling dashboards open between two intervals (the slow updates poll every 5 s)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
@@ -0,0 +1,100 @@
+"""
+Reads the histogram sidecar log written by tfutils.write_histograms, and renders the distribution of a tensor over
+the logged steps as a heatmap.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from runlog import CSVTail, run_blocking
+
+
+def parse_histogram_row(line):
+    """Converts a line of the histogram log (step, name, min, max, counts...) into a row."""
+    fields = line.split(b',')
+    return [int(float(fields[0])), fields[1].decode('utf-8'), float(fields[2]), float(fields[3]),
+            [int(count) for count in fields[4:]]]
+
+
+class HistogramStore(object):
+    """
+    Incrementally ingests a histogram log. The number of rows kept per tensor is bounded: when it reaches max_steps,
+    every other row is dropped, so that the whole run stays visible at a coarser resolution.
+    """
+
+    def __init__(self, filename, max_steps=500):
+        """
+        :param filename: Path of the histogram log file
+        :param max_steps: Maximum number of logged steps kept in memory per tensor
+        """
+        self.filename = filename
+        self.max_steps = max_steps
+        self.tail = CSVTail(filename, parse_row=parse_histogram_row)
+        self.histograms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self):
+        """
+        Reads the new rows of the histogram log.
+        :return: True if the content of the store changed
+        """
+        with self._lock:
+            try:
+                rows, reset = run_blocking(self.tail.read)
+            except FileNotFoundError:
+                if self.histograms:
+                    self.histograms.clear()
+                    self.tail.reset()
+                return False
+
+            if reset:
+                self.histograms.clear()
+
+            for step, name, low, high, counts in rows:
+                entries = self.histograms.setdefault(name, [])
+                entries.append((step, low, high, counts))
+
+                if len(entries) > self.max_steps:
+                    # Keep the latest row, and every other row before it
+                    entries[:] = entries[::-1][::2][::-1]
+
+            return bool(rows) or reset
+
+    def names(self):
+        with self._lock:
+            return list(self.histograms)
+
+    def heatmap(self, name, resolution=64):
+        """
+        Resamples the histograms of a tensor, each computed over its own range of values, onto a common grid.
+        :param name: Name of the tensor
+        :param resolution: Number of rows of the common grid
+        :return: A tuple (steps, values, density), where steps is a list, values a numpy array, and density a numpy
+        array with one row per value and one column per step, every column summing to 1. All are empty if the tensor
+        has no histogram, e.g. after the log was deleted by a new run
+        """
+        with self._lock:
+            entries = list(self.histograms.get(name, []))
+
+        if not entries:
+            return [], np.array([]), np.zeros((0, 0))
+
+        low = min(entry[1] for entry in entries)
+        high = max(entry[2] for entry in entries)
+        edges = np.linspace(low, high, resolution + 1)
+
+        density = np.zeros((resolution, len(entries)))
+        for column, (_, entry_low, entry_high, counts) in enumerate(entries):
+            counts = np.asarray(counts, dtype=float)
+            width = (entry_high - entry_low) / len(counts)
+            centers = entry_low + (np.arange(len(counts)) + 0.5) * width
+
+            rows = np.clip(np.searchsorted(edges, centers) - 1, 0, resolution - 1)
+            density[:, column] = np.bincount(rows, weights=counts, minlength=resolution)
+
+            total = counts.sum()
+            if total > 0:
+                density[:, column] /= total
+
+        return [entry[0] for entry in entries], (edges[:-1] + edges[1:]) / 2, density
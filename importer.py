@@ -0,0 +1,227 @@
+"""
+Bulk import of archived csv run logs into a SQLite run log database (see sqlitelog).
+
+The csv files are parsed in parallel by a pool of processes, and the main process inserts the rows of every file in a
+single transaction, together with a checkpoint recording the size and modification time of the file. An interrupted
+import resumes where it stopped, and files that did not change since they were imported are skipped.
+
+Usage: python importer.py demo_run_logs --database runs.db
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from runlog import COLUMNS, METRIC_COLUMNS, parse_float_row
+from sqlitelog import METRIC_FIELDS, TABLE, connect, delete_run
+
+CHECKPOINT_TABLE = 'import_checkpoint'
+
+CHECKPOINT_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+    path TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    imported_at REAL NOT NULL,
+    PRIMARY KEY (path, run_id)
+)
+'''
+
+
+def find_logs(paths):
+    """
+    :param paths: List of csv files and directories, searched recursively
+    :return: List of (path, run id) of the run logs, the run id being the path relative to the given directory,
+    without extension
+    """
+    logs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            logs.append((path, os.path.splitext(os.path.basename(path))[0]))
+            continue
+
+        for directory, _, filenames in os.walk(path):
+            for filename in sorted(filenames):
+                # Histogram sidecar logs have a different format
+                if filename.endswith('.csv') and not filename.endswith('.hist.csv'):
+                    log_path = os.path.join(directory, filename)
+                    run_id = os.path.splitext(os.path.relpath(log_path, path))[0].replace(os.sep, '/')
+                    logs.append((log_path, run_id))
+
+    return logs
+
+
+def parse_log(path):
+    """
+    Parses a whole run log, in a worker process.
+    :param path: Path of the csv log file
+    :return: A tuple (size, mtime_ns, rows, skipped), where size and mtime_ns are those of the file when it was read,
+    rows is the list of rows (step, metrics...) with one value per column, and skipped is the number of invalid lines
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    rows = []
+    skipped = 0
+    n_columns = len(COLUMNS)
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+
+        try:
+            row = parse_float_row(line)
+        except ValueError:
+            skipped += 1
+            continue
+
+        if len(row) < len(METRIC_COLUMNS):
+            skipped += 1
+            continue
+
+        # Logs written before the timing columns were added are padded with NULL
+        rows.append((int(row[0]),) + tuple(row[1:n_columns]) + (None,) * (n_columns - len(row)))
+
+    return stat.st_size, stat.st_mtime_ns, rows, skipped
+
+
+class BulkImporter(object):
+    """Imports run logs into a SQLite database, one transaction per file."""
+
+    def __init__(self, database, workers=None, max_pending=None):
+        """
+        :param database: Path of the SQLite database, created if needed
+        :param workers: Number of parsing processes, one per core by default
+        :param max_pending: Maximum number of files parsed ahead of the inserts, twice the number of workers by
+        default. Bounds the memory used when the disk is slower than the parsers.
+        """
+        self.database = database
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+
+        self._connection = connect(database)
+        self._connection.execute(CHECKPOINT_SCHEMA)
+        self._connection.commit()
+
+    def checkpoints(self):
+        """Returns a dictionary mapping the (path, run id) of every imported file to its (size, mtime_ns)."""
+        query = f'SELECT path, run_id, size, mtime_ns FROM {CHECKPOINT_TABLE}'
+        return {(path, run_id): (size, mtime_ns) for path, run_id, size, mtime_ns in self._connection.execute(query)}
+
+    def pending(self, logs):
+        """
+        Returns the logs that were never imported as their run, or that changed since they were imported. A file
+        imported before under another run id, e.g. from another directory, is imported again.
+        """
+        checkpoints = self.checkpoints()
+        pending = []
+
+        for path, run_id in logs:
+            stat = os.stat(path)
+            if checkpoints.get((os.path.abspath(path), run_id)) != (stat.st_size, stat.st_mtime_ns):
+                pending.append((path, run_id))
+
+        return pending
+
+    def check_run_ids(self, logs):
+        """
+        Raises a ValueError if several files would be imported as the same run, e.g. files with the same relative path
+        under two directories, or a file named like a run imported before from another file. The rows of one of them
+        would replace the rows of the other.
+        """
+        query = f'SELECT path, run_id FROM {CHECKPOINT_TABLE}'
+        sources = {run_id: path for path, run_id in self._connection.execute(query)}
+
+        conflicts = []
+        for path, run_id in logs:
+            path = os.path.abspath(path)
+            source = sources.setdefault(run_id, path)
+            if source != path:
+                conflicts.append(f"'{run_id}' ({source} and {path})")
+
+        if conflicts:
+            raise ValueError(f"Several files would be imported as the same run: {', '.join(conflicts)}. "
+                             f"Import them into separate databases, or rename them")
+
+    def _insert(self, path, run_id, size, mtime_ns, rows):
+        placeholders = ', '.join('?' * (len(METRIC_FIELDS) + 2))
+
+        # The rows and the checkpoint are committed together, so that an interrupted import never leaves a partial run
+        with self._connection:
+            delete_run(self._connection, run_id)
+            self._connection.executemany(f'INSERT OR REPLACE INTO {TABLE} VALUES ({placeholders})',
+                                         ((run_id,) + row for row in rows))
+            self._connection.execute(f'INSERT OR REPLACE INTO {CHECKPOINT_TABLE} VALUES (?, ?, ?, ?, ?, ?)',
+                                     (os.path.abspath(path), run_id, size, mtime_ns, len(rows), time.time()))
+
+    def run(self, logs, verbose=False):
+        """
+        Imports the given logs, skipping those already imported and unchanged.
+        :param logs: List of (path, run id), e.g. from find_logs
+        :param verbose: If True, prints a line per imported file
+        :return: Dictionary with the number of imported and skipped files, of imported rows and of invalid lines
+        :raises ValueError: If several files would be imported as the same run, see check_run_ids
+        """
+        self.check_run_ids(logs)
+        pending = self.pending(logs)
+        summary = {'files': len(pending), 'skipped_files': len(logs) - len(pending), 'rows': 0, 'invalid_lines': 0}
+
+        remaining = iter(pending)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+
+            def submit():
+                for path, run_id in remaining:
+                    futures[executor.submit(parse_log, path)] = (path, run_id)
+                    if len(futures) >= self.max_pending:
+                        return
+
+            submit()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    path, run_id = futures.pop(future)
+                    size, mtime_ns, rows, skipped = future.result()
+                    self._insert(path, run_id, size, mtime_ns, rows)
+
+                    summary['rows'] += len(rows)
+                    summary['invalid_lines'] += skipped
+                    if verbose:
+                        print(f"Imported {len(rows)} rows of {path} as run '{run_id}'")
+
+                submit()
+
+        # Refreshes the statistics used by the query planner
+        self._connection.execute('PRAGMA optimize')
+        return summary
+
+    def close(self):
+        self._connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Run log csv files, or directories searched recursively')
+    parser.add_argument('--database', default='runs.db', help='Path of the SQLite database')
+    parser.add_argument('--workers', type=int, default=None, help='Number of parsing processes')
+    parser.add_argument('--quiet', action='store_true', help='Only print the summary')
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    importer = BulkImporter(args.database, workers=args.workers)
+    try:
+        summary = importer.run(find_logs(args.paths), verbose=not args.quiet)
+    except ValueError as error:
+        parser.error(str(error))
+    finally:
+        importer.close()
+
+    print(f"Imported {summary['rows']} rows from {summary['files']} files in {time.monotonic() - start:.1f}s, "
+          f"skipped {summary['skipped_files']} unchanged files and {summary['invalid_lines']} invalid lines")
+
+
+if __name__ == '__main__':
+    main()
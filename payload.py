@@ -0,0 +1,131 @@
+import base64
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+PAYLOAD_FORMAT = 'columnar-b64'
+
+# Largest integer that fits in an int32 column, bigger steps are sent as float64
+INT32_MAX = 2 ** 31 - 1
+
+
+def _encode_column(name, values):
+    values = np.asarray(values)
+
+    if np.issubdtype(values.dtype, np.integer):
+        if len(values) == 0 or np.abs(values).max() <= INT32_MAX:
+            values = values.astype('<i4')
+        else:
+            values = values.astype('<f8')
+    else:
+        values = values.astype('<f4')
+
+    return {
+        'name': name,
+        'dtype': {'i': 'int32', 'f': 'float32' if values.itemsize == 4 else 'float64'}[values.dtype.kind],
+        'data': base64.b64encode(values.tobytes()).decode('ascii')
+    }
+
+
+def encode_run_log(run_log, encoding='binary', version=None):
+    """
+    Serializes a run log for the run-log-storage div.
+    :param run_log: Dataframe of the run log, or dict mapping the column names to sequences of values
+    :param encoding: 'binary' for base64 encoded little-endian int32/float32 column arrays, or 'json' for the pandas
+    split orientation
+    :param version: Optional string identifying the content of the run log, read back by payload_version
+    :return: The serialized run log
+    """
+    names = list(run_log.keys())
+    # The version comes first, so that payload_version reads it without parsing the columns
+    prefix = f'{{"version": {json.dumps(version)}, ' if version is not None else '{'
+
+    if encoding == 'json':
+        import pandas as pd
+        return prefix + pd.DataFrame(run_log, columns=names).to_json(orient='split')[1:]
+
+    return prefix + json.dumps({
+        'format': PAYLOAD_FORMAT,
+        'length': len(run_log[names[0]]) if names else 0,
+        'columns': [_encode_column(name, run_log[name]) for name in names]
+    })[1:]
+
+
+def payload_version(run_log_json):
+    """Returns the version given to encode_run_log, or None, in a time independent of the length of the run log."""
+    prefix = '{"version": '
+    if not run_log_json or not run_log_json.startswith(prefix):
+        return None
+
+    return json.JSONDecoder().raw_decode(run_log_json, len(prefix))[0]
+
+
+def decode_columns(run_log_json):
+    """
+    Deserializes the content of the run-log-storage div, in either of the encodings of encode_run_log, without pandas.
+    :param run_log_json: The serialized run log
+    :return: OrderedDict mapping the column names to numpy arrays
+    """
+    payload = json.loads(run_log_json, object_pairs_hook=OrderedDict)
+
+    if payload.get('format') != PAYLOAD_FORMAT:
+        # pandas split orientation
+        data = np.array(payload['data'], dtype=float).reshape(-1, len(payload['columns']))
+        return OrderedDict((name, data[:, j]) for j, name in enumerate(payload['columns']))
+
+    dtypes = {'int32': '<i4', 'float32': '<f4', 'float64': '<f8'}
+    return OrderedDict(
+        (column['name'], np.frombuffer(base64.b64decode(column['data']), dtype=dtypes[column['dtype']]))
+        for column in payload['columns']
+    )
+
+
+def decode_run_log(run_log_json):
+    """
+    Deserializes the content of the run-log-storage div, in either of the encodings of encode_run_log.
+    :param run_log_json: The serialized run log
+    :return: Dataframe of the run log
+    """
+    import pandas as pd
+
+    columns = decode_columns(run_log_json)
+    return pd.DataFrame(columns, columns=list(columns))
+
+
+def encode_binary_columns(columns):
+    """
+    Serializes columns as raw arrays: a JSON header line giving the number of rows and the name and dtype of every
+    column, followed by the little-endian arrays of the columns, in order (int64 steps, float32 values).
+    :param columns: Dict mapping the column names to sequences of values of the same length, starting with the step
+    :return: Generator of bytes objects, the header then the array of every column, converted one at a time
+    """
+    header = {
+        'length': len(next(iter(columns.values()), [])),
+        'columns': [{'name': name, 'dtype': 'int64' if name == 'step' else 'float32'} for name in columns]
+    }
+    yield json.dumps(header).encode() + b'\n'
+
+    for name, values in columns.items():
+        yield np.asarray(values, dtype='<i8' if name == 'step' else '<f4').tobytes()
+
+
+def decode_binary_columns(data):
+    """
+    Deserializes the output of encode_binary_columns.
+    :param data: The header line followed by the arrays, as bytes
+    :return: OrderedDict mapping the column names to numpy arrays
+    """
+    end = data.index(b'\n')
+    header = json.loads(data[:end].decode())
+    dtypes = {'int64': '<i8', 'float32': '<f4'}
+
+    columns = OrderedDict()
+    offset = end + 1
+    for column in header['columns']:
+        dtype = np.dtype(dtypes[column['dtype']])
+        columns[column['name']] = np.frombuffer(data, dtype=dtype, count=header['length'], offset=offset)
+        offset += dtype.itemsize * header['length']
+
+    return columns
+
@@ -0,0 +1,256 @@
+"""
+On-demand profiling of a running training script.
+
+The dashboard requests a profile by writing a small control file next to the run log (request_profile). The
+TrainingProfiler of the training script checks the modification time of that file at most once per poll interval,
+and when a new request appears, captures for the next N steps:
+* a TensorFlow step trace of every step (RunOptions.FULL_TRACE), saved as Chrome trace files (chrome://tracing),
+* a sampling profile of the Python training thread, saved as collapsed stacks (flamegraph.pl format).
+The artifacts are stored in <run log directory>/profiles/<run log name>/<request id>/ and listed by the dashboard.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+CONTROL_SUFFIX = '.control.json'
+MANIFEST = 'profile.json'
+
+
+def control_path(log_path):
+    """Returns the path of the control file of the given run log."""
+    return log_path + CONTROL_SUFFIX
+
+
+def profiles_dir(log_path):
+    """
+    Returns the directory where the profiles of the given run log are stored. Run logs sharing a directory, e.g. the
+    jobs of a sweep, have their own profiles directory.
+    """
+    log_path = os.path.abspath(log_path)
+    return os.path.join(os.path.dirname(log_path), 'profiles', os.path.splitext(os.path.basename(log_path))[0])
+
+
+def request_profile(log_path, steps):
+    """
+    Asks the training script logging to log_path to profile its next steps.
+    :param log_path: Path of the run log
+    :param steps: Number of steps to profile
+    :return: Identifier of the request, also the name of the directory the artifacts will be stored in
+    """
+    now = time.time()
+    request_id = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'-{int(now * 1000) % 1000:03d}'
+    request = {'id': request_id, 'steps': int(steps), 'requested_at': now}
+
+    # Written atomically, so that the training script never reads a partial file
+    path = control_path(log_path)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(request, file)
+    os.replace(path + '.tmp', path)
+
+    return request_id
+
+
+def list_profiles(log_path):
+    """
+    :param log_path: Path of the run log
+    :return: List of (request id, manifest, file names) of the captured profiles, most recent first. The manifest is
+    None while the capture is in progress.
+    """
+    directory = profiles_dir(log_path)
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for request_id in sorted(os.listdir(directory), reverse=True):
+        path = os.path.join(directory, request_id)
+        if not os.path.isdir(path):
+            continue
+
+        manifest = None
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            with open(os.path.join(path, MANIFEST)) as file:
+                manifest = json.load(file)
+
+        profiles.append((request_id, manifest, sorted(name for name in os.listdir(path) if name != MANIFEST)))
+
+    return profiles
+
+
+class StackSampler(object):
+    """
+    Sampling profiler of a Python thread: a background thread records the call stack of the target thread at a fixed
+    interval, and the samples are aggregated as collapsed stacks.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        """
+        :param thread_id: Identifier of the profiled thread, the calling thread by default
+        :param interval: Time in seconds between two samples
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, filename):
+        """Writes the samples as collapsed stacks, one 'frame;frame;... count' line per distinct stack."""
+        with open(filename, 'w') as file:
+            for stack, count in self.samples.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class TrainingProfiler(object):
+    """
+    Captures profiles of the training loop when the dashboard asks for them. Pass the result of run_kwargs(step) to
+    the sess.run call of the training step, and call after_step(step) once it returns:
+
+        profiler = TrainingProfiler('run_log.csv')
+        for i in range(steps):
+            sess.run(train_step, feed_dict=feed_dict, **profiler.run_kwargs(i))
+            profiler.after_step(i)
+
+    When no profile is requested, run_kwargs costs a clock read per step and a stat of the control file per
+    poll interval.
+    """
+
+    def __init__(self, log_path='run_log.csv', poll_interval=1.):
+        """
+        :param log_path: Path of the run log, the control file and the profiles are stored next to it
+        :param poll_interval: Minimum time in seconds between two checks of the control file
+        """
+        self.log_path = log_path
+        self.poll_interval = poll_interval
+
+        self.request = None
+        self.remaining_steps = 0
+        self._directory = None
+        self._sampler = None
+        self._run_metadata = None
+        self._started_at = None
+
+        # Requests made before the training script started are ignored
+        self._last_poll = time.monotonic()
+        self._control_mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.stat(control_path(self.log_path)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _poll(self):
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = now
+
+        mtime = self._mtime()
+        if mtime is None or mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+
+        try:
+            with open(control_path(self.log_path)) as file:
+                request = json.load(file)
+        except (OSError, ValueError) as error:
+            print(f"Ignoring invalid profiling request: {error}")
+            return
+
+        self._start(request)
+
+    def _start(self, request):
+        self.request = request
+        self.remaining_steps = max(int(request.get('steps', 1)), 1)
+        self._directory = os.path.join(profiles_dir(self.log_path), os.path.basename(str(request['id'])))
+        os.makedirs(self._directory, exist_ok=True)
+
+        self._sampler = StackSampler()
+        self._sampler.start()
+        self._started_at = time.time()
+
+    @property
+    def capturing(self):
+        return self.remaining_steps > 0
+
+    def run_kwargs(self, step):
+        """
+        :param step: The current training step
+        :return: Keyword arguments for sess.run: empty, or the trace options and metadata while capturing
+        """
+        if not self.capturing:
+            self._poll()
+
+        if not self.capturing:
+            return {}
+
+        import tensorflow as tf
+
+        self._run_metadata = tf.RunMetadata()
+        return {
+            'options': tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+            'run_metadata': self._run_metadata
+        }
+
+    def after_step(self, step):
+        """
+        Saves the trace of the step if a profile is being captured.
+        :param step: The training step that just ran
+        """
+        if not self.capturing or self._run_metadata is None:
+            return
+
+        from tensorflow.python.client import timeline
+
+        trace = timeline.Timeline(self._run_metadata.step_stats).generate_chrome_trace_format()
+        with open(os.path.join(self._directory, f'timeline_step_{step}.json'), 'w') as file:
+            file.write(trace)
+
+        self._run_metadata = None
+        self.remaining_steps -= 1
+
+        if not self.capturing:
+            self._finish(step)
+
+    def _finish(self, step):
+        self._sampler.stop()
+        self._sampler.write(os.path.join(self._directory, 'python_stacks.txt'))
+
+        manifest = {
+            'id': self.request['id'],
+            'steps': self.request.get('steps'),
+            'last_step': step,
+            'started_at': self._started_at,
+            'finished_at': time.time(),
+            'samples': sum(self._sampler.samples.values())
+        }
+        with open(os.path.join(self._directory, MANIFEST), 'w') as file:
+            json.dump(manifest, file)
+
+        print(f"Profile {self.request['id']} saved in {self._directory}")
+        self._sampler = None
@@ -0,0 +1,762 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+
+METRIC_COLUMNS = ['step', 'train accuracy', 'val accuracy', 'train cross entropy', 'val cross entropy']
+
+# Timing columns appended by write_data: seconds since the start of the run, training throughput over the last logging
+# interval, and fraction of that interval spent logging. Logs written without them are padded with NaN
+PERFORMANCE_COLUMNS = ['elapsed time', 'steps per sec', 'examples per sec', 'logging overhead']
+
+COLUMNS = METRIC_COLUMNS + PERFORMANCE_COLUMNS
+
+NAN = float('nan')
+
+# Maximum number of bytes of a log read and ingested at once, so that catching up with a long run does not hold all of
+# its rows in memory
+CHUNK_SIZE = 1024 * 1024
+
+# Direction of improvement of the metrics whose best value is tracked by OnlineStats
+BEST_MODES = {
+    'train accuracy': 'max',
+    'val accuracy': 'max',
+    'train cross entropy': 'min',
+    'val cross entropy': 'min'
+}
+
+
+def run_blocking(function, *args):
+    """
+    Runs a blocking call, e.g. reading a file. Under gevent workers, file I/O blocks the whole event loop, so the call
+    is run in gevent's thread pool and the other connections of the worker keep being served in the meantime.
+    """
+    if 'gevent' in sys.modules:
+        from gevent import get_hub, monkey
+
+        if monkey.is_module_patched('socket'):
+            return get_hub().threadpool.apply(function, args)
+
+    return function(*args)
+
+
+def parse_float_row(line):
+    """Converts a csv line (bytes) into a list of floats, empty fields being NaN."""
+    return [float(value) if value else NAN for value in line.split(b',')]
+
+
+class CSVTail(object):
+    """
+    Reads the rows appended to a csv log file since the previous call, by remembering the byte offset reached so far.
+    A log file that is removed, replaced or truncated (e.g. when a new training run starts) is read again from the
+    start. Since a replaced file may get the inode of the previous one back and grow past the offset before the next
+    call, the first line of the file is also compared with the first line read. Lines which cannot be parsed, e.g. a
+    header, are skipped.
+    """
+
+    # Maximum number of bytes of the first line compared to detect a replaced file
+    HEAD_SIZE = 1024
+
+    def __init__(self, filename, parse_row=None, chunk_size=None):
+        """
+        :param filename: Path of the csv log file
+        :param parse_row: Optional function converting a line (bytes) into a row. By default, every field is a float
+        :param chunk_size: Optional maximum number of bytes read per call, the rest being read by the next calls
+        """
+        self.filename = filename
+        self.parse_row = parse_row if parse_row is not None else parse_float_row
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self._inode = None
+        self._head = b''
+        self._remainder = b''
+
+    def reset(self):
+        self.offset = 0
+        self._inode = None
+        self._head = b''
+        self._remainder = b''
+
+    def state(self):
+        """Returns the position reached in the file as a JSON serializable dict, from which restore resumes reading."""
+        return {'offset': self.offset, 'inode': self._inode, 'head': self._head.decode('latin-1'),
+                'remainder': self._remainder.decode('latin-1')}
+
+    def restore(self, state):
+        """Resumes reading from a position returned by state, e.g. by another process."""
+        self.offset = state['offset']
+        self._inode = state['inode']
+        self._head = state.get('head', '').encode('latin-1')
+        self._remainder = state['remainder'].encode('latin-1')
+
+    def read(self):
+        """
+        :return: A tuple (rows, reset), where rows is the list of new rows as lists of floats, and reset is True if
+        the file was replaced since the previous call, in which case rows contains the whole file, or its first chunk.
+        """
+        stat = os.stat(self.filename)
+        reset = False
+
+        if (self._inode is not None and stat.st_ino != self._inode) or stat.st_size < self.offset:
+            self.reset()
+            reset = True
+
+        self._inode = stat.st_ino
+
+        if stat.st_size == self.offset:
+            return [], reset
+
+        with open(self.filename, 'rb') as file:
+            head = file.read(self.HEAD_SIZE)
+            if self._head and not head.startswith(self._head):
+                self.reset()
+                self._inode = stat.st_ino
+                reset = True
+
+            if not self._head:
+                # Only a complete first line identifies the file, it may still be in the middle of being written
+                line, newline, _ = head.partition(b'\n')
+                self._head = line + newline if newline or len(head) == self.HEAD_SIZE else b''
+
+            file.seek(self.offset)
+            data = file.read(-1 if self.chunk_size is None else self.chunk_size)
+
+        self.offset += len(data)
+
+        # The last line may still be in the middle of being written, keep it for the next call
+        lines = (self._remainder + data).split(b'\n')
+        self._remainder = lines.pop()
+
+        rows = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                rows.append(self.parse_row(line))
+            except (ValueError, IndexError):
+                continue
+
+        return rows, reset
+
+
+def _nan_combine(a, b, combined):
+    """Returns combined, unless one of the values is missing (NaN), in which case the other one is returned."""
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return combined
+
+
+class RingBuffer(object):
+    """
+    Sequence of numbers of fixed capacity, stored in a preallocated array of a compact type: once full, every append
+    overwrites the oldest value. Supports len, indexing and slicing (which returns a list), so that it can be bisected
+    like a list.
+    """
+
+    def __init__(self, typecode, capacity):
+        """
+        :param typecode: Type of the values, as in the array module, e.g. 'q' for int64 or 'f' for float32
+        :param capacity: Maximum number of values kept
+        """
+        self.capacity = capacity
+        self.dropped = 0
+        self._data = array(typecode, bytes(array(typecode).itemsize * capacity))
+        self._start = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, value):
+        if self._length < self.capacity:
+            self._data[(self._start + self._length) % self.capacity] = value
+            self._length += 1
+        else:
+            self._data[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+            self.dropped += 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, stride = index.indices(self._length)
+            if stride != 1:
+                return [self[i] for i in range(start, stop, stride)]
+            if start >= stop:
+                return []
+
+            first, last = self._start + start, self._start + stop
+            if last <= self.capacity:
+                return self._data[first:last].tolist()
+            if first >= self.capacity:
+                return self._data[first - self.capacity:last - self.capacity].tolist()
+            return self._data[first:].tolist() + self._data[:last - self.capacity].tolist()
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('ring buffer index out of range')
+        return self._data[(self._start + index) % self.capacity]
+
+
+class SummaryPyramid(object):
+    """
+    Multi-resolution summary of a run log. Level 0 holds the raw rows, and each row of level k summarizes 2^k
+    consecutive rows of level 0 by their mean, min and max. Coarser levels are updated incrementally as rows arrive,
+    so reading a zoomed-out view of the run only touches as many rows as will be displayed.
+
+    With a capacity, every level is made of ring buffers (int64 steps, float32 summaries) keeping its last capacity
+    rows: the last steps are kept at full resolution and older ones only at a coarser level, and the memory used no
+    longer grows with the length of the run.
+    """
+
+    def __init__(self, n_metrics, n_levels=20, capacity=None):
+        """
+        :param n_metrics: Number of metric columns
+        :param n_levels: Number of levels
+        :param capacity: Optional maximum number of rows kept per level
+        """
+        self.n_metrics = n_metrics
+        self.n_levels = n_levels
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        # Each level is a dict of lists: step (last step of the bucket), and the mean, min and max of every metric
+        self.levels = [self._empty_level() for _ in range(self.n_levels)]
+        # Number of rows appended, including those dropped from the ring buffers
+        self.appended = 0
+        # Incomplete bucket waiting for its second half, for every level
+        self._pending = [None] * self.n_levels
+
+    def _empty_level(self):
+        if self.capacity is None:
+            step, column = list, list
+        else:
+            step, column = lambda: RingBuffer('q', self.capacity), lambda: RingBuffer('f', self.capacity)
+
+        return {
+            'step': step(),
+            'mean': [column() for _ in range(self.n_metrics)],
+            'min': [column() for _ in range(self.n_metrics)],
+            'max': [column() for _ in range(self.n_metrics)]
+        }
+
+    def __len__(self):
+        return len(self.levels[0]['step'])
+
+    def append(self, step, values):
+        """
+        Adds a row to the pyramid, and propagates completed buckets to the coarser levels.
+        :param step: The logged step
+        :param values: The metric values of the row
+        """
+        entry = (step, list(values), list(values), list(values))
+        self.appended += 1
+
+        for level, pending in zip(self.levels, range(self.n_levels)):
+            self._push(level, entry)
+
+            if self._pending[pending] is None:
+                self._pending[pending] = entry
+                break
+
+            first, self._pending[pending] = self._pending[pending], None
+            entry = (
+                entry[0],
+                [_nan_combine(a, b, (a + b) / 2) for a, b in zip(first[1], entry[1])],
+                [_nan_combine(a, b, min(a, b)) for a, b in zip(first[2], entry[2])],
+                [_nan_combine(a, b, max(a, b)) for a, b in zip(first[3], entry[3])]
+            )
+
+    def _push(self, level, entry):
+        step, means, mins, maxs = entry
+        level['step'].append(step)
+        for i in range(self.n_metrics):
+            level['mean'][i].append(means[i])
+            level['min'][i].append(mins[i])
+            level['max'][i].append(maxs[i])
+
+    def _bounds(self, level, x_range):
+        steps = level['step']
+        if x_range is None:
+            return 0, len(steps)
+
+        # Include one bucket on each side so that lines reach the edges of the viewport
+        start = max(bisect_left(steps, x_range[0]) - 1, 0)
+        end = min(bisect_right(steps, x_range[1]) + 1, len(steps))
+        return start, end
+
+    @staticmethod
+    def _covers(level, x_range):
+        """Returns False if rows of the level within x_range (or of the whole run) were dropped by its ring buffer."""
+        steps = level['step']
+        if not getattr(steps, 'dropped', 0):
+            return True
+        return x_range is not None and len(steps) > 0 and steps[0] <= x_range[0]
+
+    def finest_level(self, x_range=None):
+        """Returns the finest level still holding all the rows within x_range, or of the whole run."""
+        for k, level in enumerate(self.levels):
+            if self._covers(level, x_range):
+                return k
+
+        return self.n_levels - 1
+
+    def slice(self, level, start=None, end=None, every=1, stats=('mean',), metrics=None):
+        """
+        :param level: Index of the level to read
+        :param start: Optional first step
+        :param end: Optional last step
+        :param every: Stride, in rows
+        :param stats: Which summaries to include: 'mean', 'min' and/or 'max'
+        :param metrics: Optional indices of the metrics to include, all of them by default
+        :return: A tuple (steps, columns) where columns maps (stat, metric index) to the values of the rows with
+        start <= step <= end, found by bisection. Above level 0, every bucket overlapping the range is included, its
+        step being the last step of the rows it summarizes
+        """
+        coarse = level > 0
+        level = self.levels[level]
+        steps = level['step']
+        first = bisect_left(steps, start) if start is not None else 0
+        if end is None:
+            last = len(steps)
+        elif coarse:
+            last = min(bisect_left(steps, end) + 1, len(steps))
+        else:
+            last = bisect_right(steps, end)
+
+        columns = {}
+        for stat in stats:
+            for i in range(self.n_metrics) if metrics is None else metrics:
+                columns[(stat, i)] = level[stat][i][first:last:every]
+
+        return steps[first:last:every], columns
+
+    def choose_level(self, max_points, x_range=None):
+        """
+        :param max_points: Maximum number of rows to return, typically the width of the graph in pixels
+        :param x_range: Optional (min step, max step) tuple restricting the rows
+        :return: The finest level still holding the rows within x_range, and having at most max_points of them
+        """
+        for k, level in enumerate(self.levels):
+            if not self._covers(level, x_range):
+                continue
+
+            start, end = self._bounds(level, x_range)
+            if end - start <= max_points:
+                return k
+
+        return self.n_levels - 1
+
+    def read(self, level, x_range=None, stats=('mean',)):
+        """
+        :param level: Index of the level to read
+        :param x_range: Optional (min step, max step) tuple restricting the rows
+        :param stats: Which summaries to include: 'mean', 'min' and/or 'max'
+        :return: A tuple (steps, columns) where columns maps (stat, metric index) to a list of values
+        """
+        raw = self.levels[0]
+        level = self.levels[level]
+        start, end = self._bounds(level, x_range)
+
+        steps = level['step'][start:end]
+        columns = {}
+        for stat in stats:
+            for i in range(self.n_metrics):
+                columns[(stat, i)] = level[stat][i][start:end]
+
+        # The rows of the incomplete last bucket are not summarized yet, so the latest raw row is appended to make
+        # the coarse view reach the current step
+        if raw['step'] and end == len(level['step']) and (not steps or raw['step'][-1] > steps[-1]):
+            if x_range is None or raw['step'][-1] <= x_range[1]:
+                steps.append(raw['step'][-1])
+                for stat, i in columns:
+                    columns[(stat, i)].append(raw[stat][i][-1])
+
+        return steps, columns
+
+
+class RunningStats(object):
+    """
+    Statistics of a metric maintained in O(1) per row: mean and variance of the whole run (Welford), mean, variance,
+    min and max over a sliding window of rows (windowed Welford and monotonic deques), best value so far and number
+    of steps since it last improved.
+    """
+
+    def __init__(self, window=100, mode=None):
+        """
+        :param window: Number of rows of the sliding window
+        :param mode: 'max' or 'min' to track the best value, or None
+        """
+        self.window = window
+        self.mode = mode
+
+        self.count = 0
+        self.mean = 0.
+        self._m2 = 0.
+
+        self._window_values = deque()
+        self._window_mean = 0.
+        self._window_m2 = 0.
+        self._window_min = deque()
+        self._window_max = deque()
+        self._index = 0
+
+        self.last = NAN
+        self.last_step = None
+        self.best = NAN
+        self.best_step = None
+
+    def add(self, step, value):
+        if value != value:
+            return
+
+        self.last = value
+        self.last_step = step
+
+        # Whole run
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        # Sliding window: add the new value, then remove the one leaving the window
+        self._window_values.append(value)
+        n = len(self._window_values)
+        delta = value - self._window_mean
+        self._window_mean += delta / n
+        self._window_m2 += delta * (value - self._window_mean)
+
+        if n > self.window:
+            removed = self._window_values.popleft()
+            n -= 1
+            delta = removed - self._window_mean
+            self._window_mean -= delta / n
+            self._window_m2 = max(self._window_m2 - delta * (removed - self._window_mean), 0.)
+
+        # The deques hold (index, value) of the candidates for the window min and max, in monotonic order
+        for extremes, keep in ((self._window_min, lambda other: other < value),
+                               (self._window_max, lambda other: other > value)):
+            while extremes and not keep(extremes[-1][1]):
+                extremes.pop()
+            extremes.append((self._index, value))
+            if extremes[0][0] <= self._index - self.window:
+                extremes.popleft()
+        self._index += 1
+
+        if self.mode is not None and (self.best_step is None
+                                      or (value > self.best if self.mode == 'max' else value < self.best)):
+            self.best = value
+            self.best_step = step
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else NAN
+
+    @property
+    def window_mean(self):
+        return self._window_mean if self._window_values else NAN
+
+    @property
+    def window_variance(self):
+        n = len(self._window_values)
+        return self._window_m2 / (n - 1) if n > 1 else NAN
+
+    @property
+    def window_min(self):
+        return self._window_min[0][1] if self._window_min else NAN
+
+    @property
+    def window_max(self):
+        return self._window_max[0][1] if self._window_max else NAN
+
+    @property
+    def steps_since_improvement(self):
+        if self.best_step is None:
+            return None
+        return self.last_step - self.best_step
+
+    def summary(self):
+        """Returns the statistics as a dict."""
+        return {
+            'last': self.last,
+            'last_step': self.last_step,
+            'count': self.count,
+            'mean': self.mean if self.count else NAN,
+            'variance': self.variance,
+            'window_count': len(self._window_values),
+            'window_mean': self.window_mean,
+            'window_variance': self.window_variance,
+            'window_min': self.window_min,
+            'window_max': self.window_max,
+            'best': self.best,
+            'best_step': self.best_step,
+            'steps_since_improvement': self.steps_since_improvement
+        }
+
+
+class OnlineStats(object):
+    """RunningStats of every metric column of a run log, updated as rows are ingested."""
+
+    def __init__(self, columns=COLUMNS, window=100):
+        self.columns = columns
+        self.window = window
+        self.clear()
+
+    def clear(self):
+        self.metrics = OrderedDict(
+            (name, RunningStats(self.window, BEST_MODES.get(name))) for name in self.columns[1:]
+        )
+
+    def add(self, step, values):
+        for stats, value in zip(self.metrics.values(), values):
+            stats.add(step, value)
+
+    def summary(self):
+        """Returns a dict mapping every metric column to its statistics."""
+        return {name: stats.summary() for name, stats in self.metrics.items()}
+
+
+class ArrivalRate(object):
+    """
+    Rate at which the training script logs rows, estimated from the elapsed time column of the last rows, so that it
+    does not depend on when the store reads them. Also keeps the time at which the last rows reached the store.
+    """
+
+    def __init__(self, window=20):
+        """
+        :param window: Number of rows the rate is estimated from
+        """
+        self._elapsed_times = deque(maxlen=window)
+        # Monotonic time at which the last rows were ingested, or None
+        self.last_arrival = None
+
+    def clear(self):
+        self._elapsed_times.clear()
+        self.last_arrival = None
+
+    def add(self, elapsed_times, now=None):
+        """
+        :param elapsed_times: Elapsed times of the new rows, NaN for rows logged without it
+        :param now: Monotonic time at which the rows were ingested, the current time by default
+        """
+        self._elapsed_times.extend(value for value in elapsed_times if value == value)
+        self.last_arrival = time.monotonic() if now is None else now
+
+    def rows_per_sec(self):
+        """Returns the rows logged per second of elapsed time over the window, or None with less than two timed rows."""
+        if len(self._elapsed_times) < 2:
+            return None
+
+        elapsed = self._elapsed_times[-1] - self._elapsed_times[0]
+        return (len(self._elapsed_times) - 1) / elapsed if elapsed > 0 else None
+
+    def refresh_interval(self, interval, min_interval, max_interval, finished=False, now=None):
+        """
+        Returns the refresh interval following the rate: one refresh per row, within the bounds. When no row arrived
+        for twice the time between two rows, or the run finished, the interval doubles at every refresh instead, until
+        new rows arrive. The store must be updated just before, so that the last arrival is up to date.
+        :param interval: Current interval in milliseconds, or None
+        :param min_interval: Smallest interval in milliseconds
+        :param max_interval: Largest interval in milliseconds
+        :param finished: True if the run finished, e.g. a job of a sweep
+        :param now: Current monotonic time, the current time by default
+        :return: The interval in milliseconds
+        """
+        rate = self.rows_per_sec()
+        target = min(max(1000 / rate if rate else 1000, min_interval), max_interval)
+
+        now = time.monotonic() if now is None else now
+        idle = self.last_arrival is None or (now - self.last_arrival) * 1000 > 2 * target
+        if idle or finished:
+            return int(min(max(interval or target, target) * 2, max_interval))
+
+        return int(target)
+
+
+class RunLogStore(object):
+    """
+    Incrementally ingests a run log into a SummaryPyramid. Every call of update() only parses the rows appended to the
+    csv log file since the previous call.
+    Other sources can be given as a tail with the same interface as CSVTail, e.g. sqlitelog.SQLiteTail. Without a log
+    file nor a tail, rows are pushed into the store with append_rows instead, e.g. by the metrics collector.
+    """
+
+    def __init__(self, filename=None, columns=COLUMNS, tail=None, capacity=None):
+        """
+        :param filename: Optional path of the csv log file
+        :param columns: Names of the columns, starting with the step
+        :param tail: Optional reader of another source, with the same interface as CSVTail
+        :param capacity: Optional number of rows kept per level of the summary pyramid, which bounds the memory used
+        by the store whatever the length of the run (see SummaryPyramid)
+        """
+        self.filename = filename
+        self.columns = columns
+        if tail is None and filename is not None:
+            tail = CSVTail(filename, chunk_size=CHUNK_SIZE)
+        self.tail = tail
+        self.pyramid = SummaryPyramid(len(columns) - 1, capacity=capacity)
+        self.stats = OnlineStats(columns)
+        self.arrivals = ArrivalRate()
+        self._elapsed_index = columns.index('elapsed time') - 1 if 'elapsed time' in columns else None
+        # Digest of the first row, which tells runs apart whatever restarts the store observed
+        self._first_row = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        if self.tail is not None:
+            self.tail.reset()
+        self.pyramid.clear()
+        self.stats.clear()
+        self.arrivals.clear()
+        self._first_row = None
+
+    def _ingest(self, rows, reset):
+        if reset:
+            self.pyramid.clear()
+            self.stats.clear()
+            self.arrivals.clear()
+            self._first_row = None
+
+        n_columns = len(self.columns)
+        elapsed_times = []
+        for row in rows:
+            # Rows of older logs, without the timing columns, are padded
+            if len(row) >= len(METRIC_COLUMNS):
+                values = list(row[1:n_columns]) + [NAN] * (n_columns - len(row))
+                values = [NAN if value is None else float(value) for value in values]
+                if self._first_row is None:
+                    self._first_row = hashlib.sha1(repr([int(row[0])] + values).encode()).hexdigest()[:16]
+                self.pyramid.append(int(row[0]), values)
+                self.stats.add(int(row[0]), values)
+                if self._elapsed_index is not None:
+                    elapsed_times.append(values[self._elapsed_index])
+
+        if rows:
+            self.arrivals.add(elapsed_times)
+
+        return bool(rows) or reset
+
+    def append_rows(self, rows, reset=False):
+        """
+        Adds rows to the store.
+        :param rows: List of rows, each starting with the step
+        :param reset: If True, the previous rows are discarded first, e.g. when a new training run starts
+        :return: True if the content of the store changed
+        """
+        with self._lock:
+            return self._ingest(rows, reset)
+
+    def update(self):
+        """
+        Reads the new rows of the log file, ingesting them chunk by chunk so that other threads can read the store in
+        the meantime.
+        :return: True if the content of the store changed
+        """
+        if self.tail is None:
+            return False
+
+        changed = False
+        while True:
+            with self._lock:
+                try:
+                    rows, reset = run_blocking(self.tail.read)
+                except FileNotFoundError:
+                    if len(self.pyramid):
+                        self.clear()
+                    raise
+
+                changed = self._ingest(rows, reset) or changed
+
+            if not rows:
+                return changed
+
+    def summary(self):
+        """Returns the online statistics of every metric, see RunningStats.summary."""
+        with self._lock:
+            return self.stats.summary()
+
+    def last_step(self):
+        """Returns the last step of the run, or None if no row was ingested."""
+        with self._lock:
+            steps = self.pyramid.levels[0]['step']
+            return steps[-1] if len(steps) else None
+
+    def fingerprint(self):
+        """
+        Returns a digest of the first row of the run, the number of rows ingested, and the last step. It only depends
+        on the content of the run, not on the restarts the store observed, so that it is the same in every process
+        reading it.
+        """
+        with self._lock:
+            return self._fingerprint()
+
+    def _fingerprint(self):
+        steps = self.pyramid.levels[0]['step']
+        return self._first_row, self.pyramid.appended, steps[-1] if len(steps) else None
+
+    def query(self, start=None, end=None, every=1, columns=None):
+        """
+        :param start: Optional first step
+        :param end: Optional last step
+        :param every: Stride, in rows
+        :param columns: Optional list of the columns to return besides the step, all of them by default
+        :return: OrderedDict mapping the column names to the values of the rows with start <= step <= end. The rows are
+        read at full resolution, or from the buckets overlapping the range at the finest level still holding them
+        when the store has a capacity
+        """
+        indices = [self.columns.index(name) - 1 for name in columns or self.columns[1:]]
+
+        with self._lock:
+            level = self.pyramid.finest_level((start, end) if start is not None else None)
+            steps, values = self.pyramid.slice(level, start, end, every, metrics=indices)
+
+        data = OrderedDict([('step', steps)])
+        for i in indices:
+            data[self.columns[i + 1]] = values[('mean', i)]
+
+        return data
+
+    def snapshot(self, max_points=2000, x_range=None, stats=('mean',)):
+        """
+        :param max_points: Maximum number of rows to return
+        :param x_range: Optional (min step, max step) tuple restricting the rows
+        :param stats: Which summaries to include. The mean is named after the metric, and the others are suffixed
+        :return: A tuple (fingerprint, columns), where columns is an OrderedDict mapping the column names to the values
+        of the finest level fitting in max_points rows, and fingerprint is that of the rows they were read from
+        """
+        with self._lock:
+            fingerprint = self._fingerprint()
+            level = self.pyramid.choose_level(max_points, x_range)
+            steps, columns = self.pyramid.read(level, x_range, stats)
+
+        data = OrderedDict([('step', steps)])
+        for (stat, i), values in columns.items():
+            name = self.columns[i + 1]
+            data[name if stat == 'mean' else f'{name} {stat}'] = values
+
+        return fingerprint, data
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(filename, factory=None):
+    """
+    Returns the RunLogStore shared by all the callbacks reading the given log.
+    :param filename: Path of the csv log file, or any key identifying the log when a factory is given
+    :param factory: Optional function creating the store the first time the key is requested
+    """
+    with _stores_lock:
+        if filename not in _stores:
+            _stores[filename] = factory() if factory is not None else RunLogStore(filename)
+        return _stores[filename]
@@ -0,0 +1,252 @@
+"""
+Sparkline previews of the run logs of a directory, for the run browser.
+
+The sparkline of a run is drawn from a fixed number of buckets of rows: when there are twice as many buckets as
+points, pairs of buckets are merged and every new bucket covers twice as many rows. The buckets, the position reached
+in the log (see runlog.CSVTail) and the rendered SVG are cached on disk, so that a sparkline is only updated with the
+rows appended since it was last drawn, and an unchanged run costs a stat of its log.
+"""
+import json
+import os
+import threading
+from html import escape
+from urllib.parse import quote
+
+from runlog import COLUMNS, CSVTail
+
+# Columns drawn in the sparklines, with the training metric used while the validation one is missing
+ACCURACY = (COLUMNS.index('val accuracy'), COLUMNS.index('train accuracy'))
+LOSS = (COLUMNS.index('val cross entropy'), COLUMNS.index('train cross entropy'))
+
+
+def list_runs(directory):
+    """Returns the names of the run logs of the directory, i.e. the csv files other than histogram logs."""
+    if not directory or not os.path.isdir(directory):
+        return []
+
+    return sorted(os.path.splitext(filename)[0] for filename in os.listdir(directory)
+                  if filename.endswith('.csv') and not filename.endswith('.hist.csv'))
+
+
+def _metric(row, columns):
+    for column in columns:
+        if column < len(row) and row[column] == row[column]:
+            return row[column]
+    return None
+
+
+class Sparkline(object):
+    """Decimated accuracy and loss of a run log, updated incrementally from the offset reached in the log."""
+
+    def __init__(self, points=200):
+        self.points = points
+        # State of the CSVTail of the log, None until the sparkline is first updated
+        self.tail = None
+        self.rows = 0
+        self.bucket_size = 1
+        # Every bucket is [last step, accuracy sum, accuracy count, loss sum, loss count]
+        self.buckets = []
+        self.current = None
+
+    STATE = ('points', 'tail', 'rows', 'bucket_size', 'buckets', 'current')
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.STATE}
+
+    @classmethod
+    def from_dict(cls, state):
+        sparkline = cls(state['points'])
+        for key in cls.STATE:
+            setattr(sparkline, key, state[key])
+        return sparkline
+
+    def add(self, row):
+        step, accuracy, loss = int(row[0]), _metric(row, ACCURACY), _metric(row, LOSS)
+
+        if self.current is None:
+            self.current = [step, 0., 0, 0., 0, 0]
+        current = self.current
+        current[0] = step
+        if accuracy is not None:
+            current[1] += accuracy
+            current[2] += 1
+        if loss is not None:
+            current[3] += loss
+            current[4] += 1
+        current[5] += 1
+        self.rows += 1
+
+        if current[5] == self.bucket_size:
+            self.buckets.append(current[:5])
+            self.current = None
+
+            if len(self.buckets) >= 2 * self.points:
+                self.buckets = [[second[0]] + [a + b for a, b in zip(first[1:], second[1:])]
+                                for first, second in zip(self.buckets[::2], self.buckets[1::2])]
+                self.bucket_size *= 2
+
+    def update(self, filename):
+        """
+        Adds the complete rows appended to the log since the previous update, starting over if the log was replaced.
+        :return: True if the sparkline changed
+        """
+        tail = CSVTail(filename)
+        if self.tail is not None:
+            tail.restore(self.tail)
+
+        rows, reset = tail.read()
+        if reset:
+            self.__init__(self.points)
+        self.tail = tail.state()
+
+        for row in rows:
+            self.add(row)
+
+        return reset or len(rows) > 0
+
+    def series(self):
+        """Returns the steps, mean accuracies and mean losses of the buckets, including the incomplete last one."""
+        buckets = self.buckets + ([self.current[:5]] if self.current is not None else [])
+        steps = [bucket[0] for bucket in buckets]
+        accuracy = [bucket[1] / bucket[2] if bucket[2] else None for bucket in buckets]
+        loss = [bucket[3] / bucket[4] if bucket[4] else None for bucket in buckets]
+        return steps, accuracy, loss
+
+    def svg(self, width=160, height=40):
+        """Renders the accuracy (blue, from 0 to 1) and the loss (orange, scaled to its range) as an SVG image."""
+        steps, accuracy, loss = self.series()
+
+        def polyline(values, low, high, color):
+            points = [(step, value) for step, value in zip(steps, values) if value is not None]
+            if len(points) < 2:
+                return ''
+
+            first, last = points[0][0], points[-1][0]
+            x_scale = (width - 2) / ((last - first) or 1)
+            y_scale = (height - 2) / ((high - low) or 1)
+            coordinates = ' '.join(f'{1 + (step - first) * x_scale:.1f},{height - 1 - (value - low) * y_scale:.1f}'
+                                   for step, value in points)
+            return (f'<polyline points="{coordinates}" fill="none" stroke="{color}" stroke-width="1.5" '
+                    f'stroke-linejoin="round"/>')
+
+        losses = [value for value in loss if value is not None]
+        lines = polyline(accuracy, 0, 1, '#1f77b4')
+        if losses:
+            lines += polyline(loss, min(losses), max(losses), '#ff7f0e')
+
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'viewBox="0 0 {width} {height}">{lines}</svg>')
+
+
+class SparklineCache(object):
+    """Sparklines of the runs of a directory, cached on disk in <directory>/.sparklines."""
+
+    def __init__(self, directory, cache_dir=None, points=200):
+        """
+        :param directory: Directory of the run logs
+        :param cache_dir: Directory of the cached sparklines, <directory>/.sparklines by default
+        :param points: Maximum number of points per sparkline is twice this number
+        """
+        self.directory = directory
+        self.cache_dir = cache_dir or os.path.join(directory, '.sparklines')
+        self.points = points
+        self._sparklines = {}
+        self._lock = threading.Lock()
+
+    def _cache_path(self, run, extension):
+        return os.path.join(self.cache_dir, f'{os.path.basename(run)}.{extension}')
+
+    def _load(self, run):
+        if run not in self._sparklines:
+            try:
+                with open(self._cache_path(run, 'json')) as file:
+                    self._sparklines[run] = Sparkline.from_dict(json.load(file))
+            except (OSError, ValueError, KeyError, TypeError):
+                self._sparklines[run] = Sparkline(self.points)
+        return self._sparklines[run]
+
+    def _save(self, run, sparkline, svg):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for extension, content in (('svg', svg), ('json', json.dumps(sparkline.to_dict()))):
+            path = self._cache_path(run, extension)
+            with open(path + '.tmp', 'w') as file:
+                file.write(content)
+            os.replace(path + '.tmp', path)
+
+    def get(self, run):
+        """
+        Returns the SVG sparkline of a run, updated with the rows logged since it was cached.
+        :return: A tuple (svg, version), where version changes whenever the sparkline changes
+        """
+        filename = os.path.join(self.directory, f'{os.path.basename(run)}.csv')
+
+        with self._lock:
+            sparkline = self._load(run)
+            changed = sparkline.update(filename)
+
+            svg_path = self._cache_path(run, 'svg')
+            if changed or not os.path.exists(svg_path):
+                svg = sparkline.svg()
+                self._save(run, sparkline, svg)
+            else:
+                with open(svg_path) as file:
+                    svg = file.read()
+
+            return svg, f'{sparkline.tail["inode"]}-{sparkline.tail["offset"]}'
+
+    def summary(self, run):
+        """
+        Returns the number of rows and the last step of the cached sparkline of a run, without updating it.
+        :return: A tuple (rows, last step), or (None, None) if the sparkline has not been drawn yet
+        """
+        with self._lock:
+            sparkline = self._load(run)
+            if sparkline.tail is None:
+                return None, None
+
+            steps = sparkline.series()[0]
+            return sparkline.rows, steps[-1] if steps else None
+
+
+def runs_page(runs, title='Runs'):
+    """
+    Generates the run browser: one card per run, with its sparkline loaded from /sparklines/<run>.svg, and a link
+    opening the run in the dashboard.
+    :param runs: List of (run, rows, last step), rows being None until the sparkline of the run has been drawn
+    """
+    cards = []
+    for run, rows, last_step in runs:
+        name, url = escape(run), escape(quote(run))
+        if rows is None:
+            details = 'loading'
+        elif last_step is None:
+            details = 'no rows yet'
+        else:
+            details = f'{rows} rows, step {last_step}'
+        cards.append(
+            f'<a class="run" href="/?run={url}"><div class="name">{name}</div>'
+            f'<img src="/sparklines/{url}.svg" width="160" height="40" loading="lazy" alt="">'
+            f'<div class="details">{escape(details)}</div></a>'
+        )
+
+    return f'''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{escape(title)}</title>
+<style>
+body {{font-family: "Open Sans", "HelveticaNeue", "Helvetica Neue", Helvetica, Arial, sans-serif; margin: 20px;}}
+.run {{display: inline-block; margin: 8px; padding: 8px; border: 1px solid #ddd; border-radius: 4px; color: #333;
+       text-decoration: none; vertical-align: top;}}
+.run:hover {{border-color: #1f77b4;}}
+.name {{font-weight: bold; margin-bottom: 4px;}}
+.details {{font-size: 12px; color: #777;}}
+</style>
+</head>
+<body>
+<h3>{escape(title)}</h3>
+<p>Accuracy in blue, loss in orange.</p>
+{''.join(cards)}
+</body>
+</html>
+'''
@@ -0,0 +1,220 @@
+"""
+SQLite storage backend for run logs.
+
+Rows are stored in a single table indexed by (run_id, step), in WAL mode: the training process writes batches of rows
+in transactions, while the dashboard reads from a separate read-only connection. In WAL mode readers see the last
+committed snapshot and never block the writer, nor wait for it.
+"""
+import atexit
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from runlog import COLUMNS
+
+TABLE = 'run_log'
+
+# Number of times the rows of every run were deleted by a new run with the same identifier
+GENERATION_TABLE = 'run_generation'
+
+# SQL names of the metric columns, e.g. 'train accuracy' is stored as train_accuracy
+METRIC_FIELDS = [column.replace(' ', '_') for column in COLUMNS[1:]]
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    run_id TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    {', '.join(f'{field} REAL' for field in METRIC_FIELDS)},
+    PRIMARY KEY (run_id, step)
+) WITHOUT ROWID
+'''
+
+GENERATION_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS {GENERATION_TABLE} (
+    run_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+)
+'''
+
+
+def connect(database):
+    """Opens a read-write connection to the database, creating the table if needed."""
+    connection = sqlite3.connect(database, timeout=30, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # With WAL, NORMAL only syncs at checkpoints, which is enough for metrics
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute(SCHEMA)
+    connection.execute(GENERATION_SCHEMA)
+    connection.commit()
+    return connection
+
+
+def delete_run(connection, run):
+    """
+    Deletes the rows of a run, and increments its generation so that readers tailing the run start over, even if the
+    new rows reach the last step they read. Must be called within a transaction.
+    """
+    connection.execute(f'DELETE FROM {TABLE} WHERE run_id = ?', (run,))
+    # Not an upsert, which needs SQLite 3.24
+    connection.execute(f'INSERT OR IGNORE INTO {GENERATION_TABLE} VALUES (?, 0)', (run,))
+    connection.execute(f'UPDATE {GENERATION_TABLE} SET generation = generation + 1 WHERE run_id = ?', (run,))
+
+
+class SQLiteSink(object):
+    """
+    Writes the logged rows into a SQLite database, in batches of rows inserted in a single transaction.
+    Pass it to write_data as the sink.
+    """
+
+    def __init__(self, database='run_log.db', run='run_log', batch_size=50, flush_interval=1.):
+        """
+        :param database: Path of the SQLite database
+        :param run: Identifier of the run
+        :param batch_size: Number of rows inserted in a transaction
+        :param flush_interval: Maximum time in seconds a row waits before being inserted
+        """
+        self.database = database
+        self.run = run
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._connection = connect(database)
+        self._rows = []
+        self._last_flush = time.monotonic()
+
+        # Insert the rows still queued when training ends
+        atexit.register(self.flush)
+
+    def reset(self):
+        """Deletes the rows of the previous run with the same identifier."""
+        self._rows = []
+        with self._connection:
+            delete_run(self._connection, self.run)
+
+    def write(self, row):
+        """
+        Queues a row, and inserts the queued rows if the batch is full or the flush interval has elapsed.
+        :param row: List of values, starting with the step
+        """
+        self._rows.append((self.run, int(row[0])) + tuple(float(value) for value in row[1:len(COLUMNS)]))
+
+        if len(self._rows) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+
+        if not self._rows:
+            return
+
+        placeholders = ', '.join('?' * (len(METRIC_FIELDS) + 2))
+        with self._connection:
+            self._connection.executemany(f'INSERT OR REPLACE INTO {TABLE} VALUES ({placeholders})', self._rows)
+
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+class SQLiteReader(object):
+    """Read-only queries on a run log database."""
+
+    def __init__(self, database):
+        if not os.path.exists(database):
+            raise FileNotFoundError(f"No such run log database: '{database}'")
+
+        self.database = database
+        self._connection = sqlite3.connect(f'file:{database}?mode=ro', uri=True, check_same_thread=False)
+
+    @contextmanager
+    def snapshot(self):
+        """Runs the queries of the block in a single read transaction, so that they see the same commit."""
+        self._connection.execute('BEGIN')
+        try:
+            yield
+        finally:
+            self._connection.execute('COMMIT')
+
+    def generation(self, run):
+        """Returns the number of times the rows of the run were deleted, see delete_run."""
+        try:
+            row = self._connection.execute(f'SELECT generation FROM {GENERATION_TABLE} WHERE run_id = ?',
+                                           (run,)).fetchone()
+        except sqlite3.OperationalError:
+            # Databases written before the table was added
+            return 0
+        return row[0] if row is not None else 0
+
+    def rows_since(self, run, step, limit=None):
+        """
+        :param run: Identifier of the run
+        :param step: Only the rows with a greater step are returned
+        :param limit: Optional maximum number of rows
+        :return: List of rows (step, metrics...) ordered by step
+        """
+        query = f'SELECT step, {", ".join(METRIC_FIELDS)} FROM {TABLE} WHERE run_id = ? AND step > ? ORDER BY step'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+
+        return self._connection.execute(query, (run, step)).fetchall()
+
+    def last_row(self, run):
+        """Returns the row with the greatest step of the run, or None if the run has no rows."""
+        query = f'SELECT step, {", ".join(METRIC_FIELDS)} FROM {TABLE} WHERE run_id = ? ORDER BY step DESC LIMIT 1'
+        return self._connection.execute(query, (run,)).fetchone()
+
+    def close(self):
+        self._connection.close()
+
+
+class SQLiteTail(object):
+    """
+    Same interface as runlog.CSVTail, for a run stored in a SQLite database: every call of read() only fetches the
+    rows logged since the previous call, using the (run_id, step) index.
+    """
+
+    def __init__(self, database, run='run_log'):
+        self.database = database
+        self.run = run
+        self.last_step = None
+        self.generation = None
+        self._reader = None
+
+    def reset(self):
+        self.last_step = None
+        self.generation = None
+
+    def read(self):
+        """
+        :return: A tuple (rows, reset), where rows is the list of new rows, and reset is True if the run was restarted
+        since the previous call, in which case rows contains the whole run.
+        """
+        if self._reader is None:
+            self._reader = SQLiteReader(self.database)
+
+        reset = False
+        with self._reader.snapshot():
+            # A new run with the same identifier deletes the previous rows and increments the generation
+            generation = self._reader.generation(self.run)
+            if self.generation is not None and generation != self.generation:
+                reset = True
+                self.last_step = None
+            self.generation = generation
+
+            rows = self._reader.rows_since(self.run, -1 if self.last_step is None else self.last_step)
+
+            if not rows and self.last_step is not None:
+                # Rows deleted by other writers, e.g. a database written before the generations were recorded
+                last_row = self._reader.last_row(self.run)
+                if last_row is None or last_row[0] < self.last_step:
+                    reset = True
+                    self.last_step = None
+                    rows = self._reader.rows_since(self.run, -1)
+
+        if rows:
+            self.last_step = rows[-1][0]
+
+        return [list(row) for row in rows], reset
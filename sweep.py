@@ -0,0 +1,226 @@
+"""
+Hyperparameter sweep of an example model: a grid, or a random sample, of configurations is run in parallel, every job
+in its own process and writing its own run log. The CPU cores are split between the jobs running at the same time, and
+the TensorFlow thread pools of every job are sized accordingly, so that they do not oversubscribe the cores.
+
+The sweep directory holds the run log (<run>.csv) and output (<run>.out) of every job, and a manifest (sweep.json)
+listing the jobs, their configuration and status. Start the app with SWEEP_DIR=<sweep directory> to browse them.
+
+Usage:
+    python sweep.py mnist_softmax --grid learning_rate=0.1,0.5 batch_size=50,100 --steps 2000
+    python sweep.py mnist_deep --random 8 learning_rate=1e-5:1e-3:log batch_size=32,64,128 --workers 4
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+EXAMPLES = {
+    'mnist_softmax': 'examples/mnist_softmax_modified.py',
+    'mnist_deep': 'examples/mnist_deep_modified.py',
+    'cifar_softmax': 'examples/cifar_softmax_modified.py',
+    'cifar_deep': 'examples/cifar_deep_modified.py'
+}
+
+MANIFEST = 'sweep.json'
+
+
+def parse_value(value):
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_space(specs):
+    """
+    :param specs: List of 'name=values' strings, where values is either a comma separated list, or for random sweeps
+    a 'low:high' range, sampled log-uniformly with 'low:high:log'
+    :return: OrderedDict mapping every name to a list of values, or to a (low, high, log) tuple for ranges
+    """
+    space = OrderedDict()
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if not values:
+            raise ValueError(f"Invalid parameter specification '{spec}', expected name=values")
+
+        if ':' in values:
+            low, high, *scale = values.split(':')
+            space[name] = (float(low), float(high), scale == ['log'])
+        else:
+            space[name] = [parse_value(value) for value in values.split(',')]
+
+    return space
+
+
+def grid_configs(space):
+    """Returns every combination of the values of the space."""
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"Ranges are only supported by random sweeps, give a list of values for '{name}'")
+
+    return [OrderedDict(zip(space, values)) for values in itertools.product(*space.values())]
+
+
+def random_configs(space, n, seed=None):
+    """Returns n configurations sampled from the space: uniformly from lists, uniformly or log-uniformly in ranges."""
+    generator = random.Random(seed)
+    configs = []
+
+    for _ in range(n):
+        config = OrderedDict()
+        for name, values in space.items():
+            if not isinstance(values, tuple):
+                config[name] = generator.choice(values)
+            elif values[2]:
+                config[name] = math.exp(generator.uniform(math.log(values[0]), math.log(values[1])))
+            else:
+                config[name] = generator.uniform(values[0], values[1])
+        configs.append(config)
+
+    return configs
+
+
+def run_log_path(sweep_dir, run):
+    """Returns the path of the run log of a job of the sweep."""
+    return os.path.join(sweep_dir, f'{os.path.basename(run)}.csv')
+
+
+def load_manifest(sweep_dir):
+    """Returns the manifest of the sweep, or None if there is none yet."""
+    try:
+        with open(os.path.join(sweep_dir, MANIFEST)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+class Sweep(object):
+    """Runs the jobs of a sweep, at most `workers` at the same time, and keeps the manifest up to date."""
+
+    def __init__(self, example, configs, sweep_dir, workers=None, steps=None, extra_args=()):
+        """
+        :param example: Name of the example model, a key of EXAMPLES
+        :param configs: List of configurations, dicts mapping command line arguments of the example to values
+        :param sweep_dir: Directory of the run logs and manifest
+        :param workers: Number of jobs running at the same time, by default as many as the cores allow
+        :param steps: Optional number of training steps of every job
+        :param extra_args: Other command line arguments passed to every job
+        """
+        self.example = example
+        self.sweep_dir = sweep_dir
+        self.workers = max(min(workers or os.cpu_count() or 1, len(configs)), 1)
+        # The cores are shared by the jobs running at the same time
+        self.threads = max((os.cpu_count() or 1) // self.workers, 1)
+        self.extra_args = list(extra_args)
+        if steps is not None:
+            self.extra_args += ['--steps', str(steps)]
+
+        self.jobs = [
+            {'run': f'job{i:03d}', 'config': config, 'status': 'pending', 'returncode': None}
+            for i, config in enumerate(configs)
+        ]
+        self._lock = threading.Lock()
+
+    def write_manifest(self):
+        manifest = {
+            'example': self.example,
+            'workers': self.workers,
+            'threads_per_job': self.threads,
+            'jobs': self.jobs
+        }
+
+        # Written atomically, so that the dashboard never reads a partial file
+        path = os.path.join(self.sweep_dir, MANIFEST)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _set_status(self, job, status, **fields):
+        with self._lock:
+            job['status'] = status
+            job.update(fields)
+            self.write_manifest()
+
+    def command(self, job):
+        command = [sys.executable, os.path.join(ROOT, EXAMPLES[self.example]),
+                   '--log_file', os.path.abspath(run_log_path(self.sweep_dir, job['run'])),
+                   '--intra_op_threads', str(self.threads),
+                   '--inter_op_threads', '1']
+        for name, value in job['config'].items():
+            command += [f'--{name}', str(value)]
+
+        return command + self.extra_args
+
+    def environment(self):
+        """Returns the environment variables of the jobs, which find tfutils and use their share of the cores."""
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+        # Thread pools of the numerical libraries, besides TensorFlow's own
+        for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            env[variable] = str(self.threads)
+
+        return env
+
+    def run_job(self, job):
+        env = self.environment()
+        self._set_status(job, 'running', started_at=time.time())
+        with open(os.path.join(self.sweep_dir, f"{job['run']}.out"), 'w') as output:
+            returncode = subprocess.call(self.command(job), cwd=self.sweep_dir, env=env,
+                                         stdout=output, stderr=subprocess.STDOUT)
+
+        self._set_status(job, 'done' if returncode == 0 else 'failed', returncode=returncode,
+                         finished_at=time.time())
+        return returncode
+
+    def run(self):
+        """Runs every job, and returns the number of failed jobs."""
+        os.makedirs(self.sweep_dir, exist_ok=True)
+        self.write_manifest()
+
+        # Every job is a separate process, the pool only bounds how many of them run at the same time
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            returncodes = list(executor.map(self.run_job, self.jobs))
+
+        return sum(returncode != 0 for returncode in returncodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('example', choices=sorted(EXAMPLES), help='Example model to train')
+    parser.add_argument('params', nargs='+', help='Swept arguments of the example, e.g. learning_rate=0.1,0.5')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--grid', action='store_true', help='Run every combination of the values (default)')
+    mode.add_argument('--random', type=int, metavar='N', help='Run N configurations sampled at random')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the random sweep')
+    parser.add_argument('--steps', type=int, default=None, help='Number of training steps of every job')
+    parser.add_argument('--workers', type=int, default=None, help='Number of jobs running at the same time')
+    parser.add_argument('--sweep-dir', default=None,
+                        help='Directory of the run logs, sweeps/<example>-<time> by default')
+    args, extra_args = parser.parse_known_args()
+
+    space = parse_space(args.params)
+    configs = random_configs(space, args.random, args.seed) if args.random else grid_configs(space)
+    sweep_dir = args.sweep_dir or os.path.join('sweeps', f"{args.example}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    sweep = Sweep(args.example, configs, sweep_dir, workers=args.workers, steps=args.steps, extra_args=extra_args)
+    print(f"Running {len(configs)} jobs in {sweep_dir}, {sweep.workers} at a time with {sweep.threads} threads each")
+    failed = sweep.run()
+    print(f"Sweep finished, {failed} failed jobs. Browse it with SWEEP_DIR={sweep_dir} python app.py")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
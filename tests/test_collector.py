@@ -0,0 +1,89 @@
+import json
+import os
+import socket
+import time
+
+import pytest
+
+from collector import MetricsCollector, parse_address
+
+
+def _rows(steps, value=0.5):
+    return [[step, value, value, value, value] for step in steps]
+
+
+def _wait_for(condition, timeout=5.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Timed out')
+        time.sleep(0.01)
+
+
+def _persisted_steps(collector, run):
+    try:
+        with open(collector.filename(run)) as file:
+            return [int(float(line.split(',')[0])) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+@pytest.fixture
+def collector(tmp_path):
+    collector = MetricsCollector(f'unix://{tmp_path}/collector.sock', log_dir=os.path.join(tmp_path, 'logs')).start()
+    yield collector
+    collector.stop()
+
+
+def test_parse_address():
+    assert parse_address('tcp://0.0.0.0:8051') == ('tcp', ('0.0.0.0', 8051))
+    assert parse_address(':8051') == ('tcp', ('127.0.0.1', 8051))
+    assert parse_address('unix:///tmp/collector.sock') == ('unix', '/tmp/collector.sock')
+
+
+def test_rows_sent_over_the_socket_are_stored_and_persisted(collector):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(parse_address(collector.address)[1])
+        for message in ({'run': 'a', 'reset': True, 'rows': _rows(range(5, 30, 5))},
+                        {'run': 'a', 'rows': _rows([30])}):
+            client.sendall(json.dumps(message).encode() + b'\n')
+        client.sendall(b'not json\n')
+
+    _wait_for(lambda: _persisted_steps(collector, 'a') == [5, 10, 15, 20, 25, 30])
+    assert collector.get_store('a').query()['step'] == [5, 10, 15, 20, 25, 30]
+
+
+def test_reset_discards_the_persisted_rows_of_the_previous_run(collector):
+    collector.ingest({'run': 'a', 'rows': _rows(range(5, 105, 5))})
+    _wait_for(lambda: len(_persisted_steps(collector, 'a')) == 20)
+
+    collector.ingest({'run': 'a', 'reset': True, 'rows': _rows([5, 10], 0.25)})
+    _wait_for(lambda: _persisted_steps(collector, 'a') == [5, 10])
+    assert collector.get_store('a').query()['train accuracy'] == [0.25, 0.25]
+
+
+def test_evicted_runs_are_reloaded_from_their_persisted_log(collector):
+    collector.max_runs = 2
+    for run in ('a', 'b', 'c'):
+        collector.ingest({'run': run, 'rows': _rows(range(5, 55, 5))})
+
+    # The least recently used run is evicted beyond max_runs
+    assert collector.runs() == ['b', 'c']
+    _wait_for(lambda: len(_persisted_steps(collector, 'a')) == 10)
+    assert collector.get_store('a').query()['step'] == list(range(5, 55, 5))
+    assert collector.runs() == ['c', 'a']
+
+    # Runs neither written nor read for idle_timeout are evicted
+    collector.idle_timeout = 0
+    collector.get_store('c')
+    assert collector.runs() == ['c']
+
+
+def test_a_second_collector_cannot_listen_on_the_same_address(collector, tmp_path):
+    with pytest.raises(OSError):
+        MetricsCollector(collector.address, log_dir=os.path.join(tmp_path, 'logs')).start()
+
+    # The socket of the first collector is left in place
+    collector.ingest({'run': 'a', 'rows': _rows([5])})
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(parse_address(collector.address)[1])
@@ -0,0 +1,136 @@
+import math
+import os
+import struct
+
+from eventlog import EventFileTail, masked_crc32c
+
+
+def _varint(value):
+    data = b''
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data += bytes([byte | 0x80])
+        else:
+            return data + bytes([byte])
+
+
+def _field(number, data):
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def _event(step, scalars=(), file_version=None):
+    data = _varint(2 << 3) + _varint(step)
+    if file_version is not None:
+        data += _field(3, file_version.encode())
+    for tag, value in scalars:
+        value_data = _field(1, tag.encode()) + _varint(2 << 3 | 5) + struct.pack('<f', value)
+        data += _field(5, _field(1, value_data))
+    return data
+
+
+def _append_events(filename, events):
+    with open(filename, 'ab') as f:
+        for event in events:
+            header = struct.pack('<Q', len(event))
+            f.write(header + struct.pack('<I', masked_crc32c(header)) + event + struct.pack('<I', masked_crc32c(event)))
+
+
+def test_rows_wait_for_files_without_scalars(tmp_path):
+    train_file = os.path.join(tmp_path, 'train', 'events.out.tfevents.1.host')
+    val_file = os.path.join(tmp_path, 'validation', 'events.out.tfevents.1.host')
+    os.makedirs(os.path.dirname(train_file))
+    os.makedirs(os.path.dirname(val_file))
+
+    tail = EventFileTail(str(tmp_path))
+
+    # The validation writer has only written its header when the first train scalars arrive
+    _append_events(train_file, [_event(0, file_version='brain.Event:2')])
+    _append_events(val_file, [_event(0, file_version='brain.Event:2')])
+    _append_events(train_file, [_event(step, [('accuracy', 0.5)]) for step in range(0, 50, 10)])
+    rows, reset = tail.read()
+    assert rows == [] and not reset
+
+    _append_events(val_file, [_event(step, [('accuracy', 0.25)]) for step in range(0, 50, 10)])
+    rows, reset = tail.read()
+    assert not reset
+    assert [row[0] for row in rows] == [0, 10, 20, 30, 40]
+    assert all(row[1] == 0.5 and row[2] == 0.25 for row in rows)
+
+
+def test_rows_are_released_once_every_file_has_moved_past_them(tmp_path):
+    train_file = os.path.join(tmp_path, 'train', 'events.out.tfevents.1.host')
+    val_file = os.path.join(tmp_path, 'validation', 'events.out.tfevents.1.host')
+    os.makedirs(os.path.dirname(train_file))
+    os.makedirs(os.path.dirname(val_file))
+
+    tail = EventFileTail(str(tmp_path))
+
+    _append_events(train_file, [_event(step, [('accuracy', 0.5)]) for step in range(0, 50, 10)])
+    _append_events(val_file, [_event(20, [('accuracy', 0.25)])])
+    rows, _ = tail.read()
+    # Steps 0 and 10 have no validation accuracy, and the validation file has moved past them
+    assert [row[0] for row in rows] == [0, 10, 20]
+    assert math.isnan(rows[0][2]) and rows[2][2] == 0.25
+
+
+def test_files_without_scalars_are_not_waited_for_after_the_grace(tmp_path):
+    train_file = os.path.join(tmp_path, 'train', 'events.out.tfevents.1.host')
+    profile_file = os.path.join(tmp_path, 'train', 'events.out.tfevents.1.host.profile-empty')
+    plugin_file = os.path.join(tmp_path, 'plugins', 'events.out.tfevents.1.host')
+    os.makedirs(os.path.dirname(train_file))
+    os.makedirs(os.path.dirname(plugin_file))
+
+    _append_events(train_file, [_event(step, [('accuracy', 0.5)]) for step in range(0, 50, 10)])
+    _append_events(profile_file, [_event(0, file_version='brain.Event:2')])
+    # A writer logging only other summaries is no longer waited for after grace_records records
+    _append_events(plugin_file, [_event(step) for step in range(20)])
+
+    tail = EventFileTail(str(tmp_path), grace_period=3600, grace_records=10)
+    assert tail.read() == ([], False)
+
+    tail.grace_period = 0
+    rows, _ = tail.read()
+    assert [row[0] for row in rows] == [0, 10, 20, 30, 40]
+    assert all(row[1] == 0.5 for row in rows)
+
+
+def test_rows_are_released_after_a_bounded_lag_when_validation_is_sparse(tmp_path):
+    train_file = os.path.join(tmp_path, 'train', 'events.out.tfevents.1.host')
+    val_file = os.path.join(tmp_path, 'validation', 'events.out.tfevents.1.host')
+    os.makedirs(os.path.dirname(train_file))
+    os.makedirs(os.path.dirname(val_file))
+
+    tail = EventFileTail(str(tmp_path), max_lag_rows=10)
+
+    # Training summaries every 10 steps, validation only at step 0 so far
+    _append_events(val_file, [_event(0, [('accuracy', 0.25)])])
+    _append_events(train_file, [_event(step, [('accuracy', 0.5)]) for step in range(0, 1000, 10)])
+    rows, _ = tail.read()
+    assert [row[0] for row in rows] == list(range(0, 900, 10))
+    assert rows[0][2] == 0.25 and math.isnan(rows[1][2])
+
+    # The validation value of a step within the lag is still merged into its row
+    _append_events(val_file, [_event(950, [('accuracy', 0.75)])])
+    _append_events(train_file, [_event(step, [('accuracy', 0.5)]) for step in range(1000, 1060, 10)])
+    rows, _ = tail.read()
+    assert [row[0] for row in rows] == list(range(900, 960, 10))
+    assert rows[-1][2] == 0.75
+
+
+def test_incomplete_rows_are_released_after_max_lag_seconds(tmp_path):
+    train_file = os.path.join(tmp_path, 'train', 'events.out.tfevents.1.host')
+    val_file = os.path.join(tmp_path, 'validation', 'events.out.tfevents.1.host')
+    os.makedirs(os.path.dirname(train_file))
+    os.makedirs(os.path.dirname(val_file))
+
+    _append_events(val_file, [_event(0, [('accuracy', 0.25)])])
+    _append_events(train_file, [_event(step, [('accuracy', 0.5)]) for step in range(0, 50, 10)])
+
+    tail = EventFileTail(str(tmp_path), max_lag_seconds=3600)
+    assert [row[0] for row in tail.read()[0]] == [0]
+
+    # Training stopped before the next evaluation
+    tail.max_lag_seconds = 0
+    assert [row[0] for row in tail.read()[0]] == [10, 20, 30, 40]
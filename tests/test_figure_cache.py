@@ -0,0 +1,32 @@
+import json
+
+from figure_cache import FigureCache
+
+
+def _figure(n):
+    return {'data': [{'x': list(range(n))}], 'layout': {}}
+
+
+def test_least_recently_used_figures_are_evicted_first():
+    size = len(json.dumps(_figure(10)))
+    cache = FigureCache(max_bytes=2 * size)
+
+    cache.put('a', _figure(10))
+    cache.put('b', _figure(10))
+    assert cache.get('a') == _figure(10)
+
+    cache.put('c', _figure(10))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.info()['entries'] == 2 and cache.size_bytes == 2 * size
+
+
+def test_figures_bigger_than_the_cache_are_not_stored():
+    cache = FigureCache(max_bytes=100)
+    cache.put('small', _figure(1))
+
+    assert cache.put('big', _figure(1000)) == _figure(1000)
+    assert cache.get('big') is None and cache.get('small') is not None
+
+    info = cache.info()
+    assert info['hits'] == 1 and info['misses'] == 1
@@ -0,0 +1,28 @@
+import os
+
+from histograms import HistogramStore
+
+
+def test_heatmap_of_missing_tensor_is_empty(tmp_path):
+    store = HistogramStore(os.path.join(tmp_path, 'run_log.hist.csv'))
+    store.update()
+
+    steps, values, density = store.heatmap('W_conv1')
+    assert steps == [] and values.tolist() == [] and density.tolist() == []
+
+
+def test_heatmap_is_empty_once_the_log_is_deleted(tmp_path):
+    filename = os.path.join(tmp_path, 'run_log.hist.csv')
+    with open(filename, 'w') as file:
+        file.write('50,W_conv1,-1.0,1.0,1,2,3,4\n100,W_conv1,-2.0,2.0,4,3,2,1\n')
+
+    store = HistogramStore(filename, max_steps=10)
+    store.update()
+    steps, values, density = store.heatmap('W_conv1', resolution=8)
+    assert steps == [50, 100] and len(values) == 8 and density.shape == (8, 2)
+
+    # A new run deletes the log at its step 0
+    os.remove(filename)
+    store.update()
+    steps, values, density = store.heatmap('W_conv1', resolution=8)
+    assert steps == [] and values.tolist() == [] and density.size == 0
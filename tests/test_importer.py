@@ -0,0 +1,78 @@
+import os
+import sqlite3
+
+import pytest
+
+from importer import BulkImporter, find_logs
+from sqlitelog import TABLE
+
+
+def _write_log(filename, n):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as file:
+        for step in range(5, 5 * (n + 1), 5):
+            file.write(f'{step},0.5,0.5,0.25,0.25\n')
+
+
+def _count_rows(database):
+    with sqlite3.connect(database) as connection:
+        return dict(connection.execute(f'SELECT run_id, COUNT(*) FROM {TABLE} GROUP BY run_id').fetchall())
+
+
+def test_import_skips_unchanged_files_and_resumes_changed_ones(tmp_path):
+    logs_dir = os.path.join(tmp_path, 'logs')
+    _write_log(os.path.join(logs_dir, 'a.csv'), 10)
+    _write_log(os.path.join(logs_dir, 'sweep', 'b.csv'), 20)
+    database = os.path.join(tmp_path, 'runs.db')
+
+    importer = BulkImporter(database, workers=1)
+    summary = importer.run(find_logs([logs_dir]))
+    assert summary['files'] == 2 and summary['rows'] == 30
+    assert _count_rows(database) == {'a': 10, 'sweep/b': 20}
+
+    assert importer.run(find_logs([logs_dir]))['skipped_files'] == 2
+
+    # A log rewritten since its import replaces the rows of its run
+    _write_log(os.path.join(logs_dir, 'a.csv'), 15)
+    summary = importer.run(find_logs([logs_dir]))
+    assert summary['files'] == 1 and summary['skipped_files'] == 1
+    assert _count_rows(database) == {'a': 15, 'sweep/b': 20}
+    importer.close()
+
+
+def test_import_rejects_files_named_as_the_same_run(tmp_path):
+    first, second = os.path.join(tmp_path, 'first'), os.path.join(tmp_path, 'second')
+    _write_log(os.path.join(first, 'x.csv'), 10)
+    _write_log(os.path.join(second, 'x.csv'), 20)
+    database = os.path.join(tmp_path, 'runs.db')
+
+    importer = BulkImporter(database, workers=1)
+    with pytest.raises(ValueError, match="'x'"):
+        importer.run(find_logs([first, second]))
+    assert _count_rows(database) == {}
+
+    # Nor can a later import replace a run imported from another file
+    importer.run(find_logs([first]))
+    with pytest.raises(ValueError, match="'x'"):
+        importer.run(find_logs([second]))
+    assert _count_rows(database) == {'x': 10}
+    importer.close()
+
+
+def test_file_imported_under_another_run_id_is_not_skipped(tmp_path):
+    logs_dir = os.path.join(tmp_path, 'logs')
+    _write_log(os.path.join(logs_dir, 'sweep', 'b.csv'), 20)
+    database = os.path.join(tmp_path, 'runs.db')
+
+    importer = BulkImporter(database, workers=1)
+    importer.run(find_logs([logs_dir]))
+
+    # Imported from its own directory, the file is named 'b' instead of 'sweep/b'
+    summary = importer.run(find_logs([os.path.join(logs_dir, 'sweep')]))
+    assert summary['files'] == 1 and summary['skipped_files'] == 0
+    assert _count_rows(database) == {'sweep/b': 20, 'b': 20}
+
+    # Both imports are checkpointed
+    assert importer.run(find_logs([logs_dir]))['skipped_files'] == 1
+    assert importer.run(find_logs([os.path.join(logs_dir, 'sweep')]))['skipped_files'] == 1
+    importer.close()
@@ -0,0 +1,41 @@
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from payload import decode_binary_columns, decode_columns, encode_binary_columns, encode_run_log, payload_version
+
+
+def _run_log():
+    return OrderedDict([('step', [5, 10, 15]), ('train accuracy', [0.25, 0.5, float('nan')])])
+
+
+def test_run_log_round_trip_in_both_encodings():
+    for encoding in ('binary', 'json'):
+        run_log_json = encode_run_log(_run_log(), encoding=encoding, version='run:1:3:15')
+        assert payload_version(run_log_json) == 'run:1:3:15'
+
+        columns = decode_columns(run_log_json)
+        assert list(columns) == ['step', 'train accuracy']
+        assert columns['step'].tolist() == [5, 10, 15]
+        assert columns['train accuracy'][:2].tolist() == [0.25, 0.5] and np.isnan(columns['train accuracy'][2])
+
+
+def test_binary_encoding_uses_compact_types():
+    payload = json.loads(encode_run_log(_run_log()))
+    assert [column['dtype'] for column in payload['columns']] == ['int32', 'float32']
+    assert payload_version(encode_run_log(_run_log())) is None
+
+    # Steps beyond the int32 range are sent as float64
+    payload = json.loads(encode_run_log({'step': [2 ** 40]}))
+    assert payload['columns'][0]['dtype'] == 'float64'
+    assert decode_columns(json.dumps(payload))['step'].tolist() == [2 ** 40]
+
+
+def test_binary_columns_round_trip():
+    data = b''.join(encode_binary_columns(_run_log()))
+
+    columns = decode_binary_columns(data)
+    assert columns['step'].dtype == np.dtype('<i8') and columns['step'].tolist() == [5, 10, 15]
+    assert columns['train accuracy'].dtype == np.dtype('<f4')
+    assert columns['train accuracy'][:2].tolist() == [0.25, 0.5]
@@ -0,0 +1,66 @@
+import json
+import os
+import time
+
+from profiling import TrainingProfiler, control_path, list_profiles, profiles_dir, request_profile
+
+
+def test_requests_made_before_the_training_script_started_are_ignored(tmp_path):
+    log_path = str(tmp_path / 'run_log.csv')
+    request_profile(log_path, 3)
+
+    profiler = TrainingProfiler(log_path, poll_interval=0)
+    profiler._poll()
+    assert not profiler.capturing
+
+
+def test_request_is_picked_up_and_listed(tmp_path):
+    log_path = str(tmp_path / 'run_log.csv')
+    profiler = TrainingProfiler(log_path, poll_interval=0)
+    profiler._poll()
+    assert not profiler.capturing
+
+    # Makes sure that the control file gets a new modification time, even on file systems with a coarse resolution
+    time.sleep(0.01)
+    request_id = request_profile(log_path, 3)
+    with open(control_path(log_path)) as file:
+        assert json.load(file)['steps'] == 3
+
+    profiler._poll()
+    assert profiler.capturing
+    assert profiler.remaining_steps == 3
+    assert profiler.request['id'] == request_id
+    assert list_profiles(log_path) == [(request_id, None, [])]
+
+    profiler.remaining_steps = 0
+    profiler._finish(12)
+
+    # The same request is not picked up twice
+    profiler._poll()
+    assert not profiler.capturing
+
+    [(listed_id, manifest, filenames)] = list_profiles(log_path)
+    assert listed_id == request_id
+    assert manifest['id'] == request_id
+    assert manifest['steps'] == 3
+    assert manifest['last_step'] == 12
+    assert filenames == ['python_stacks.txt']
+
+
+def test_poll_interval(tmp_path):
+    log_path = str(tmp_path / 'run_log.csv')
+    profiler = TrainingProfiler(log_path, poll_interval=3600)
+    time.sleep(0.01)
+    request_profile(log_path, 1)
+
+    profiler._poll()
+    assert not profiler.capturing
+
+
+def test_run_logs_sharing_a_directory_have_their_own_profiles(tmp_path):
+    assert profiles_dir(str(tmp_path / 'job_0.csv')) != profiles_dir(str(tmp_path / 'job_1.csv'))
+    assert list_profiles(str(tmp_path / 'job_0.csv')) == []
+
+    os.makedirs(os.path.join(profiles_dir(str(tmp_path / 'job_0.csv')), 'request'))
+    assert [request_id for request_id, _, _ in list_profiles(str(tmp_path / 'job_0.csv'))] == ['request']
+    assert list_profiles(str(tmp_path / 'job_1.csv')) == []
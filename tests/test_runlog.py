@@ -0,0 +1,283 @@
+import math
+import os
+import random
+import statistics
+
+from runlog import (COLUMNS, NAN, ArrivalRate, CSVTail, OnlineStats, RingBuffer, RunLogStore, RunningStats,
+                    SummaryPyramid)
+
+
+def _rows(n, every=5):
+    return [[step] + [0.5] * (len(COLUMNS) - 1) for step in range(every, every * (n + 1), every)]
+
+
+def test_query_of_a_capacity_bounded_store_returns_the_buckets_overlapping_the_range():
+    store = RunLogStore(capacity=100)
+    store.append_rows(_rows(5000))
+
+    # The rows of steps 100 to 200 are only summarized by coarse buckets, each labelled with its last step
+    for start, end in ((100, 200), (None, 200)):
+        data = store.query(start, end)
+        assert len(data['step']) > 0
+        assert data['step'][-1] >= 200 and (start is None or data['step'][0] >= start)
+
+    assert store.query(24600, 25000)['step'] == list(range(24600, 25005, 5))
+
+
+def test_query_without_capacity_returns_the_rows_within_the_range():
+    store = RunLogStore()
+    store.append_rows(_rows(100))
+
+    assert store.query(12, 33)['step'] == [15, 20, 25, 30]
+    assert store.query(None, 10)['step'] == [5, 10]
+
+
+def _write_rows(filename, steps, value):
+    with open(filename, 'a') as file:
+        for step in steps:
+            file.write(f'{step},{value},{value},{value},{value}\n')
+
+
+def test_tail_restarts_when_the_log_is_replaced_by_a_longer_one_with_the_same_inode(tmp_path):
+    filename = os.path.join(tmp_path, 'run_log.csv')
+    _write_rows(filename, range(5, 105, 5), 0.5)
+
+    tail = CSVTail(filename)
+    rows, reset = tail.read()
+    assert len(rows) == 20 and not reset
+
+    # A new run truncates the log in place, keeping its inode, and grows past the previous offset before the next read
+    open(filename, 'w').close()
+    _write_rows(filename, range(5, 305, 5), 0.25)
+
+    rows, reset = tail.read()
+    assert reset
+    assert [row[0] for row in rows] == list(range(5, 305, 5)) and rows[0][1] == 0.25
+
+    _write_rows(filename, [305], 0.25)
+    assert tail.read() == ([[305, 0.25, 0.25, 0.25, 0.25]], False)
+
+
+def test_tail_restored_from_its_state_detects_a_replaced_log(tmp_path):
+    filename = os.path.join(tmp_path, 'run_log.csv')
+    _write_rows(filename, range(5, 55, 5), 0.5)
+
+    tail = CSVTail(filename)
+    tail.read()
+    state = tail.state()
+
+    open(filename, 'w').close()
+    _write_rows(filename, range(5, 105, 5), 0.25)
+
+    restored = CSVTail(filename)
+    restored.restore(state)
+    rows, reset = restored.read()
+    assert reset and len(rows) == 20
+
+
+def test_tail_with_a_chunk_size_returns_the_rows_over_several_calls(tmp_path):
+    filename = os.path.join(tmp_path, 'run_log.csv')
+    _write_rows(filename, range(5, 505, 5), 0.5)
+
+    tail = CSVTail(filename, chunk_size=100)
+    steps = []
+    rows, _ = tail.read()
+    while rows:
+        assert len(rows) < 10
+        steps += [row[0] for row in rows]
+        rows, _ = tail.read()
+
+    assert steps == list(range(5, 505, 5))
+
+
+def test_store_ingests_the_whole_log_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr('runlog.CHUNK_SIZE', 256)
+    filename = os.path.join(tmp_path, 'run_log.csv')
+    _write_rows(filename, range(5, 5005, 5), 0.5)
+
+    store = RunLogStore(filename, capacity=100)
+    assert store.update()
+    assert store.pyramid.appended == 1000 and store.summary()['train accuracy']['count'] == 1000
+    assert not store.update()
+
+
+def test_tail_skips_lines_which_cannot_be_parsed(tmp_path):
+    filename = os.path.join(tmp_path, 'run_log.csv')
+    with open(filename, 'w') as file:
+        file.write(','.join(COLUMNS) + '\n')
+    _write_rows(filename, [5], 0.5)
+    with open(filename, 'a') as file:
+        file.write('10,0.5,oops\n')
+    _write_rows(filename, [15], 0.5)
+
+    rows, reset = CSVTail(filename).read()
+    assert [row[0] for row in rows] == [5, 15] and not reset
+
+
+def test_running_stats_match_the_statistics_of_the_whole_run_and_of_the_window():
+    values = [random.Random(0).uniform(0, 1) for _ in range(500)]
+    stats = RunningStats(window=50, mode='max')
+    for step, value in enumerate(values):
+        stats.add(step, value)
+
+    window = values[-50:]
+    assert stats.count == 500
+    assert math.isclose(stats.mean, statistics.mean(values))
+    assert math.isclose(stats.variance, statistics.variance(values))
+    assert math.isclose(stats.window_mean, statistics.mean(window))
+    assert math.isclose(stats.window_variance, statistics.variance(window))
+    assert stats.window_min == min(window) and stats.window_max == max(window)
+    assert stats.best == max(values) and stats.best_step == values.index(max(values))
+    assert stats.steps_since_improvement == 499 - stats.best_step
+
+
+def test_running_stats_ignore_missing_values():
+    stats = RunningStats(window=2, mode='min')
+    for step, value in enumerate([3., NAN, 1., 2., NAN]):
+        stats.add(step, value)
+
+    summary = stats.summary()
+    assert summary['count'] == 3 and summary['last'] == 2. and summary['last_step'] == 3
+    assert summary['window_min'] == 1. and summary['window_max'] == 2.
+    assert summary['best'] == 1. and summary['best_step'] == 2 and summary['steps_since_improvement'] == 1
+
+
+def test_online_stats_are_cleared_when_the_run_restarts():
+    store = RunLogStore()
+    store.append_rows([[step, 0.5, 0.25, 1., 2.] for step in range(5, 55, 5)])
+    assert store.summary()['val accuracy']['count'] == 10
+
+    store.append_rows([[5, 0.75, 0.5, 1., 2.]], reset=True)
+    summary = store.summary()
+    assert summary['val accuracy']['count'] == 1 and summary['val accuracy']['best'] == 0.5
+    # Logs without the timing columns have no statistics for them
+    assert summary['steps per sec']['count'] == 0
+
+    stats = OnlineStats(['step', 'loss'])
+    stats.add(1, [0.5])
+    assert list(stats.summary()) == ['loss']
+
+
+def test_pyramid_levels_summarize_pairs_of_buckets():
+    pyramid = SummaryPyramid(1, n_levels=4)
+    for step in range(1, 9):
+        pyramid.append(step, [float(step)])
+
+    assert pyramid.levels[1]['step'] == [2, 4, 6, 8]
+    assert pyramid.levels[1]['mean'][0] == [1.5, 3.5, 5.5, 7.5]
+    assert pyramid.levels[2]['min'][0] == [1., 5.] and pyramid.levels[2]['max'][0] == [4., 8.]
+    assert pyramid.levels[3]['mean'][0] == [4.5]
+
+
+def test_pyramid_chooses_the_finest_level_fitting_in_the_points():
+    pyramid = SummaryPyramid(1)
+    for step in range(1, 1001):
+        pyramid.append(step, [1.])
+
+    assert pyramid.choose_level(1000) == 0
+    assert pyramid.choose_level(500) == 1
+    assert pyramid.choose_level(100) == 4
+    # A zoomed range is read at full resolution
+    assert pyramid.choose_level(100, x_range=(100, 150)) == 0
+
+    # The coarse view reaches the last step, even if its bucket is incomplete
+    steps, _ = pyramid.read(pyramid.choose_level(100))
+    assert steps[-1] == 1000
+
+
+def test_ring_buffer_keeps_the_last_values():
+    buffer = RingBuffer('q', 4)
+    for value in range(3):
+        buffer.append(value)
+    assert len(buffer) == 3 and buffer[:] == [0, 1, 2] and buffer.dropped == 0
+
+    for value in range(3, 10):
+        buffer.append(value)
+    assert len(buffer) == 4 and buffer.dropped == 6
+    assert buffer[:] == [6, 7, 8, 9] and buffer[1:3] == [7, 8] and buffer[::2] == [6, 8]
+    assert buffer[0] == 6 and buffer[-1] == 9
+
+
+def test_capacity_bounded_pyramid_keeps_the_whole_run_at_a_coarser_level():
+    pyramid = SummaryPyramid(1, capacity=100)
+    for step in range(1, 1001):
+        pyramid.append(step, [float(step)])
+
+    assert len(pyramid) == 100 and pyramid.appended == 1000
+    # Level 0 only holds the last 100 steps, so older ranges are read from the finest level still covering them
+    assert pyramid.finest_level((950, 1000)) == 0
+    assert pyramid.finest_level((10, 20)) == 4
+    assert pyramid.finest_level() == 4
+
+
+def test_fingerprint_only_depends_on_the_content_of_the_run(tmp_path):
+    filename = os.path.join(tmp_path, 'run_log.csv')
+    _write_rows(filename, range(5, 55, 5), 0.5)
+
+    # The first store sees the previous run, then the log removed and recreated by a new run
+    restarted = RunLogStore(filename)
+    restarted.update()
+    os.remove(filename)
+    _write_rows(filename, range(5, 105, 5), 0.25)
+    restarted.update()
+
+    fresh = RunLogStore(filename)
+    fresh.update()
+    assert restarted.fingerprint() == fresh.fingerprint()
+    assert restarted.fingerprint()[1:] == (20, 100) and restarted.last_step() == 100
+
+    # The same rows pushed by the collector give the same fingerprint
+    pushed = RunLogStore()
+    pushed.append_rows([[step] + [0.25] * 4 for step in range(5, 105, 5)])
+    assert pushed.fingerprint() == fresh.fingerprint()
+
+    other = RunLogStore()
+    other.append_rows([[step] + [0.5] * 4 for step in range(5, 105, 5)])
+    assert other.fingerprint() != fresh.fingerprint()
+
+
+def test_arrival_rate_is_estimated_from_the_elapsed_time_of_the_rows():
+    arrivals = ArrivalRate(window=5)
+    assert arrivals.rows_per_sec() is None
+
+    # Rows without an elapsed time do not count
+    arrivals.add([NAN, 0.])
+    assert arrivals.rows_per_sec() is None
+
+    arrivals.add([0.5, 1., 1.5, 2., 2.5, 3.], now=10.)
+    assert arrivals.rows_per_sec() == 2. and arrivals.last_arrival == 10.
+
+
+def test_refresh_interval_follows_the_rate_within_the_bounds():
+    arrivals = ArrivalRate()
+    # Every 2 seconds
+    arrivals.add([0., 2., 4.], now=100.)
+    assert arrivals.refresh_interval(None, 500, 60000, now=101.) == 2000
+
+    fast = ArrivalRate()
+    fast.add([0., 0.01, 0.02], now=100.)
+    assert fast.refresh_interval(2000, 500, 60000, now=100.1) == 500
+
+    slow = ArrivalRate()
+    slow.add([0., 100., 200.], now=100.)
+    assert slow.refresh_interval(60000, 500, 60000, now=101.) == 60000
+
+
+def test_refresh_interval_doubles_while_idle_and_snaps_back_when_rows_arrive():
+    arrivals = ArrivalRate()
+    arrivals.add([0., 1., 2.], now=100.)
+    assert arrivals.refresh_interval(1000, 500, 60000, now=101.) == 1000
+
+    # No row for more than twice the interval
+    interval = 1000
+    for expected in (2000, 4000, 8000, 16000, 32000, 60000, 60000):
+        interval = arrivals.refresh_interval(interval, 500, 60000, now=200.)
+        assert interval == expected
+
+    arrivals.add([3.], now=300.)
+    assert arrivals.refresh_interval(interval, 500, 60000, now=300.5) == 1000
+
+    # A finished run keeps backing off
+    assert arrivals.refresh_interval(1000, 500, 60000, finished=True, now=300.5) == 2000
+    # Before the first row
+    assert ArrivalRate().refresh_interval(None, 500, 60000) == 2000
@@ -0,0 +1,57 @@
+import os
+
+from sparklines import Sparkline, SparklineCache, list_runs
+
+
+def _write_rows(filename, steps, accuracy=0.5, loss=1.):
+    with open(filename, 'a') as file:
+        for step in steps:
+            file.write(f'{step},{accuracy},{accuracy},{loss},{loss}\n')
+
+
+def test_buckets_are_merged_in_pairs_once_there_are_twice_as_many_as_points():
+    sparkline = Sparkline(points=4)
+    for step in range(1, 9):
+        sparkline.add([step, step / 10, step / 10, 1., 1.])
+
+    # The eighth row completes the eighth bucket, and the buckets are merged
+    assert sparkline.bucket_size == 2 and len(sparkline.buckets) == 4
+    steps, accuracy, _ = sparkline.series()
+    assert steps == [2, 4, 6, 8]
+    assert [round(value, 2) for value in accuracy] == [0.15, 0.35, 0.55, 0.75]
+
+    sparkline.add([9, 1., 1., 1., 1.])
+    assert sparkline.series()[0] == [2, 4, 6, 8, 9] and sparkline.rows == 9
+
+
+def test_cache_updates_sparklines_with_the_new_rows_only(tmp_path):
+    filename = os.path.join(tmp_path, 'run.csv')
+    _write_rows(filename, range(5, 55, 5))
+    cache = SparklineCache(str(tmp_path), points=100)
+
+    svg, version = cache.get('run')
+    assert svg.startswith('<svg') and cache.summary('run') == (10, 50)
+    assert cache.get('run') == (svg, version)
+
+    # Another cache, e.g. of another worker, resumes from the state saved on disk
+    _write_rows(filename, range(55, 105, 5))
+    other = SparklineCache(str(tmp_path), points=100)
+    _, other_version = other.get('run')
+    assert other_version != version and other.summary('run') == (20, 100)
+    assert list_runs(str(tmp_path)) == ['run']
+
+
+def test_sparkline_starts_over_when_the_run_is_replaced(tmp_path):
+    filename = os.path.join(tmp_path, 'run.csv')
+    _write_rows(filename, range(5, 55, 5))
+    sparkline = Sparkline()
+    assert sparkline.update(filename)
+
+    # A new run truncates the log and grows past the previous offset
+    open(filename, 'w').close()
+    _write_rows(filename, range(5, 205, 5), accuracy=0.25)
+    restored = Sparkline.from_dict(sparkline.to_dict())
+    assert restored.update(filename)
+    assert restored.rows == 40 and restored.series()[1][0] == 0.25
+
+    assert not restored.update(filename)
@@ -0,0 +1,65 @@
+import os
+
+from runlog import COLUMNS
+from sqlitelog import SQLiteReader, SQLiteSink, SQLiteTail, connect, delete_run
+
+
+def _write_rows(sink, steps, value):
+    for step in steps:
+        sink.write([step] + [value] * (len(COLUMNS) - 1))
+    sink.flush()
+
+
+def test_tail_restarts_when_a_new_run_passes_the_last_step_read(tmp_path):
+    database = os.path.join(tmp_path, 'run_log.db')
+    sink = SQLiteSink(database, run='run')
+    sink.reset()
+    _write_rows(sink, range(5, 105, 5), 0.5)
+
+    tail = SQLiteTail(database, run='run')
+    rows, reset = tail.read()
+    assert len(rows) == 20 and not reset
+
+    # The new run logs steps beyond the last one read before the next poll
+    sink.reset()
+    _write_rows(sink, range(5, 305, 5), 0.25)
+
+    rows, reset = tail.read()
+    assert reset
+    assert [row[0] for row in rows] == list(range(5, 305, 5)) and rows[0][1] == 0.25
+
+    _write_rows(sink, [305], 0.25)
+    rows, reset = tail.read()
+    assert [row[0] for row in rows] == [305] and not reset
+    sink.close()
+
+
+def test_tail_restarts_when_a_new_run_has_not_logged_yet(tmp_path):
+    database = os.path.join(tmp_path, 'run_log.db')
+    sink = SQLiteSink(database, run='run')
+    _write_rows(sink, range(5, 55, 5), 0.5)
+
+    tail = SQLiteTail(database, run='run')
+    tail.read()
+
+    sink.reset()
+    assert tail.read() == ([], True)
+    assert tail.read() == ([], False)
+    sink.close()
+
+
+def test_delete_run_increments_the_generation_of_the_run_only(tmp_path):
+    database = os.path.join(tmp_path, 'run_log.db')
+    connection = connect(database)
+    with connection:
+        delete_run(connection, 'run')
+    with connection:
+        delete_run(connection, 'run')
+        delete_run(connection, 'other')
+
+    reader = SQLiteReader(database)
+    assert reader.generation('run') == 2
+    assert reader.generation('other') == 1
+    assert reader.generation('unknown') == 0
+    reader.close()
+    connection.close()
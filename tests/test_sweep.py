@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+import sweep
+from sweep import Sweep, grid_configs, load_manifest, parse_space, random_configs, run_log_path
+
+
+def test_parse_space():
+    space = parse_space(['learning_rate=0.1,0.5', 'batch_size=50', 'optimizer=adam,sgd', 'decay=1e-5:1e-3:log',
+                         'momentum=0.5:0.9'])
+    assert space == {
+        'learning_rate': [0.1, 0.5],
+        'batch_size': [50],
+        'optimizer': ['adam', 'sgd'],
+        'decay': (1e-5, 1e-3, True),
+        'momentum': (0.5, 0.9, False)
+    }
+    assert isinstance(space['batch_size'][0], int)
+
+    with pytest.raises(ValueError):
+        parse_space(['learning_rate'])
+
+
+def test_grid_configs_are_every_combination():
+    configs = grid_configs(parse_space(['learning_rate=0.1,0.5', 'batch_size=50,100,200']))
+    assert len(configs) == 6
+    assert configs[0] == {'learning_rate': 0.1, 'batch_size': 50}
+    assert configs[-1] == {'learning_rate': 0.5, 'batch_size': 200}
+
+    with pytest.raises(ValueError):
+        grid_configs(parse_space(['learning_rate=0.1:0.5']))
+
+
+def test_random_configs_sample_the_space():
+    space = parse_space(['learning_rate=1e-5:1e-1:log', 'momentum=0.5:0.9', 'batch_size=32,64'])
+    configs = random_configs(space, 200, seed=0)
+
+    assert len(configs) == 200 and configs == random_configs(space, 200, seed=0)
+    assert all(1e-5 <= config['learning_rate'] <= 1e-1 for config in configs)
+    assert all(0.5 <= config['momentum'] <= 0.9 for config in configs)
+    assert {config['batch_size'] for config in configs} == {32, 64}
+    # Log-uniform: about as many samples in every decade
+    assert 30 < sum(config['learning_rate'] < 1e-4 for config in configs) < 70
+
+
+def test_jobs_share_the_cores(monkeypatch, tmp_path):
+    monkeypatch.setattr(sweep.os, 'cpu_count', lambda: 8)
+    job_sweep = Sweep('mnist_softmax', grid_configs(parse_space(['learning_rate=0.1,0.5'])), str(tmp_path),
+                      steps=100, extra_args=['--overhead_budget', '0.02'])
+    assert job_sweep.workers == 2 and job_sweep.threads == 4
+
+    job = job_sweep.jobs[1]
+    command = job_sweep.command(job)
+    assert command[:2] == [sys.executable, os.path.join(sweep.ROOT, sweep.EXAMPLES['mnist_softmax'])]
+    assert command[2:] == ['--log_file', os.path.abspath(run_log_path(str(tmp_path), 'job001')),
+                           '--intra_op_threads', '4', '--inter_op_threads', '1', '--learning_rate', '0.5',
+                           '--overhead_budget', '0.02', '--steps', '100']
+
+    env = job_sweep.environment()
+    assert env['OMP_NUM_THREADS'] == env['MKL_NUM_THREADS'] == env['OPENBLAS_NUM_THREADS'] == '4'
+    assert env['PYTHONPATH'].split(os.pathsep)[0] == sweep.ROOT
+
+
+def test_run_records_the_status_of_every_job(monkeypatch, tmp_path):
+    # A stand-in for the example, failing for one of the configurations
+    script = os.path.join(tmp_path, 'example.py')
+    with open(script, 'w') as file:
+        file.write('import sys\nsys.exit(1 if sys.argv[sys.argv.index("--learning_rate") + 1] == "0.5" else 0)\n')
+    monkeypatch.setitem(sweep.EXAMPLES, 'example', script)
+
+    sweep_dir = os.path.join(tmp_path, 'sweep')
+    failed = Sweep('example', grid_configs(parse_space(['learning_rate=0.1,0.5'])), sweep_dir, workers=2).run()
+
+    assert failed == 1
+    manifest = load_manifest(sweep_dir)
+    assert manifest['workers'] == 2
+    assert [(job['run'], job['status'], job['returncode']) for job in manifest['jobs']] == [
+        ('job000', 'done', 0), ('job001', 'failed', 1)]
+    assert os.path.exists(os.path.join(sweep_dir, 'job001.out'))
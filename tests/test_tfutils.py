@@ -0,0 +1,92 @@
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tfutils import LogCadence, StreamingTrainMetrics  # noqa: E402
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr('tfutils.time.perf_counter', clock)
+    return clock
+
+
+def _train(cadence, clock, steps, step_time, eval_time):
+    """Simulates a training loop, returns the logged steps."""
+    logged = []
+    for step in steps:
+        clock.now += step_time
+        if cadence.should_log(step):
+            clock.now += eval_time
+            cadence.record(step, eval_time)
+            logged.append(step)
+    return logged
+
+
+def test_interval_keeps_the_overhead_under_the_budget(clock):
+    cadence = LogCadence(overhead_budget=0.125, smoothing=0.)
+    cadence.should_log(0)
+
+    # Evaluating takes as long as 4 steps, so logging every 32 steps costs 12.5% of the training time
+    logged = _train(cadence, clock, range(1, 1001), step_time=0.5, eval_time=2.)
+    assert cadence.interval == 32
+    assert all(b - a == 32 for a, b in zip(logged[2:], logged[3:]))
+
+
+def test_interval_is_bounded(clock):
+    cadence = LogCadence(overhead_budget=0.01, max_interval=10, smoothing=0.)
+    cadence.should_log(0)
+    _train(cadence, clock, range(1, 100), step_time=0.001, eval_time=1.)
+    assert cadence.interval == 10
+
+    cadence = LogCadence(overhead_budget=0.5, min_interval=3, smoothing=0.)
+    cadence.should_log(0)
+    _train(cadence, clock, range(1, 100), step_time=1., eval_time=0.001)
+    assert cadence.interval == 3
+
+
+def test_dense_steps_and_final_step_are_logged(clock):
+    cadence = LogCadence(overhead_budget=0.01, dense_steps=10, dense_interval=2, total_steps=501, smoothing=0.)
+    cadence.should_log(0)
+
+    logged = _train(cadence, clock, range(1, 501), step_time=0.01, eval_time=0.1)
+    # Past the dense steps, the interval reaches max_interval, and only the final step is logged
+    assert logged == [2, 4, 6, 8, 500]
+
+
+def test_invalid_budget_is_rejected():
+    with pytest.raises(ValueError):
+        LogCadence(overhead_budget=1.5)
+    with pytest.raises(ValueError):
+        LogCadence(min_interval=10, max_interval=5)
+
+
+def test_resetting_streaming_metrics_leaves_other_instances_unchanged():
+    with tf.Graph().as_default():
+        accuracy = tf.placeholder(tf.float32, [])
+        cross_entropy = tf.placeholder(tf.float32, [])
+        # Named streaming_train_metrics and streaming_train_metrics_1, the first one is a prefix of the second one
+        first = StreamingTrainMetrics(accuracy, cross_entropy)
+        second = StreamingTrainMetrics(accuracy, cross_entropy)
+
+        with tf.Session() as sess:
+            first.reset(sess)
+            second.reset(sess)
+            sess.run([first.update_op, second.update_op], feed_dict={accuracy: 0.5, cross_entropy: 2.})
+            sess.run(second.update_op, feed_dict={accuracy: 1., cross_entropy: 1.})
+
+            assert first.read_and_reset(sess) == pytest.approx([0.5, 2.])
+            assert second.read_and_reset(sess) == pytest.approx([0.75, 1.5])
+
+            sess.run([first.update_op, second.update_op], feed_dict={accuracy: 0.25, cross_entropy: 3.})
+            first.reset(sess)
+            assert second.read_and_reset(sess) == pytest.approx([0.25, 3.])
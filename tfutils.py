@@ -1,6 +1,11 @@
 import tensorflow as tf
+import atexit
 import csv
+import json
+import math
 import os
+import socket
+import time
 
 
 def add_eval(y,
@@ -23,13 +28,380 @@ def add_eval(y,
     return accuracy, cross_entropy
 
 
+def add_run_arguments(parser, learning_rate, batch_size, steps):
+    """
+    Adds the command line arguments of a training run, set by sweep.py for every job, to the parser of a script.
+    :param parser: An argparse.ArgumentParser
+    :param learning_rate: Default learning rate
+    :param batch_size: Default number of examples per training step
+    :param steps: Default number of training steps
+    """
+    parser.add_argument('--learning_rate', type=float, default=learning_rate, help='Learning rate')
+    parser.add_argument('--batch_size', type=int, default=batch_size, help='Number of examples per training step')
+    parser.add_argument('--steps', type=int, default=steps, help='Number of training steps')
+    parser.add_argument('--log_file', type=str, default='run_log.csv', help='Path of the run log')
+    parser.add_argument('--intra_op_threads', type=int, default=0,
+                        help='Threads used by a single operation, 0 to let TensorFlow choose')
+    parser.add_argument('--inter_op_threads', type=int, default=0,
+                        help='Operations run in parallel, 0 to let TensorFlow choose')
+    parser.add_argument('--overhead_budget', type=float, default=0.,
+                        help='Fraction of the training time spent logging, e.g. 0.02. By default, every 5 steps')
+
+
+def run_cadence(args):
+    """
+    Returns the LogCadence of a run from the arguments added by add_run_arguments, or None to log at a fixed interval.
+    The run is expected to log the steps 0 to args.steps, the last of which is always logged.
+    """
+    if not args.overhead_budget:
+        return None
+
+    return LogCadence(overhead_budget=args.overhead_budget, total_steps=args.steps + 1)
+
+
+def session_config(intra_op_threads=0, inter_op_threads=0):
+    """
+    :param intra_op_threads: Number of threads used by a single operation, 0 to let TensorFlow choose
+    :param inter_op_threads: Number of operations run in parallel, 0 to let TensorFlow choose
+    :return: A tf.ConfigProto, so that jobs running side by side do not oversubscribe the cores
+    """
+    return tf.ConfigProto(intra_op_parallelism_threads=intra_op_threads,
+                          inter_op_parallelism_threads=inter_op_threads)
+
+
+class StreamingTrainMetrics(object):
+    """
+    Running means of the accuracy and cross entropy of the training batches, accumulated in the graph by the training
+    step itself. Fetch update_op in the same sess.run as the training step, and pass the object to write_data: at
+    every logged step, the train metrics are the averages over the steps since the previous logged step, read and
+    reset without any extra forward pass.
+
+        train_metrics = StreamingTrainMetrics(accuracy, cross_entropy)
+        sess.run([train_step, train_metrics.update_op], feed_dict=feed_dict)
+
+    The averages are those of the training forward pass, e.g. with dropout active.
+    """
+
+    def __init__(self, accuracy, cross_entropy, name='streaming_train_metrics'):
+        """
+        :param accuracy: Accuracy tensor of a batch
+        :param cross_entropy: Cross entropy tensor of a batch
+        :param name: Name of the variable scope of the accumulators
+        """
+        with tf.variable_scope(None, default_name=name) as scope:
+            self.accuracy, update_accuracy = tf.metrics.mean(accuracy)
+            self.cross_entropy, update_cross_entropy = tf.metrics.mean(cross_entropy)
+
+        self.update_op = tf.group(update_accuracy, update_cross_entropy)
+        # The scope is matched as a prefix, the slash keeps the accumulators of e.g. streaming_train_metrics_1 out
+        self.reset_op = tf.variables_initializer(tf.get_collection(tf.GraphKeys.LOCAL_VARIABLES,
+                                                                   scope=scope.name + '/'))
+
+    def reset(self, sess=None):
+        """Zeroes the accumulators, and initializes them the first time."""
+        (sess or tf.get_default_session()).run(self.reset_op)
+
+    def read_and_reset(self, sess=None):
+        """
+        :return: The mean accuracy and cross entropy of the batches since the previous reset
+        """
+        sess = sess or tf.get_default_session()
+        values = sess.run([self.accuracy, self.cross_entropy])
+        sess.run(self.reset_op)
+        return values
+
+
+class LogCadence(object):
+    """
+    Picks the logging interval of write_data so that the time spent evaluating and writing metrics stays under a
+    fixed fraction of the training time.
+
+    The step time is measured between consecutive calls of write_data (minus the time spent logging), and the
+    evaluation time is measured around the metric evaluation. Both are exponentially averaged, and the interval is
+    the smallest number of steps for which eval_time / (interval * step_time) <= overhead_budget.
+    """
+
+    def __init__(self,
+                 overhead_budget=0.02,
+                 min_interval=1,
+                 max_interval=1000,
+                 dense_steps=0,
+                 dense_interval=1,
+                 total_steps=None,
+                 smoothing=0.9):
+        """
+        :param overhead_budget: Target fraction of the training time spent logging, e.g. 0.02 for 2%
+        :param min_interval: Smallest interval (in steps) between two logged steps
+        :param max_interval: Largest interval (in steps) between two logged steps
+        :param dense_steps: Number of steps at the start of training logged every dense_interval, ignoring the budget
+        :param dense_interval: Interval used during the first dense_steps steps, when the curves change fast
+        :param total_steps: Total number of steps of the run, if known. The final step is then always logged
+        :param smoothing: Weight of the exponential moving average applied to the measured times
+        """
+        if not 0 < overhead_budget < 1:
+            raise ValueError('Invalid overhead budget. Please choose a value between 0 and 1')
+
+        if not 1 <= min_interval <= max_interval:
+            raise ValueError('Invalid interval bounds. Please make sure that 1 <= min_interval <= max_interval')
+
+        self.overhead_budget = overhead_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.dense_steps = dense_steps
+        self.dense_interval = dense_interval
+        self.total_steps = total_steps
+        self.smoothing = smoothing
+
+        self.reset()
+
+    def reset(self):
+        """Forgets the measured times, e.g. when a new run starts."""
+        self.step_time = None
+        self.eval_time = None
+        self._last_call = None
+        self._last_call_step = None
+        self._last_logged_step = 0
+        self._pending_eval_time = 0.
+
+    def _average(self, average, value):
+        if average is None:
+            return value
+        return self.smoothing * average + (1 - self.smoothing) * value
+
+    @property
+    def interval(self):
+        """Current logging interval in steps, derived from the measured step and evaluation times."""
+        if self.step_time is None or self.eval_time is None or self.step_time <= 0:
+            return self.min_interval
+
+        interval = math.ceil(self.eval_time / (self.overhead_budget * self.step_time))
+        return int(min(max(interval, self.min_interval), self.max_interval))
+
+    def should_log(self, step):
+        """
+        Measures the time elapsed since the previous call and decides whether the given step should be logged.
+        :param step: The current training step
+        :return: True if the metrics should be evaluated and logged at this step
+        """
+        now = time.perf_counter()
+
+        if self._last_call is not None and step > self._last_call_step:
+            train_time = now - self._last_call - self._pending_eval_time
+            self.step_time = self._average(self.step_time, max(train_time, 0.) / (step - self._last_call_step))
+
+        self._last_call = now
+        self._last_call_step = step
+        self._pending_eval_time = 0.
+
+        if self.total_steps is not None and step >= self.total_steps - 1:
+            return True
+
+        if step < self.dense_steps:
+            interval = self.dense_interval
+        else:
+            interval = self.interval
+
+        return step - self._last_logged_step >= interval
+
+    def record(self, step, eval_time):
+        """
+        Records that the given step was logged, and how long the evaluation and writing took.
+        :param step: The logged step
+        :param eval_time: Time in seconds spent evaluating and writing the metrics
+        """
+        self.eval_time = self._average(self.eval_time, eval_time)
+        self._last_logged_step = step
+        self._pending_eval_time = eval_time
+
+
+def _parse_address(address):
+    """
+    Same as collector.parse_address, so that training scripts only need this file to send their rows to a collector
+    running elsewhere, e.g. in another container.
+    :param address: 'tcp://host:port' or 'unix:///path/to/socket'
+    :return: A tuple (family, address) where family is 'tcp' or 'unix'
+    """
+    if address.startswith('unix://'):
+        return 'unix', address[len('unix://'):]
+
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+class CollectorClient(object):
+    """
+    Sends the logged rows to a metrics collector (see collector.py) over a socket instead of writing them to a file.
+    Rows are sent in batches, and kept in memory for a later retry if the collector cannot be reached. Reconnection
+    attempts are spaced out exponentially, so that a collector which is down does not slow down training.
+    Pass it to write_data as the sink.
+    """
+
+    def __init__(self,
+                 address='tcp://127.0.0.1:8051',
+                 run='run_log',
+                 batch_size=20,
+                 flush_interval=1.,
+                 max_pending=100000,
+                 retry_delay=1.,
+                 max_retry_delay=60.):
+        """
+        :param address: Address of the collector, 'tcp://host:port' or 'unix:///path/to/socket'
+        :param run: Identifier of the run, also the name of the csv file the collector persists it to
+        :param batch_size: Number of rows sent together
+        :param flush_interval: Maximum time in seconds a row waits before being sent
+        :param max_pending: Maximum number of rows kept while the collector is unreachable, the oldest are dropped
+        :param retry_delay: Time in seconds before the first reconnection attempt, doubled after every failure
+        :param max_retry_delay: Maximum time in seconds between two reconnection attempts
+        """
+        self.address = address
+        self.run = run
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._socket = None
+        self._rows = []
+        self._reset = False
+        self._last_flush = time.monotonic()
+        # Delay before the next reconnection attempt, and when it is due, while the collector is unreachable
+        self._next_retry_delay = retry_delay
+        self._next_attempt = None
+
+        # Send the rows still queued when training ends, even while waiting to reconnect
+        atexit.register(self.flush, True)
+
+    def _connect(self):
+        family, address = _parse_address(self.address)
+
+        if family == 'unix':
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(address)
+        else:
+            self._socket = socket.create_connection(address, timeout=5)
+
+    def reset(self):
+        """Discards the rows of the previous run with the same identifier, on the collector side."""
+        self._rows = []
+        self._reset = True
+        self.flush()
+
+    def write(self, row):
+        """
+        Queues a row, and sends the queued rows if the batch is full or the flush interval has elapsed.
+        :param row: List of values, starting with the step
+        """
+        self._rows.append([int(row[0])] + [float(value) for value in row[1:]])
+
+        if len(self._rows) > self.max_pending:
+            del self._rows[:len(self._rows) - self.max_pending]
+
+        if len(self._rows) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self, force=False):
+        """
+        Sends the queued rows. If the collector is unreachable, they are kept for the next flush.
+        :param force: If True, tries to reconnect even if the next attempt is not due yet
+        """
+        now = time.monotonic()
+        self._last_flush = now
+
+        if not self._rows and not self._reset:
+            return
+
+        if self._next_attempt is not None and now < self._next_attempt and not force:
+            return
+
+        message = json.dumps({'run': self.run, 'reset': self._reset, 'rows': self._rows}) + '\n'
+
+        try:
+            if self._socket is None:
+                self._connect()
+            self._socket.sendall(message.encode('utf-8'))
+        except OSError as error:
+            if self._next_attempt is None:
+                print(f"Could not send metrics to the collector at {self.address}: {error}. "
+                      f"Rows are kept until it can be reached again")
+            self._next_attempt = time.monotonic() + self._next_retry_delay
+            self._next_retry_delay = min(2 * self._next_retry_delay, self.max_retry_delay)
+            self.close()
+            return
+
+        if self._next_attempt is not None:
+            print(f"Reconnected to the collector at {self.address}")
+            self._next_attempt = None
+            self._next_retry_delay = self.retry_delay
+
+        self._rows = []
+        self._reset = False
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class _ThroughputTimer(object):
+    """
+    Derives the timing columns of the run log from monotonic timestamps taken at every logged step: elapsed time,
+    steps and examples per second over the last logging interval, and fraction of that interval spent logging.
+    """
+
+    def __init__(self, step=0):
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.last_step = step
+        self.pending_logging_time = 0.
+
+    def measure(self, step, eval_start_time, batch_size=None):
+        """
+        :param step: The logged step
+        :param eval_start_time: perf_counter() value taken before evaluating the metrics of the step
+        :param batch_size: Number of examples per training step, if known
+        :return: List of the values of the timing columns
+        """
+        now = time.perf_counter()
+        interval = now - self.last_time
+        logging_time = self.pending_logging_time + now - eval_start_time
+
+        if interval > 0 and step > self.last_step:
+            steps_per_sec = (step - self.last_step) / interval
+            overhead = min(logging_time / interval, 1.)
+        else:
+            steps_per_sec = overhead = float('nan')
+
+        examples_per_sec = steps_per_sec * batch_size if batch_size else float('nan')
+
+        self.last_time = now
+        self.last_step = step
+
+        return [now - self.start_time, steps_per_sec, examples_per_sec, overhead]
+
+    def record_write(self, write_start_time):
+        """Counts the time spent writing the row in the logging time of the next interval."""
+        self.pending_logging_time = time.perf_counter() - write_start_time
+
+
+# Throughput timer of every log file or sink, restarted at step 0
+_timers = {}
+
+
 def write_data(accuracy,
                cross_entropy,
                feed_dict_train,
                feed_dict_val,
                step,
                step_range=5,
-               filename='run_log.csv'):
+               filename='run_log.csv',
+               cadence=None,
+               sink=None,
+               batch_size=None,
+               train_metrics=None):
     """
     Writes accuracy and cross entropy value into the log file.
     :param accuracy:
@@ -37,31 +409,119 @@ def write_data(accuracy,
     :param feed_dict_train:
     :param feed_dict_val:
     :param step:
-    :param step_range:
+    :param step_range: Fixed interval between two logged steps. Ignored when a cadence is given
     :param filename: Name of the log file
+    :param cadence: Optional LogCadence choosing the logging interval from the measured overhead
+    :param sink: Optional object receiving the rows instead of the log file, e.g. a CollectorClient
+    :param batch_size: Number of examples per training step, used to log the examples per second
+    :param train_metrics: Optional StreamingTrainMetrics. The logged train metrics are then its averages since the
+    previous logged step, and feed_dict_train is not evaluated
     :return:
     """
-    if step_range not in range(1, 1001):
+    if cadence is None and step_range not in range(1, 1001):
         raise ValueError('Invalid step range. Please choose a value between 1 and 1000')
 
+    timer_key = id(sink) if sink is not None else os.path.abspath(filename)
+
     # At the start, we delete the log residual log file from previous training
     if step == 0:
-        if os.path.exists(filename):
+        _timers[timer_key] = _ThroughputTimer()
+
+        if sink is not None:
+            sink.reset()
+        elif os.path.exists(filename):
             os.remove(filename)
 
+        if cadence is not None:
+            cadence.reset()
+            cadence.should_log(step)
+
+        if train_metrics is not None:
+            train_metrics.reset()
+
     # Then we start logging inside the file
-    elif step % step_range == 0:
-        train_accuracy = accuracy.eval(feed_dict=feed_dict_train)
-        val_accuracy = accuracy.eval(feed_dict=feed_dict_val)
+    elif cadence.should_log(step) if cadence is not None else step % step_range == 0:
+        start_time = time.perf_counter()
 
-        train_cross_entropy = cross_entropy.eval(feed_dict=feed_dict_train)
-        val_cross_entropy = cross_entropy.eval(feed_dict=feed_dict_val)
+        if train_metrics is not None:
+            train_accuracy, train_cross_entropy = train_metrics.read_and_reset()
+        else:
+            train_accuracy = accuracy.eval(feed_dict=feed_dict_train)
+            train_cross_entropy = cross_entropy.eval(feed_dict=feed_dict_train)
 
-        # Write CSV
-        with open(filename, 'a', newline='') as file:
-            writer = csv.writer(file, delimiter=',')
-            writer.writerow([step, train_accuracy, val_accuracy, train_cross_entropy, val_cross_entropy])
+        val_accuracy, val_cross_entropy = tf.get_default_session().run([accuracy, cross_entropy],
+                                                                       feed_dict=feed_dict_val)
+
+        if timer_key not in _timers:
+            _timers[timer_key] = _ThroughputTimer(step)
+        timer = _timers[timer_key]
+
+        row = [step, train_accuracy, val_accuracy, train_cross_entropy, val_cross_entropy]
+        row += timer.measure(step, start_time, batch_size)
+
+        write_start_time = time.perf_counter()
+        if sink is not None:
+            sink.write(row)
+        else:
+            # Write CSV
+            with open(filename, 'a', newline='') as file:
+                writer = csv.writer(file, delimiter=',')
+                writer.writerow(row)
+
+        timer.record_write(write_start_time)
+
+        if cadence is not None:
+            cadence.record(step, time.perf_counter() - start_time)
 
         return train_accuracy, val_accuracy, train_cross_entropy, val_cross_entropy
 
     return None, None, None, None
+
+
+def add_histograms(tensors, bins=32):
+    """
+    Add fixed-size histograms of the given tensors, e.g. layer weights, to the graph. Each histogram is computed in the
+    graph, over the current range of values of its tensor, so that only its min, max and bins counts leave the graph,
+    and write_histograms writes them in a row with the step and the name of the tensor.
+    :param tensors: Dict mapping names to tensors, e.g. {'W_conv1': W_conv1, 'W_fc1': W_fc1}
+    :param bins: Number of buckets of every histogram
+    :return: Dict mapping the names to (min, max, counts) tensors, to pass to write_histograms
+    """
+    histograms = {}
+
+    for name, tensor in tensors.items():
+        with tf.name_scope(f'histogram_{name}'):
+            values = tf.cast(tf.reshape(tensor, [-1]), tf.float32)
+            low = tf.reduce_min(values)
+            high = tf.maximum(tf.reduce_max(values), low + 1e-6)
+            counts = tf.histogram_fixed_width(values, tf.stack([low, high]), nbins=bins)
+
+        histograms[name] = (low, high, counts)
+
+    return histograms
+
+
+def write_histograms(histograms,
+                     step,
+                     step_range=50,
+                     filename='run_log.hist.csv'):
+    """
+    Writes the histograms created by add_histograms into a sidecar log file, one row per tensor and logged step:
+    step, name, min, max, and the bucket counts. Every row has a fixed size, whatever the size of the tensor.
+    :param histograms: The dict returned by add_histograms
+    :param step: The current training step
+    :param step_range: Interval between two logged steps
+    :param filename: Name of the histogram log file
+    """
+    # At the start, we delete the log residual log file from previous training
+    if step == 0:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    elif step % step_range == 0:
+        values = tf.get_default_session().run(histograms)
+
+        with open(filename, 'a', newline='') as file:
+            writer = csv.writer(file, delimiter=',')
+            for name, (low, high, counts) in sorted(values.items()):
+                writer.writerow([step, name, float(low), float(high)] + [int(count) for count in counts])